@@ -16,6 +16,12 @@ class Settings(BaseSettings):
     postgres_user: str = Field(default="postgres", env="POSTGRES_USER")
     postgres_password: str = Field(default="postgres", env="POSTGRES_PASSWORD")
     postgres_db: str = Field(default="content_downloader", env="POSTGRES_DB")
+    db_pool_size: int = Field(default=10, env="DB_POOL_SIZE")
+    db_max_overflow: int = Field(default=20, env="DB_MAX_OVERFLOW")
+    db_pool_timeout: float = Field(default=10.0, env="DB_POOL_TIMEOUT")
+    db_pool_recycle: int = Field(default=1800, env="DB_POOL_RECYCLE")
+    db_pool_pre_ping: bool = Field(default=True, env="DB_POOL_PRE_PING")
+    db_statement_cache_size: int = Field(default=500, env="DB_STATEMENT_CACHE_SIZE")
     
     # Redis
     redis_url: str = Field(default="redis://localhost:6379/0", env="REDIS_URL")
@@ -27,20 +33,66 @@ class Settings(BaseSettings):
     temp_dir: str = Field(default="./temp", env="TEMP_DIR")
     storage_dir: str = Field(default="./storage", env="STORAGE_DIR")
     
+    # Download jobs
+    max_concurrent_jobs: int = Field(default=4, env="MAX_CONCURRENT_JOBS")
+    progress_edit_interval: float = Field(default=3.0, env="PROGRESS_EDIT_INTERVAL")
+    # Parallel fragments and tuned range requests for yt-dlp downloads
+    adaptive_downloads: bool = Field(default=True, env="ADAPTIVE_DOWNLOADS")
+    download_connections_per_job: int = Field(default=4, env="DOWNLOAD_CONNECTIONS_PER_JOB")
+    download_connections_per_host: int = Field(default=16, env="DOWNLOAD_CONNECTIONS_PER_HOST")
+    # Concurrent ffmpeg processes, defaults to the number of CPUs
+    ffmpeg_max_processes: Optional[int] = Field(default=None, env="FFMPEG_MAX_PROCESSES")
+    # Re-encode oversized videos to fit max_file_size_mb (premium or off-peak)
+    transcode_enabled: bool = Field(default=True, env="TRANSCODE_ENABLED")
+    transcode_offpeak_start: int = Field(default=1, env="TRANSCODE_OFFPEAK_START")
+    transcode_offpeak_end: int = Field(default=7, env="TRANSCODE_OFFPEAK_END")
+    transcode_cache_size_mb: int = Field(default=2048, env="TRANSCODE_CACHE_SIZE_MB")
+    # Largest source downloaded for re-encoding (YouTube aborts bigger ones early)
+    transcode_max_input_mb: int = Field(default=500, env="TRANSCODE_MAX_INPUT_MB")
+    # How long identical files are re-sent by Telegram file_id
+    content_index_ttl_days: int = Field(default=30, env="CONTENT_INDEX_TTL_DAYS")
+    # Let Telegram fetch small progressive files from the CDN by URL
+    send_by_url: bool = Field(default=True, env="SEND_BY_URL")
+    
+    # Download history writer
+    history_flush_interval_ms: int = Field(default=300, env="HISTORY_FLUSH_INTERVAL_MS")
+    history_batch_size: int = Field(default=500, env="HISTORY_BATCH_SIZE")
+    history_max_buffer: int = Field(default=50000, env="HISTORY_MAX_BUFFER")
+    
     # Rate Limiting
     free_user_limit: int = Field(default=7, env="FREE_USER_LIMIT")
     premium_user_limit: int = Field(default=1000, env="PREMIUM_USER_LIMIT")
+    max_links_per_message: int = Field(default=10, env="MAX_LINKS_PER_MESSAGE")
+    
+    # Outbound Telegram rate limits
+    send_global_rate: float = Field(default=30.0, env="SEND_GLOBAL_RATE")
+    send_chat_rate: float = Field(default=1.0, env="SEND_CHAT_RATE")
+    send_chat_burst: float = Field(default=3.0, env="SEND_CHAT_BURST")
+    send_group_rate_per_min: float = Field(default=20.0, env="SEND_GROUP_RATE_PER_MIN")
+    send_max_retries: int = Field(default=3, env="SEND_MAX_RETRIES")
     
     # API Keys
     twitter_api_key: Optional[str] = Field(default=None, env="TWITTER_API_KEY")
     twitter_api_secret: Optional[str] = Field(default=None, env="TWITTER_API_SECRET")
     instagram_username: Optional[str] = Field(default=None, env="INSTAGRAM_USERNAME")
     instagram_password: Optional[str] = Field(default=None, env="INSTAGRAM_PASSWORD")
+    instagram_cookies_file: Optional[str] = Field(default=None, env="INSTAGRAM_COOKIES_FILE")
+    instagram_fetch_concurrency: int = Field(default=4, env="INSTAGRAM_FETCH_CONCURRENCY")
+    session_pool_size: int = Field(default=2, env="SESSION_POOL_SIZE")
+    session_lease_timeout: float = Field(default=60.0, env="SESSION_LEASE_TIMEOUT")
     
     # Server Configuration
     host: str = Field(default="0.0.0.0", env="HOST")
     port: int = Field(default=8001, env="PORT")
     webhook_url: Optional[str] = Field(default=None, env="WEBHOOK_URL")
+    webhook_queue_size: int = Field(default=1000, env="WEBHOOK_QUEUE_SIZE")
+    webhook_workers: int = Field(default=16, env="WEBHOOK_WORKERS")
+    workers: int = Field(default=1, env="WORKERS")
+    worker_shutdown_timeout: float = Field(default=30.0, env="WORKER_SHUTDOWN_TIMEOUT")
+    shutdown_drain_timeout: float = Field(default=25.0, env="SHUTDOWN_DRAIN_TIMEOUT")
+    journal_heartbeat_ttl: float = Field(default=30.0, env="JOURNAL_HEARTBEAT_TTL")
+    journal_sweep_interval: float = Field(default=15.0, env="JOURNAL_SWEEP_INTERVAL")
+    use_uvloop: bool = Field(default=False, env="USE_UVLOOP")
     
     # Monitoring
     sentry_dsn: Optional[str] = Field(default=None, env="SENTRY_DSN")
@@ -1,14 +1,30 @@
 """Database models and initialization."""
-from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession, async_sessionmaker
+from sqlalchemy.ext.asyncio import AsyncEngine, create_async_engine, AsyncSession, async_sessionmaker
 from sqlalchemy.orm import declarative_base, relationship
-from sqlalchemy import Column, Integer, String, Boolean, DateTime, ForeignKey, BigInteger, Text
+from sqlalchemy import (
+    Column, Integer, String, Boolean, DateTime, ForeignKey, BigInteger, Text,
+    Table, delete, inspect, insert, select,
+)
+from sqlalchemy.engine import make_url
+from sqlalchemy.pool import AsyncAdaptedQueuePool
 from datetime import datetime
+from time import perf_counter
 from typing import AsyncGenerator
 
 from config import settings
+from utils.metrics import DB_POOL_CHECKOUT_SECONDS
 
 Base = declarative_base()
 
+# Bump when models change: the next start runs create_all once
+SCHEMA_VERSION = 1
+
+schema_info = Table(
+    "schema_info",
+    Base.metadata,
+    Column("version", Integer, nullable=False),
+)
+
 
 class User(Base):
     """User model."""
@@ -45,31 +61,93 @@ class Download(Base):
     user = relationship("User", back_populates="downloads")
 
 
-# Database engine and session
-engine = create_async_engine(
-    settings.database_url,
-    echo=settings.debug,
-    future=True
-)
+class TimedQueuePool(AsyncAdaptedQueuePool):
+    """Queue pool that reports connection checkout wait time."""
 
-async_session_maker = async_sessionmaker(
-    engine,
-    class_=AsyncSession,
-    expire_on_commit=False
-)
+    def _do_get(self):
+        started = perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            DB_POOL_CHECKOUT_SECONDS.observe(perf_counter() - started)
+
+
+def _connect_args() -> dict:
+    """Driver-specific connection arguments."""
+    if make_url(settings.database_url).get_driver_name() == "asyncpg":
+        # Кэш prepared statements для горячих запросов (upsert пользователя и т.д.)
+        return {"prepared_statement_cache_size": settings.db_statement_cache_size}
+    return {}
+
+
+# Database engine and session (created on first use, not at import:
+# asyncpg and the pool are not needed to start serving the webhook)
+_engine = None
+_session_maker = None
+
+
+def get_engine() -> AsyncEngine:
+    """Process-wide database engine."""
+    global _engine
+    if _engine is None:
+        _engine = create_async_engine(
+            settings.database_url,
+            echo=settings.debug,
+            future=True,
+            poolclass=TimedQueuePool,
+            pool_size=settings.db_pool_size,
+            max_overflow=settings.db_max_overflow,
+            pool_timeout=settings.db_pool_timeout,
+            pool_recycle=settings.db_pool_recycle,
+            pool_pre_ping=settings.db_pool_pre_ping,
+            connect_args=_connect_args(),
+        )
+    return _engine
+
+
+def get_session_maker() -> async_sessionmaker:
+    """Session factory bound to the engine."""
+    global _session_maker
+    if _session_maker is None:
+        _session_maker = async_sessionmaker(
+            get_engine(),
+            class_=AsyncSession,
+            expire_on_commit=False
+        )
+    return _session_maker
+
+
+def __getattr__(name: str):
+    # Старый доступ database.engine / database.async_session_maker
+    if name == "engine":
+        return get_engine()
+    if name == "async_session_maker":
+        return get_session_maker()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 
 async def get_db() -> AsyncGenerator[AsyncSession, None]:
     """Get database session."""
-    async with async_session_maker() as session:
+    async with get_session_maker()() as session:
         try:
             yield session
         finally:
             await session.close()
 
 
+def _schema_version(conn) -> int | None:
+    if not inspect(conn).has_table(schema_info.name):
+        return None
+    return conn.execute(select(schema_info.c.version)).scalar()
+
+
 async def init_db():
-    """Initialize database tables."""
-    async with engine.begin() as conn:
+    """Create tables unless the schema is already at ``SCHEMA_VERSION``."""
+    async with get_engine().begin() as conn:
+        # Один дешёвый запрос вместо create_all на каждом старте
+        if await conn.run_sync(_schema_version) == SCHEMA_VERSION:
+            return
         await conn.run_sync(Base.metadata.create_all)
+        await conn.execute(delete(schema_info))
+        await conn.execute(insert(schema_info).values(version=SCHEMA_VERSION))
     print("Database initialized successfully")
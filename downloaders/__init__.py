@@ -1,45 +1,97 @@
 """Downloaders package."""
-import re
-
-from .tiktok import download_tiktok_video
-from .youtube import download_youtube_video
 from .instagram import download_instagram_content
+from .pinterest import download_pinterest_content
+from .reddit import download_reddit_content
+from .registry import DOWNLOADERS, get_downloader, register_downloader
+from .router import URL_PATTERNS, RouteMatch, route
+from .tiktok import download_tiktok_video
 from .twitter import download_twitter_content
+from .ydl_pool import ydl_pool
+from .youtube import download_youtube_video
 
-URL_PATTERNS = {
-    "tiktok": r"(?:https?://)?(?:www\.)?(?:tiktok\.com|vm\.tiktok\.com)",
-    "youtube": r"(?:https?://)?(?:www\.)?(?:youtube\.com|youtu\.be)",
-    "instagram": r"(?:https?://)?(?:www\.)?instagram\.com",
-    "twitter": r"(?:https?://)?(?:www\.)?(?:twitter\.com|x\.com)",
-    "reddit": r"(?:https?://)?(?:www\.)?reddit\.com",
-    "pinterest": r"(?:https?://)?(?:www\.)?pinterest\.com",
-}
+__all__ = [
+    "DOWNLOADERS",
+    "RouteMatch",
+    "URL_PATTERNS",
+    "detect_platform",
+    "download_instagram",
+    "download_instagram_content",
+    "download_pinterest",
+    "download_pinterest_content",
+    "download_reddit",
+    "download_reddit_content",
+    "download_tiktok",
+    "download_tiktok_video",
+    "download_twitter",
+    "download_twitter_content",
+    "download_youtube",
+    "download_youtube_video",
+    "extract_links",
+    "extract_urls",
+    "get_downloader",
+    "register_downloader",
+    "route",
+    "ydl_pool",
+]
 
 
 def detect_platform(url: str) -> str | None:
     """Detect platform from URL."""
-    url_lower = url.lower()
-    for platform, pattern in URL_PATTERNS.items():
-        if re.search(pattern, url_lower):
-            return platform
-    return None
+    match = route(url)
+    return match.platform if match else None
+
+
+def extract_links(text: str, entities: list | None = None) -> list[RouteMatch]:
+    """Supported links of a message in order, without duplicates."""
+    candidates = []
+    for entity in entities or []:
+        if entity.type == "text_link":
+            candidates.append(entity.url)
+        elif entity.type == "url":
+            candidates.append(entity.extract_from(text))
+    candidates.extend(text.split())
 
+    links: dict[str, RouteMatch] = {}
+    for candidate in candidates:
+        candidate = candidate.strip("<>()[]\"'").rstrip(".,;:!?")
+        if candidate in links:
+            continue
+        match = route(candidate)
+        if match is not None:
+            links[candidate] = match
+    return list(links.values())
 
-async def download_tiktok(url: str) -> dict[str, any]:
+
+def extract_urls(text: str, entities: list | None = None) -> list[str]:
+    """Supported URLs of a message in order, without duplicates."""
+    return [link.url for link in extract_links(text, entities)]
+
+
+async def download_tiktok(url: str, progress=None) -> dict[str, any]:
     """Download TikTok content."""
-    return await download_tiktok_video(url)
+    return await download_tiktok_video(url, progress)
 
 
-async def download_youtube(url: str) -> dict[str, any]:
+async def download_youtube(url: str, progress=None) -> dict[str, any]:
     """Download YouTube content."""
-    return await download_youtube_video(url)
+    return await download_youtube_video(url, progress)
 
 
-async def download_instagram(url: str) -> dict[str, any]:
+async def download_instagram(url: str, progress=None) -> dict[str, any]:
     """Download Instagram content."""
-    return await download_instagram_content(url)
+    return await download_instagram_content(url, progress)
 
 
-async def download_twitter(url: str) -> dict[str, any]:
+async def download_twitter(url: str, progress=None) -> dict[str, any]:
     """Download Twitter/X content."""
-    return await download_twitter_content(url)
+    return await download_twitter_content(url, progress)
+
+
+async def download_reddit(url: str, progress=None) -> dict[str, any]:
+    """Download Reddit content."""
+    return await download_reddit_content(url, progress)
+
+
+async def download_pinterest(url: str, progress=None) -> dict[str, any]:
+    """Download Pinterest content."""
+    return await download_pinterest_content(url, progress)
@@ -0,0 +1,193 @@
+"""Connection budgets and tuned chunk sizes for yt-dlp downloads."""
+
+import threading
+from typing import Any
+from urllib.parse import urlsplit
+
+from config import settings
+from utils.metrics import DOWNLOAD_CONNECTIONS, DOWNLOAD_THROUGHPUT
+
+MIN_CHUNK_SIZE = 1024 * 1024
+# googlevideo режет скорость у более длинных range-запросов
+MAX_CHUNK_SIZE = 10 * 1024 * 1024
+DEFAULT_CHUNK_SIZE = 4 * 1024 * 1024
+# A chunk should take about this long at the measured speed
+CHUNK_SECONDS = 5.0
+EWMA_ALPHA = 0.3
+# Короткие загрузки меряют задержку, а не скорость
+MIN_SAMPLE_BYTES = 1024 * 1024
+# How long a download waits for a busy CDN before going with one connection
+ACQUIRE_TIMEOUT = 30.0
+
+FRAGMENT_PROTOCOLS = ("m3u8", "http_dash_segments")
+
+
+def cdn_key(url: str) -> str | None:
+    """CDN a URL belongs to: edge hosts of one CDN share its limits."""
+    host = urlsplit(url).hostname
+    if not host:
+        return None
+    return ".".join(host.split(".")[-2:])
+
+
+class ConnectionLimiter:
+    """
+    Connections per CDN shared by all jobs (downloader threads).
+
+    A job gets up to ``per_job`` connections, fewer when the CDN is busy,
+    and waits while all ``per_host`` connections of the CDN are taken.
+    """
+
+    def __init__(self, per_host: int, per_job: int):
+        self.per_host = per_host
+        self.per_job = per_job
+        self._used: dict[str, int] = {}
+        self._cond = threading.Condition()
+
+    def acquire(self, host: str, timeout: float | None = None) -> int:
+        """Take connections to ``host``; returns how many were granted."""
+        with self._cond:
+            if not self._cond.wait_for(
+                lambda: self._used.get(host, 0) < self.per_host, timeout
+            ):
+                raise TimeoutError(f"No free connections to {host}")
+            used = self._used.get(host, 0)
+            granted = min(self.per_job, self.per_host - used)
+            self._used[host] = used + granted
+        DOWNLOAD_CONNECTIONS.labels(host).inc(granted)
+        return granted
+
+    def release(self, host: str, count: int) -> None:
+        with self._cond:
+            self._used[host] -= count
+            if not self._used[host]:
+                del self._used[host]
+            self._cond.notify_all()
+        DOWNLOAD_CONNECTIONS.labels(host).dec(count)
+
+
+class ThroughputTuner:
+    """
+    Per-connection speed of recent downloads per CDN (EWMA).
+
+    The chunk size for range requests is what one connection fetches in
+    ``CHUNK_SECONDS``: slow CDNs get short requests that are cheap to
+    retry, fast ones fewer, larger requests.
+    """
+
+    def __init__(self):
+        self._rates: dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def record(
+        self, host: str, size: int, seconds: float, connections: int = 1
+    ) -> None:
+        if size < MIN_SAMPLE_BYTES or seconds <= 0:
+            return
+        rate = size / seconds / max(connections, 1)
+        with self._lock:
+            previous = self._rates.get(host)
+            if previous is not None:
+                rate = previous + EWMA_ALPHA * (rate - previous)
+            self._rates[host] = rate
+        DOWNLOAD_THROUGHPUT.labels(host).set(rate)
+
+    def chunk_size(self, host: str) -> int:
+        rate = self._rates.get(host)
+        if rate is None:
+            return DEFAULT_CHUNK_SIZE
+        return int(min(MAX_CHUNK_SIZE, max(MIN_CHUNK_SIZE, rate * CHUNK_SECONDS)))
+
+
+class DownloadBudget:
+    """
+    Connections and chunk size of one pooled ``YoutubeDL``.
+
+    ``reserve`` runs before each download (a ``before_dl`` post-processor):
+    it takes connections to the CDN of the selected format and sets
+    ``concurrent_fragment_downloads`` and ``http_chunk_size`` on the
+    instance. When the CDN stays busy for ``ACQUIRE_TIMEOUT`` the download
+    goes ahead with a single connection outside the budget. ``record`` feeds finished downloads to the tuner;
+    ``release`` returns the connections when the lease ends.
+    """
+
+    def __init__(
+        self,
+        params: dict[str, Any],
+        limiter: ConnectionLimiter | None = None,
+        tuner: ThroughputTuner | None = None,
+    ):
+        self.params = params
+        self.limiter = limiter or connection_limiter
+        self.tuner = tuner or throughput_tuner
+        self.host: str | None = None
+        self.connections = 0
+        # Сколько из connections взято у limiter (0 - запасное соединение)
+        self.acquired = 0
+
+    def reserve(self, info: dict[str, Any]) -> None:
+        formats = info.get("requested_formats") or [info]
+        url = formats[0].get("url")
+        host = cdn_key(url) if url else None
+        if host is None:
+            return
+        if host != self.host:
+            self.release()
+            try:
+                self.acquired = self.limiter.acquire(host, ACQUIRE_TIMEOUT)
+                self.connections = self.acquired
+            except TimeoutError:
+                # Не держим поток загрузки бесконечно - качаем в одно соединение
+                self.connections = 1
+            self.host = host
+        self.params["concurrent_fragment_downloads"] = self.connections
+        self.params["http_chunk_size"] = self.tuner.chunk_size(host)
+
+    def record(self, d: dict[str, Any]) -> None:
+        """yt-dlp progress hook: measure finished downloads."""
+        if d.get("status") != "finished" or self.host is None:
+            return
+        protocol = str((d.get("info_dict") or {}).get("protocol") or "")
+        # Параллельно качаются только фрагменты, файл целиком - одно соединение
+        connections = self.connections if protocol.startswith(FRAGMENT_PROTOCOLS) else 1
+        self.tuner.record(
+            self.host,
+            d.get("total_bytes") or d.get("downloaded_bytes") or 0,
+            d.get("elapsed") or 0,
+            connections,
+        )
+
+    def release(self) -> None:
+        if self.host is not None:
+            if self.acquired:
+                self.limiter.release(self.host, self.acquired)
+            self.host = None
+            self.connections = 0
+            self.acquired = 0
+        self.params.pop("concurrent_fragment_downloads", None)
+        self.params.pop("http_chunk_size", None)
+
+
+def install_budget(ydl: Any) -> DownloadBudget:
+    """Attach a ``DownloadBudget`` to a ``YoutubeDL`` as a before_dl step."""
+    from yt_dlp.postprocessor.common import PostProcessor
+
+    budget = DownloadBudget(ydl.params)
+
+    class BudgetPP(PostProcessor):
+        def run(self, info):
+            budget.reserve(info)
+            return [], info
+
+        def _hook_progress(self, status, info_dict):
+            # Подготовка к загрузке, а не обработка - в прогресс не попадает
+            pass
+
+    ydl.add_post_processor(BudgetPP(ydl), when="before_dl")
+    return budget
+
+
+connection_limiter = ConnectionLimiter(
+    settings.download_connections_per_host, settings.download_connections_per_job
+)
+throughput_tuner = ThroughputTuner()
@@ -0,0 +1,125 @@
+"""Shared helpers for downloaders."""
+
+import asyncio
+from collections.abc import Callable
+from html import escape
+from typing import TYPE_CHECKING, Any
+
+from config import settings
+
+if TYPE_CHECKING:
+    from services.progress import ProgressStream
+
+# Telegram message length limit
+TEXT_LIMIT = 4096
+
+# Telegram fetches files sent by URL up to these sizes, in these formats
+URL_SEND_LIMITS = {"photo": 5 * 1024 * 1024, "video": 20 * 1024 * 1024}
+URL_SEND_EXTENSIONS = {"photo": ("jpg", "jpeg", "png"), "video": ("mp4",)}
+
+# Заголовки, которые yt-dlp шлёт всегда; любые другие (Referer, Origin, ...)
+# нужны CDN, и без них Telegram файл не скачает
+PLAIN_HEADERS = frozenset(
+    {"User-Agent", "Accept", "Accept-Language", "Accept-Encoding", "Sec-Fetch-Mode"}
+)
+
+
+async def run_blocking(
+    func: Callable[[Any, "ProgressStream | None"], Any],
+    arg: Any,
+    progress: "ProgressStream | None",
+) -> Any:
+    """
+    Run blocking yt-dlp work in a thread with cooperative cancellation.
+
+    Cancelling the caller returns control (and the job slot) immediately;
+    the thread is told to stop at its next progress hook. Partial files are
+    removed once it has actually exited if the user cancelled the job, and
+    kept for resuming if it was interrupted by a shutdown.
+    """
+    future = asyncio.ensure_future(asyncio.to_thread(func, arg, progress))
+    try:
+        return await asyncio.shield(future)
+    except asyncio.CancelledError:
+        if progress is not None:
+            cleanup = progress.cancelled
+            progress.cancel()
+            future.add_done_callback(lambda f: _cleanup_cancelled(f, progress, cleanup))
+        raise
+
+
+def media_metadata(info: dict[str, Any]) -> dict[str, int]:
+    """Duration and dimensions known from a yt-dlp info dict."""
+    metadata = {}
+    for key in ("duration", "width", "height"):
+        if info.get(key):
+            metadata[key] = int(info[key])
+    return metadata
+
+
+def direct_url(info: dict[str, Any], content_type: str) -> str | None:
+    """
+    URL of the selected format if Telegram can fetch it itself.
+
+    That is a single progressive file over plain HTTP in a format Telegram
+    accepts by URL, under its URL size limit, that needs no cookies or
+    extra headers. Photos of unknown size qualify: they are rarely over the
+    limit, and a rejected URL is downloaded and uploaded anyway.
+    """
+    if not settings.send_by_url or content_type not in URL_SEND_LIMITS:
+        return None
+    url = info.get("url")
+    if not url or info.get("requested_formats") or info.get("cookies"):
+        return None
+    if info.get("protocol", "https") not in ("http", "https"):
+        return None
+    if set(info.get("http_headers") or {}) - PLAIN_HEADERS:
+        return None
+    if (info.get("ext") or "").lower() not in URL_SEND_EXTENSIONS[content_type]:
+        return None
+
+    size = info.get("filesize") or info.get("filesize_approx")
+    if size is None:
+        return url if content_type == "photo" else None
+    return url if size <= URL_SEND_LIMITS[content_type] else None
+
+
+def url_item(info: dict[str, Any], content_type: str, url: str) -> dict[str, Any]:
+    """Result item sent by ``media_url`` instead of a downloaded file."""
+    return {
+        "media_url": url,
+        "content_type": content_type,
+        "file_size": int(info.get("filesize") or info.get("filesize_approx") or 0),
+        **media_metadata(info),
+    }
+
+
+def format_post(header: str, body: str, footer: str = "") -> str:
+    """
+    HTML message of a text post: bold header, body and footer, escaped.
+
+    The body is cut to fit Telegram's message limit.
+    """
+    header = f"<b>{escape(header)}</b>"
+    footer = f"\n\n{escape(footer)}" if footer else ""
+    body = escape(body)
+    room = TEXT_LIMIT - len(header) - len(footer) - 2
+    if len(body) > room:
+        body = body[: room - 1]
+        # Не оставляем обрезанную HTML-сущность
+        if body.rfind("&") > body.rfind(";"):
+            body = body[: body.rfind("&")]
+        body = body.rstrip() + "…"
+    if body:
+        body = f"\n\n{body}"
+    return f"{header}{body}{footer}"
+
+
+def _cleanup_cancelled(
+    future: asyncio.Future, progress: "ProgressStream", cleanup: bool
+) -> None:
+    # Результат отменённой задачи никому не нужен, но его надо забрать
+    if not future.cancelled():
+        future.exception()
+    if cleanup:
+        progress.cleanup_partials()
@@ -0,0 +1,154 @@
+"""Pooled aiohttp session for platforms fetched without yt-dlp."""
+
+import asyncio
+import contextlib
+import hashlib
+import os
+import time
+from pathlib import Path
+from typing import TYPE_CHECKING, Any
+from urllib.parse import urlsplit
+
+import aiohttp
+
+from config import settings
+
+if TYPE_CHECKING:
+    from services.progress import ProgressStream
+
+USER_AGENT = (
+    "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 "
+    "(KHTML, like Gecko) Chrome/124.0 Safari/537.36"
+)
+
+CHUNK_SIZE = 256 * 1024
+
+_session: aiohttp.ClientSession | None = None
+
+
+def get_http_session() -> aiohttp.ClientSession:
+    """Process-wide session (keep-alive pool), created on first use."""
+    global _session
+    if _session is None or _session.closed:
+        _session = aiohttp.ClientSession(
+            headers={"User-Agent": USER_AGENT},
+            timeout=aiohttp.ClientTimeout(total=None, sock_connect=10, sock_read=30),
+            connector=aiohttp.TCPConnector(limit=64, ttl_dns_cache=300),
+        )
+    return _session
+
+
+async def close_http_session() -> None:
+    global _session
+    if _session is not None:
+        await _session.close()
+        _session = None
+
+
+async def fetch_json(url: str, **kwargs: Any) -> Any:
+    """GET ``url`` and decode the JSON body, raising on HTTP errors."""
+    async with get_http_session().get(url, raise_for_status=True, **kwargs) as response:
+        return await response.json(content_type=None)
+
+
+async def resolve_redirects(url: str) -> str:
+    """Final URL of a short link (redirects followed, body not read)."""
+    async with get_http_session().head(
+        url, allow_redirects=True, raise_for_status=True
+    ) as response:
+        return str(response.url)
+
+
+class TransferProgress:
+    """
+    Bytes of concurrent HTTP downloads reported as one yt-dlp-style progress.
+
+    Feeds ``ProgressStream.progress_hook``, so direct downloads show up in
+    the progress message and the journal like yt-dlp ones.
+    """
+
+    def __init__(self, progress: "ProgressStream | None"):
+        self.progress = progress
+        self.total = 0
+        self.downloaded = 0
+        self.started = time.monotonic()
+
+    def expect(self, size: int) -> None:
+        self.total += size
+
+    def advance(self, size: int, tmpfilename: str) -> None:
+        self.downloaded += size
+        if self.progress is None:
+            return
+        elapsed = time.monotonic() - self.started
+        speed = self.downloaded / elapsed if elapsed > 0 else None
+        eta = None
+        if speed and self.total > self.downloaded:
+            eta = int((self.total - self.downloaded) / speed)
+        self.progress.progress_hook(
+            {
+                "status": "downloading",
+                "downloaded_bytes": self.downloaded,
+                "total_bytes": self.total or None,
+                "speed": speed,
+                "eta": eta,
+                "tmpfilename": tmpfilename,
+            }
+        )
+
+
+async def download_file(
+    url: str, path: str, transfer: TransferProgress | None = None
+) -> int:
+    """
+    Stream ``url`` into ``path`` and return its size.
+
+    Data goes to ``path.part`` first; a part left by an interrupted run is
+    continued with a Range request when the server supports it. The part is
+    removed only when the user cancelled the job.
+    """
+    if os.path.exists(path):
+        return os.path.getsize(path)
+
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    part = f"{path}.part"
+    offset = os.path.getsize(part) if os.path.exists(part) else 0
+    headers = {"Range": f"bytes={offset}-"} if offset else {}
+    if transfer is not None and transfer.progress is not None:
+        transfer.progress.track_file(path)
+
+    try:
+        async with get_http_session().get(
+            url, headers=headers, raise_for_status=True
+        ) as response:
+            if response.status != 206:
+                offset = 0
+            if transfer is not None:
+                transfer.expect(offset + (response.content_length or 0))
+                transfer.advance(offset, part)
+            with open(part, "ab" if offset else "wb") as f:
+                async for chunk in response.content.iter_chunked(CHUNK_SIZE):
+                    f.write(chunk)
+                    if transfer is not None:
+                        transfer.advance(len(chunk), part)
+    except asyncio.CancelledError:
+        # Отмена пользователем: cleanup_partials сюда не дотягивается.
+        # При остановке бота часть остаётся для докачки после перезапуска
+        progress = transfer.progress if transfer is not None else None
+        if progress is not None and progress.cancelled:
+            with contextlib.suppress(OSError):
+                os.remove(part)
+        raise
+    os.replace(part, path)
+    return os.path.getsize(path)
+
+
+async def localize(item: dict[str, Any]) -> None:
+    """Download an item that was to be sent by ``media_url``, for a normal upload."""
+    url = item["media_url"]
+    name = hashlib.blake2b(url.encode(), digest_size=8).hexdigest()
+    ext = os.path.splitext(urlsplit(url).path)[1] or ".bin"
+    path = str(Path(settings.temp_dir) / f"remote_{name}{ext}")
+    item["file_size"] = await download_file(url, path)
+    item["file_path"] = path
+    del item["media_url"]
@@ -1,46 +1,139 @@
 """Instagram downloader."""
+import asyncio
 import os
+import shutil
+import urllib.parse
 from pathlib import Path
-from typing import Dict, Any
+from typing import TYPE_CHECKING, Dict, Any, List, Optional
+
+from loguru import logger
 
 from config import settings
+from downloaders.common import direct_url, media_metadata, run_blocking, url_item
+from downloaders.registry import register_downloader
+from downloaders.ydl_pool import ydl_pool
+
+if TYPE_CHECKING:
+    from services.progress import ProgressStream
+
+VIDEO_EXTENSIONS = ['.mp4', '.mov', '.webm']
 
 
-async def download_instagram_content(url: str) -> Dict[str, Any]:
-    """Download Instagram content (photo or video)."""
+@register_downloader("instagram")
+async def download_instagram_content(
+    url: str, progress: Optional["ProgressStream"] = None
+) -> Dict[str, Any]:
+    """
+    Download Instagram content (photo, video or a carousel post).
+
+    Carousel entries are fetched in parallel (at most
+    ``instagram_fetch_concurrency`` at once) and returned as ``items``.
+    """
     try:
-        import yt_dlp
-        
-        output_dir = Path(settings.temp_dir)
-        output_dir.mkdir(parents=True, exist_ok=True)
-        
-        ydl_opts = {
-            'format': 'best',
-            'outtmpl': str(output_dir / 'instagram_%(id)s.%(ext)s'),
-            'quiet': True,
-            'no_warnings': True,
-        }
-        
-        with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-            info = ydl.extract_info(url, download=True)
-            filename = ydl.prepare_filename(info)
-            
-            # Determine content type
-            ext = Path(filename).suffix.lower()
-            content_type = "video" if ext in ['.mp4', '.mov', '.webm'] else "photo"
-            
-            # Get file size
-            file_size = os.path.getsize(filename) if os.path.exists(filename) else 0
-            
-            return {
-                "success": True,
-                "file_path": filename,
-                "content_type": content_type,
-                "file_size": file_size,
-                "title": info.get("title", "Instagram Content"),
-            }
+        # yt-dlp блокирующий - выполняем в потоке, чтобы не стопорить event loop
+        info = await run_blocking(_extract_instagram_info, url, progress)
+
+        entries = [entry for entry in info.get("entries") or [] if entry]
+        if not entries:
+            entries = [info]
+        for entry in entries:
+            for key in ("extractor", "extractor_key", "webpage_url"):
+                entry.setdefault(key, info.get(key))
+
+        semaphore = asyncio.Semaphore(settings.instagram_fetch_concurrency)
+
+        async def fetch(entry: Dict[str, Any]) -> Dict[str, Any]:
+            async with semaphore:
+                return await run_blocking(_download_instagram_entry, entry, progress)
+
+        items = await asyncio.gather(*(fetch(entry) for entry in entries))
     except Exception as e:
         return {
             "success": False,
             "error": str(e)
         }
+
+    return {
+        "success": True,
+        "file_path": items[0].get("file_path"),
+        "content_type": items[0]["content_type"],
+        "file_size": sum(item["file_size"] for item in items),
+        "title": info.get("title", "Instagram Content"),
+        "items": items,
+    }
+
+
+def _extract_instagram_info(url: str, progress: Optional["ProgressStream"]) -> Dict[str, Any]:
+    """Extract post info (without downloading) on a leased session."""
+    with ydl_pool.lease("instagram", progress) as ydl:
+        # Без обработки: фото карусели не имеют видео-форматов
+        info = ydl.extract_info(url, download=False, process=False)
+        if info.get("entries") is not None:
+            info["entries"] = list(info["entries"])
+        return info
+
+
+def _download_instagram_entry(
+    entry: Dict[str, Any], progress: Optional["ProgressStream"]
+) -> Dict[str, Any]:
+    """
+    Download one (already extracted) media item of a post.
+
+    Items Telegram can fetch from the CDN itself are returned with a
+    ``media_url`` instead of being downloaded.
+    """
+    with ydl_pool.lease("instagram_media", progress) as ydl:
+        if entry.get("formats") or entry.get("url"):
+            info = ydl.process_ie_result(entry, download=False)
+            content_type = "video" if f".{info.get('ext')}" in VIDEO_EXTENSIONS else "photo"
+            media_url = direct_url(info, content_type)
+            if media_url:
+                return url_item(info, content_type, media_url)
+            info = ydl.process_ie_result(info, download=True)
+            filename = ydl.prepare_filename(info)
+            metadata = media_metadata(info)
+        else:
+            # Фото в карусели приходят без форматов - только как thumbnails
+            image = _best_thumbnail(entry)
+            ext = Path(urllib.parse.urlsplit(image["url"]).path).suffix.lstrip(".")
+            media_url = direct_url({**image, "ext": ext or "jpg"}, "photo")
+            if media_url:
+                return url_item(image, "photo", media_url)
+            filename = _download_image(ydl, entry, image, progress)
+            metadata = {}
+
+    # Determine content type
+    ext = Path(filename).suffix.lower()
+    content_type = "video" if ext in VIDEO_EXTENSIONS else "photo"
+
+    # Get file size
+    file_size = os.path.getsize(filename) if os.path.exists(filename) else 0
+
+    return {
+        "file_path": filename,
+        "content_type": content_type,
+        "file_size": file_size,
+        **metadata,
+    }
+
+
+def _best_thumbnail(entry: Dict[str, Any]) -> Dict[str, Any]:
+    thumbnails: List[Dict[str, Any]] = [t for t in entry.get("thumbnails") or [] if t.get("url")]
+    if not thumbnails:
+        raise ValueError(f"No media found for Instagram item {entry.get('id')}")
+    return max(thumbnails, key=lambda t: (t.get("width") or 0) * (t.get("height") or 0))
+
+
+def _download_image(
+    ydl, entry: Dict[str, Any], best: Dict[str, Any], progress: Optional["ProgressStream"]
+) -> str:
+    filename = str(Path(settings.temp_dir) / f"instagram_{entry['id']}.jpg")
+    if progress:
+        progress.check_cancelled()
+        progress.track_file(filename)
+    if not os.path.exists(filename):
+        with ydl.urlopen(best["url"]) as response, open(f"{filename}.part", "wb") as f:
+            shutil.copyfileobj(response, f)
+        os.replace(f"{filename}.part", filename)
+    logger.debug(f"Downloaded Instagram image {entry.get('id')}")
+    return filename
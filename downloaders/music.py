@@ -0,0 +1,109 @@
+"""Rule-based music classifier for YouTube info dicts."""
+
+import re
+from collections.abc import Iterable
+from typing import Any
+
+# Score at which content is treated as music
+THRESHOLD = 3
+
+# Field -> (pattern, weight). Patterns match at the start of a word of the
+# lowercased value (a space in a pattern stands for the word separator);
+# list fields (tags) are matched one item per line. Weak signals (1-2) only
+# count together with others: "mv", "official" or "records" alone are too
+# common outside music.
+RULES: dict[str, list[tuple[str, int]]] = {
+    "categories": [
+        (r"music$", 3),
+    ],
+    "uploader": [
+        (r"\S*vevo$", 3),
+        (r"- topic$", 3),
+        (r"(?:records|recordings|music)$", 1),
+    ],
+    "genre": [
+        (r"\S", 3),
+    ],
+    "title": [
+        (r"official (?:music video|audio|lyric video|visuali[sz]er)\b", 3),
+        (r"(?:music|lyrics?) video\b", 3),
+        (
+            r"[(\[] ?(?:official )?(?:audio|lyrics?|m/?v|visuali[sz]er|hd audio) ?[)\]]",
+            3,
+        ),
+        (r"full album\b", 3),
+        (r"(?:ost|soundtrack|original sound(?:track)?)\b", 3),
+        (r"lyrics\b", 2),
+        (r"official video\b", 2),
+        (r"(?:remix|instrumental|acoustic version|karaoke)\b", 2),
+        (r"m/?v\b", 1),
+        (r"(?:feat|ft)\. ", 1),
+    ],
+    "tags": [
+        (r"(?:music|song|official audio|lyrics|music video)$", 1),
+    ],
+}
+
+# Слова каждого поля разделены своим символом: правило поля начинается с
+# него, поэтому одна регулярка по всем полям не путает поля между собой
+_SEPARATORS = {field: chr(1 + i) for i, field in enumerate(RULES)}
+
+
+def _compile() -> tuple[re.Pattern, list[int]]:
+    branches, weights = [], []
+    for field, rules in RULES.items():
+        separator = re.escape(_SEPARATORS[field])
+        for rule, weight in rules:
+            branches.append(f"{separator}({rule.replace(' ', separator)})")
+            weights.append(weight)
+    # Все ветки начинаются с разделителя - движок пробует правила только в
+    # начале слов
+    return re.compile("|".join(branches), re.MULTILINE), weights
+
+
+_PATTERN, _WEIGHTS = _compile()
+
+
+def _document(info: dict[str, Any]) -> str:
+    """All classified fields of an info dict as one normalized string."""
+    lines = []
+    for field, separator in _SEPARATORS.items():
+        value = info.get(field)
+        if not value:
+            continue
+        if isinstance(value, (list, tuple)):
+            # Элемент списка - отдельная строка, чтобы работали якоря ^/$
+            text = "\n".join(str(item) for item in value if item).lower()
+            text = text.replace("\n", f"\n{separator}")
+        else:
+            text = str(value).lower()
+        # Скобки отделяем, чтобы "(Audio)" начиналось с начала слова
+        lines.append(
+            separator
+            + text.replace(" ", separator)
+            .replace("(", f"{separator}(")
+            .replace("[", f"{separator}[")
+        )
+    return "\n".join(lines)
+
+
+def music_score(info: dict[str, Any]) -> int:
+    """Sum of the weights of the rules matched by an info dict."""
+    matched = {match.lastindex for match in _PATTERN.finditer(_document(info))}
+    score = sum(_WEIGHTS[index - 1] for index in matched)
+
+    # Короткий ролик с другими признаками музыки - почти наверняка трек
+    duration = info.get("duration") or 0
+    if score and 0 < duration < 600:
+        score += 1
+    return score
+
+
+def is_music(info: dict[str, Any]) -> bool:
+    """Whether an info dict describes music (sent as audio)."""
+    return music_score(info) >= THRESHOLD
+
+
+def classify_batch(infos: Iterable[dict[str, Any]]) -> list[bool]:
+    """``is_music`` for many info dicts."""
+    return [music_score(info) >= THRESHOLD for info in infos]
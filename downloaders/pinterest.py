@@ -0,0 +1,141 @@
+"""Pinterest downloader: image pins from the page JSON, video pins via yt-dlp."""
+
+import json
+import os
+import re
+from collections.abc import Iterator
+from pathlib import Path
+from typing import TYPE_CHECKING, Any
+from urllib.parse import urlsplit
+
+from loguru import logger
+
+from downloaders.common import media_metadata, run_blocking
+from downloaders.http import get_http_session, resolve_redirects
+from downloaders.registry import register_downloader
+from downloaders.router import route
+from downloaders.ydl_pool import ydl_pool
+
+if TYPE_CHECKING:
+    from services.progress import ProgressStream
+
+PIN_URL = "https://www.pinterest.com/pin/{}/"
+
+_JSON_SCRIPTS = re.compile(
+    r'<script[^>]*type="application/json"[^>]*>(.*?)</script>', re.DOTALL
+)
+
+
+def find_pin(html: str, pin_id: str) -> dict[str, Any] | None:
+    """
+    Data of pin ``pin_id`` from the JSON embedded in its page.
+
+    Both the older ``__PWS_DATA__`` (``id``, ``images``) and the relay
+    (``entityId``, ``imageSpec_orig``) page formats are understood.
+    """
+    for match in _JSON_SCRIPTS.finditer(html):
+        try:
+            data = json.loads(match.group(1))
+        except ValueError:
+            continue
+        for node in _walk(data):
+            if str(node.get("id") or node.get("entityId")) != pin_id:
+                continue
+            if any(key in node for key in ("images", "imageSpec_orig", "videos")):
+                return node
+    return None
+
+
+def original_image(pin: dict[str, Any]) -> str | None:
+    """URL of the full-size image of a pin."""
+    orig = (pin.get("images") or {}).get("orig") or pin.get("imageSpec_orig") or {}
+    return orig.get("url")
+
+
+def is_video_pin(pin: dict[str, Any]) -> bool:
+    # Идеи (story pins) почти всегда содержат видео - их разбирает yt-dlp
+    return bool(
+        pin.get("videos") or pin.get("story_pin_data") or pin.get("storyPinData")
+    )
+
+
+def _walk(data: Any) -> Iterator[dict[str, Any]]:
+    stack = [data]
+    while stack:
+        node = stack.pop()
+        if isinstance(node, dict):
+            yield node
+            stack.extend(node.values())
+        elif isinstance(node, list):
+            stack.extend(node)
+
+
+@register_downloader("pinterest")
+async def download_pinterest_content(
+    url: str, progress: "ProgressStream | None" = None
+) -> dict[str, Any]:
+    """
+    Download a Pinterest pin.
+
+    Image pins cost one page request: the original image is returned as
+    ``media_url`` for Telegram to fetch itself, nothing is stored locally.
+    Video pins (and pages the JSON could not be read from) go through
+    yt-dlp.
+    """
+    try:
+        url, pin = await _fetch_pin(url)
+    except Exception as e:
+        logger.warning(f"Failed to read Pinterest pin {url}: {e}")
+        pin = None
+
+    image = original_image(pin) if pin and not is_video_pin(pin) else None
+    if image:
+        gif = urlsplit(image).path.lower().endswith(".gif")
+        return {
+            "success": True,
+            "content_type": "document" if gif else "photo",
+            "media_url": image,
+            "file_size": 0,
+            "title": pin.get("title") or pin.get("grid_title") or "Pinterest Content",
+        }
+
+    # yt-dlp блокирующий - выполняем в потоке, чтобы не стопорить event loop
+    return await run_blocking(_download_pinterest_video, url, progress)
+
+
+async def _fetch_pin(url: str) -> tuple[str, dict[str, Any] | None]:
+    """Canonical pin URL and the pin's data (``None`` if not found in the page)."""
+    link = route(url)
+    # pin.it - короткая ссылка, id пина есть только в адресе после редиректа
+    if link is not None and link.parts.hostname.endswith("pin.it"):
+        link = route(await resolve_redirects(url if "://" in url else f"https://{url}"))
+    if link is None or not (link.media_id or "").isdigit():
+        raise ValueError("Не удалось найти пин по ссылке")
+
+    pin_url = PIN_URL.format(link.media_id)
+    async with get_http_session().get(pin_url, raise_for_status=True) as response:
+        html = await response.text()
+    return pin_url, find_pin(html, link.media_id)
+
+
+def _download_pinterest_video(
+    url: str, progress: "ProgressStream | None"
+) -> dict[str, Any]:
+    try:
+        with ydl_pool.lease("pinterest", progress) as ydl:
+            info = ydl.extract_info(url, download=True)
+            filename = ydl.prepare_filename(info)
+
+        ext = Path(filename).suffix.lower()
+        content_type = "video" if ext in (".mp4", ".mov", ".webm") else "photo"
+        file_size = os.path.getsize(filename) if os.path.exists(filename) else 0
+        return {
+            "success": True,
+            "file_path": filename,
+            "content_type": content_type,
+            "file_size": file_size,
+            "title": info.get("title", "Pinterest Content"),
+            **media_metadata(info),
+        }
+    except Exception as e:
+        return {"success": False, "error": str(e)}
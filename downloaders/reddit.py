@@ -0,0 +1,317 @@
+"""Reddit downloader: posts are read through the JSON API, media fetched directly."""
+
+import asyncio
+import os
+import re
+import xml.etree.ElementTree as ET
+from dataclasses import dataclass
+from pathlib import Path
+from typing import TYPE_CHECKING, Any
+from urllib.parse import urljoin, urlsplit
+
+from loguru import logger
+
+from config import settings
+from downloaders.common import format_post
+from downloaders.http import (
+    TransferProgress,
+    download_file,
+    fetch_json,
+    get_http_session,
+    resolve_redirects,
+)
+from downloaders.registry import register_downloader
+from downloaders.router import route
+from services.postprocess import postprocessor
+
+if TYPE_CHECKING:
+    from services.progress import ProgressStream
+
+POST_URL = "https://www.reddit.com/comments/{}.json?raw_json=1"
+
+# Gallery items downloaded at once
+FETCH_CONCURRENCY = 4
+
+# Запас на контейнер: битрейт в манифесте средний, не пиковый
+SIZE_MARGIN = 0.9
+
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".gif", ".webp")
+
+_DURATION = re.compile(r"PT(?:([\d.]+)H)?(?:([\d.]+)M)?(?:([\d.]+)S)?")
+
+
+@dataclass(frozen=True)
+class Representation:
+    """One stream of a DASH manifest."""
+
+    kind: str
+    url: str
+    bandwidth: int
+    width: int = 0
+    height: int = 0
+
+
+def parse_dash_manifest(
+    text: str, manifest_url: str
+) -> tuple[list[Representation], float]:
+    """Video and audio representations of an MPD and its duration in seconds."""
+    root = ET.fromstring(text)
+    # Пространство имён MPD отличается между версиями - сравниваем локальные имена
+    for element in root.iter():
+        element.tag = element.tag.rpartition("}")[2]
+
+    duration = 0.0
+    match = _DURATION.fullmatch(root.get("mediaPresentationDuration", ""))
+    if match:
+        hours, minutes, seconds = (float(value or 0) for value in match.groups())
+        duration = hours * 3600 + minutes * 60 + seconds
+
+    representations = []
+    for adaptation in root.iter("AdaptationSet"):
+        for element in adaptation.iter("Representation"):
+            base_url = element.findtext("BaseURL")
+            if not base_url:
+                continue
+            mime = element.get("mimeType") or adaptation.get("mimeType") or ""
+            kind = adaptation.get("contentType") or mime.partition("/")[0]
+            if kind not in ("video", "audio"):
+                kind = "video" if element.get("height") else "audio"
+            representations.append(
+                Representation(
+                    kind=kind,
+                    url=urljoin(manifest_url, base_url.strip()),
+                    bandwidth=int(element.get("bandwidth") or 0),
+                    width=int(element.get("width") or 0),
+                    height=int(element.get("height") or 0),
+                )
+            )
+    return representations, duration
+
+
+def select_representations(
+    representations: list[Representation], duration: float, budget_bytes: int
+) -> tuple[Representation, Representation | None]:
+    """
+    Best audio and the best video that fits the budget together with it.
+
+    If no video fits, the smallest one is taken: the size check after the
+    download reports it (or the result is re-encoded).
+    """
+    videos = sorted(
+        (r for r in representations if r.kind == "video"),
+        key=lambda r: r.bandwidth,
+        reverse=True,
+    )
+    if not videos:
+        raise ValueError("No video stream in the DASH manifest")
+    audio = max(
+        (r for r in representations if r.kind == "audio"),
+        key=lambda r: r.bandwidth,
+        default=None,
+    )
+
+    audio_bandwidth = audio.bandwidth if audio else 0
+    for video in videos:
+        size = (video.bandwidth + audio_bandwidth) * duration / 8
+        if size <= budget_bytes * SIZE_MARGIN:
+            return video, audio
+    return videos[-1], audio
+
+
+def post_text(post: dict[str, Any]) -> str:
+    """Title, body and link of a post as an HTML message."""
+    link = post.get("url") if not post.get("is_self") else ""
+    return format_post(post.get("title") or "", post.get("selftext") or "", link)
+
+
+@register_downloader("reddit")
+async def download_reddit_content(
+    url: str, progress: "ProgressStream | None" = None
+) -> dict[str, Any]:
+    """
+    Download a Reddit post.
+
+    Videos come from the ``v.redd.it`` DASH manifest: the video and audio
+    representations are fetched concurrently and muxed with stream copy.
+    Galleries are returned as ``items``; text and link posts need only the
+    JSON API and are returned as ``text`` without any file.
+    """
+    try:
+        post = await _fetch_post(url)
+        title = post.get("title") or "Reddit Content"
+
+        video = (post.get("secure_media") or post.get("media") or {}).get(
+            "reddit_video"
+        ) or (post.get("preview") or {}).get("reddit_video_preview")
+        if video:
+            item = await _download_video(post["id"], video, progress)
+            return {"success": True, "title": title, **item}
+
+        if post.get("is_gallery") and post.get("gallery_data"):
+            items = await _download_gallery(post, progress)
+            return {
+                "success": True,
+                "file_path": items[0]["file_path"],
+                "content_type": items[0]["content_type"],
+                "file_size": sum(item["file_size"] for item in items),
+                "title": title,
+                "items": items,
+            }
+
+        image_url = post.get("url_overridden_by_dest") or post.get("url") or ""
+        if urlsplit(image_url).path.lower().endswith(IMAGE_EXTENSIONS):
+            item = await _download_image(image_url, f"reddit_{post['id']}", progress)
+            return {"success": True, "title": title, **item}
+
+        return {
+            "success": True,
+            "content_type": "text",
+            "text": post_text(post),
+            "file_size": 0,
+            "title": title,
+        }
+    except Exception as e:
+        return {"success": False, "error": str(e)}
+
+
+async def _fetch_post(url: str) -> dict[str, Any]:
+    """Post data from the JSON API (the original one for crossposts)."""
+    link = route(url)
+    # Короткие ссылки (redd.it, v.redd.it, /s/) указывают на пост редиректом
+    if link is not None and (
+        link.parts.hostname.endswith("redd.it") or "/s/" in link.parts.path
+    ):
+        link = route(await resolve_redirects(url if "://" in url else f"https://{url}"))
+    if link is None or link.platform != "reddit" or not link.media_id:
+        raise ValueError("Не удалось найти пост Reddit по ссылке")
+
+    listing = await fetch_json(POST_URL.format(link.media_id))
+    post = listing[0]["data"]["children"][0]["data"]
+    if post.get("crosspost_parent_list"):
+        post = post["crosspost_parent_list"][0]
+    return post
+
+
+async def _download_video(
+    post_id: str, video: dict[str, Any], progress: "ProgressStream | None"
+) -> dict[str, Any]:
+    target = str(Path(settings.temp_dir) / f"reddit_{post_id}.mp4")
+    metadata = {
+        key: int(video[key])
+        for key in ("duration", "width", "height")
+        if video.get(key)
+    }
+    if os.path.exists(target):
+        return _file_item(target, "video", metadata)
+
+    video_stream, audio_stream = await _select_streams(video)
+    if video_stream.height:
+        metadata.update(width=video_stream.width, height=video_stream.height)
+
+    video_path = f"{target}.video.mp4"
+    audio_path = f"{target}.audio.mp4"
+    transfer = TransferProgress(progress)
+    downloads = [download_file(video_stream.url, video_path, transfer)]
+    if audio_stream is not None:
+        downloads.append(download_file(audio_stream.url, audio_path, transfer))
+    await asyncio.gather(*downloads)
+
+    if audio_stream is None:
+        os.replace(video_path, target)
+    else:
+        if progress is not None:
+            progress.track_file(target)
+        await postprocessor.mux(video_path, audio_path, target)
+        os.remove(video_path)
+        os.remove(audio_path)
+    logger.debug(f"Downloaded Reddit video {post_id}")
+    return _file_item(target, "video", metadata)
+
+
+async def _select_streams(
+    video: dict[str, Any],
+) -> tuple[Representation, Representation | None]:
+    dash_url = video.get("dash_url")
+    if dash_url:
+        try:
+            async with get_http_session().get(
+                dash_url, raise_for_status=True
+            ) as response:
+                text = await response.text()
+            representations, duration = parse_dash_manifest(text, dash_url)
+            return select_representations(
+                representations,
+                duration or video.get("duration") or 0,
+                settings.max_file_size_mb * 1024 * 1024,
+            )
+        except (ET.ParseError, ValueError) as e:
+            logger.warning(f"Bad Reddit DASH manifest {dash_url}: {e}")
+    if not video.get("fallback_url"):
+        raise ValueError("No playable stream in the Reddit post")
+    # Запасной вариант - готовый mp4 без звука
+    return Representation("video", video["fallback_url"], 0), None
+
+
+async def _download_gallery(
+    post: dict[str, Any], progress: "ProgressStream | None"
+) -> list[dict[str, Any]]:
+    media = post.get("media_metadata") or {}
+    sources = []
+    for entry in post["gallery_data"].get("items") or []:
+        meta = media.get(entry.get("media_id")) or {}
+        if meta.get("status") != "valid":
+            continue
+        source = meta.get("s") or {}
+        if source.get("mp4"):
+            sources.append((source["mp4"], ".mp4"))
+        elif source.get("u") or source.get("gif"):
+            image_url = source.get("u") or source["gif"]
+            sources.append((image_url, Path(urlsplit(image_url).path).suffix))
+    if not sources:
+        raise ValueError("No media found in the Reddit gallery")
+
+    transfer = TransferProgress(progress)
+    semaphore = asyncio.Semaphore(FETCH_CONCURRENCY)
+
+    async def fetch(index: int, media_url: str, ext: str) -> dict[str, Any]:
+        async with semaphore:
+            return await _download_image(
+                media_url, f"reddit_{post['id']}_{index}", progress, transfer, ext
+            )
+
+    return list(
+        await asyncio.gather(
+            *(fetch(i, media_url, ext) for i, (media_url, ext) in enumerate(sources))
+        )
+    )
+
+
+async def _download_image(
+    media_url: str,
+    name: str,
+    progress: "ProgressStream | None",
+    transfer: TransferProgress | None = None,
+    ext: str | None = None,
+) -> dict[str, Any]:
+    ext = (ext or Path(urlsplit(media_url).path).suffix or ".jpg").lower()
+    path = str(Path(settings.temp_dir) / f"{name}{ext}")
+    await download_file(media_url, path, transfer or TransferProgress(progress))
+    if ext == ".mp4":
+        content_type = "video"
+    elif ext == ".gif":
+        # Анимацию Telegram не примет как фото
+        content_type = "document"
+    else:
+        content_type = "photo"
+    return _file_item(path, content_type)
+
+
+def _file_item(
+    path: str, content_type: str, metadata: dict[str, int] | None = None
+) -> dict[str, Any]:
+    return {
+        "file_path": path,
+        "content_type": content_type,
+        "file_size": os.path.getsize(path),
+        **(metadata or {}),
+    }
@@ -0,0 +1,25 @@
+"""Registry of platform downloaders."""
+
+from collections.abc import Awaitable, Callable
+from typing import TYPE_CHECKING, Any
+
+if TYPE_CHECKING:
+    from services.progress import ProgressStream
+
+Downloader = Callable[[str, "ProgressStream | None"], Awaitable[dict[str, Any]]]
+
+DOWNLOADERS: dict[str, Downloader] = {}
+
+
+def register_downloader(platform: str) -> Callable[[Downloader], Downloader]:
+    """Register ``func`` as the downloader of ``platform``."""
+
+    def decorator(func: Downloader) -> Downloader:
+        DOWNLOADERS[platform] = func
+        return func
+
+    return decorator
+
+
+def get_downloader(platform: str) -> Downloader | None:
+    return DOWNLOADERS.get(platform)
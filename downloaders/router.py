@@ -0,0 +1,113 @@
+"""Host-based URL router: one parse and one dict lookup per link."""
+
+import re
+from collections.abc import Callable
+from dataclasses import dataclass
+from functools import cached_property
+from urllib.parse import SplitResult, parse_qs, urlsplit
+
+
+def _path_id(pattern: str) -> Callable[[SplitResult], str | None]:
+    regex = re.compile(pattern)
+
+    def extract(parts: SplitResult) -> str | None:
+        match = regex.search(parts.path)
+        if match is None:
+            return None
+        return next((group for group in match.groups() if group), None)
+
+    return extract
+
+
+_youtube_path_id = _path_id(r"^/(?:shorts/|embed/|live/|v/)?([\w-]{11})(?:/|$)")
+
+
+def _youtube_id(parts: SplitResult) -> str | None:
+    video_id = parse_qs(parts.query).get("v")
+    if video_id:
+        return video_id[0]
+    return _youtube_path_id(parts)
+
+
+@dataclass(frozen=True)
+class Route:
+    """A supported site: its platform and how to pull a media id from a URL."""
+
+    platform: str
+    media_id: Callable[[SplitResult], str | None]
+
+
+# Registrable domain -> route; subdomains (www., m., vm., vt., music., ...)
+# resolve to the same route
+ROUTES = {
+    "tiktok.com": Route("tiktok", _path_id(r"/video/(\d+)|^/(?:t/)?(?!@)([\w-]+)")),
+    "youtube.com": Route("youtube", _youtube_id),
+    "youtu.be": Route("youtube", _path_id(r"^/([\w-]{11})")),
+    "instagram.com": Route("instagram", _path_id(r"/(?:p|reels?|tv)/([\w-]+)")),
+    "twitter.com": Route("twitter", _path_id(r"/status(?:es)?/(\d+)")),
+    "x.com": Route("twitter", _path_id(r"/status(?:es)?/(\d+)")),
+    "reddit.com": Route("reddit", _path_id(r"/comments/(\w+)|^/r/\w+/s/(\w+)")),
+    "redd.it": Route("reddit", _path_id(r"^/(\w+)")),
+    "pinterest.com": Route("pinterest", _path_id(r"/pin/(?:[\w-]*--)?(\d+)")),
+    "pin.it": Route("pinterest", _path_id(r"^/(\w+)")),
+}
+
+
+@dataclass(frozen=True)
+class RouteMatch:
+    """A URL resolved to a platform."""
+
+    url: str
+    route: Route
+    parts: SplitResult
+
+    @property
+    def platform(self) -> str:
+        return self.route.platform
+
+    @cached_property
+    def media_id(self) -> str | None:
+        return self.route.media_id(self.parts)
+
+    @property
+    def media_key(self) -> str | None:
+        """``platform:media_id`` key for caches, if the id is known."""
+        media_id = self.media_id
+        return f"{self.platform}:{media_id}" if media_id else None
+
+
+def route(url: str) -> RouteMatch | None:
+    """Resolve a (possibly scheme-less) URL to its platform, or ``None``."""
+    # Дешёвый отсев обычных слов из текста сообщения
+    if "." not in url:
+        return None
+    try:
+        parts = urlsplit(url if "://" in url else f"//{url}")
+        host = parts.hostname
+    except ValueError:
+        return None
+    if not host:
+        return None
+
+    # Пробуем хост целиком, затем без левых поддоменов
+    while True:
+        found = ROUTES.get(host)
+        if found is not None:
+            return RouteMatch(url, found, parts)
+        _, dot, host = host.partition(".")
+        if not dot or "." not in host:
+            return None
+
+
+def _legacy_pattern(platform: str) -> str:
+    domains = "|".join(
+        re.escape(domain) for domain, r in ROUTES.items() if r.platform == platform
+    )
+    return rf"(?:https?://)?(?:[\w-]+\.)*(?:{domains})"
+
+
+# Regex form of the routes, for callers that match free text
+URL_PATTERNS = {
+    platform: _legacy_pattern(platform)
+    for platform in dict.fromkeys(r.platform for r in ROUTES.values())
+}
@@ -0,0 +1,346 @@
+"""Per-platform pools of long-lived extractor sessions."""
+
+import base64
+import json
+import shutil
+import threading
+import time
+import urllib.parse
+import urllib.request
+from collections.abc import Iterator
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any
+
+from loguru import logger
+
+from config import settings
+from utils.metrics import SESSION_LEASE_SECONDS, SESSION_THROTTLED
+
+# Cookie that proves a logged-in session, per platform
+LOGIN_COOKIES = {"instagram": "sessionid", "twitter": "auth_token"}
+
+# Error fragments yt-dlp surfaces when a platform throttles a session
+THROTTLE_MARKERS = (
+    "429",
+    "rate-limit",
+    "rate limit",
+    "too many requests",
+    "login required",
+    "please wait a few minutes",
+)
+
+TWITTER_TOKEN_URL = "https://api.twitter.com/oauth2/token"
+
+INSTAGRAM_COOKIE_DOMAIN = ".instagram.com"
+# Частые попытки логина Instagram встречает проверкой аккаунта
+LOGIN_RETRY_INTERVAL = 3600.0
+
+
+@dataclass(eq=False)
+class Session:
+    """
+    One cookie jar (optionally logged in) used by one job at a time.
+
+    yt-dlp cannot log in to Instagram itself, so an account session gets its
+    login cookies from ``seed_cookie_file`` (exported from a browser) or from
+    an instaloader login with ``username``/``password``.
+    """
+
+    platform: str
+    name: str
+    cookie_file: Path
+    username: str | None = None
+    password: str | None = None
+    seed_cookie_file: Path | None = None
+    bearer_token: str | None = None
+    login_failed_at: float | None = None
+    throttled_until: float = 0.0
+    strikes: int = 0
+    last_used: float = 0.0
+    leased: bool = False
+    # Pooled YoutubeDL instances bound to this cookie jar, by profile name
+    clients: dict[str, Any] = field(default_factory=dict, repr=False)
+
+    @property
+    def authenticated(self) -> bool:
+        """
+        Logged in for yt-dlp, i.e. has login cookies.
+
+        A ``bearer_token`` is only usable by the Twitter API client, so an
+        app session does not count.
+        """
+        return self.has_login_cookie()
+
+    @property
+    def can_log_in(self) -> bool:
+        return bool(self.seed_cookie_file or (self.username and self.password))
+
+    @property
+    def login_due(self) -> bool:
+        """Login cookies are missing and a login may be attempted now."""
+        if not self.can_log_in or self.has_login_cookie():
+            return False
+        return (
+            self.login_failed_at is None
+            or time.monotonic() - self.login_failed_at >= LOGIN_RETRY_INTERVAL
+        )
+
+    @property
+    def healthy(self) -> bool:
+        return time.monotonic() >= self.throttled_until
+
+    def has_login_cookie(self) -> bool:
+        cookie = LOGIN_COOKIES.get(self.platform)
+        if cookie is None or not self.cookie_file.exists():
+            return False
+        text = self.cookie_file.read_text("utf-8", errors="ignore")
+        return f"\t{cookie}\t" in text
+
+    def log_in(self) -> bool:
+        """
+        Seed the jar with login cookies unless it already has them.
+
+        Instances built on the old jar are dropped, so the next lease
+        rebuilds them on the logged-in one. A failed login is retried after
+        ``LOGIN_RETRY_INTERVAL``; until then the session is anonymous.
+        """
+        if not self.login_due:
+            return False
+
+        self.cookie_file.parent.mkdir(parents=True, exist_ok=True)
+        try:
+            if self.seed_cookie_file and self.seed_cookie_file.exists():
+                shutil.copyfile(self.seed_cookie_file, self.cookie_file)
+            if not self.has_login_cookie() and self.username and self.password:
+                write_cookie_file(
+                    self.cookie_file,
+                    INSTAGRAM_COOKIE_DOMAIN,
+                    instagram_login(self.username, self.password),
+                )
+        except Exception as e:
+            logger.warning(f"{self.platform} session {self.name} login failed: {e}")
+
+        if self.has_login_cookie():
+            self.login_failed_at = None
+            self.clients.clear()
+            logger.info(f"{self.platform} session {self.name} logged in")
+            return True
+        self.login_failed_at = time.monotonic()
+        logger.warning(
+            f"{self.platform} session {self.name} has no login cookie, "
+            "using it anonymously"
+        )
+        return False
+
+    def ydl_opts(self) -> dict[str, Any]:
+        """Options binding a ``YoutubeDL`` to this session's cookie jar."""
+        self.cookie_file.parent.mkdir(parents=True, exist_ok=True)
+        return {"cookiefile": str(self.cookie_file)}
+
+    def reset(self) -> None:
+        """Drop cookies so the next lease starts (or logs in) from scratch."""
+        self.clients.clear()
+        self.cookie_file.unlink(missing_ok=True)
+
+
+class SessionPool:
+    """
+    Sessions of one platform leased exclusively to download jobs.
+
+    A lease prefers healthy sessions that are logged in (their jar holds
+    the login cookie) or about to log in, then the least recently used
+    healthy one; a
+    throttled session is put on an exponential cooldown and the next jobs
+    rotate to other sessions. Leases are taken from downloader threads,
+    hence the threading primitives.
+    """
+
+    def __init__(
+        self,
+        platform: str,
+        sessions: list[Session],
+        cooldown: float = 60.0,
+        max_cooldown: float = 3600.0,
+        reset_after: int = 3,
+    ):
+        self.platform = platform
+        self.sessions = sessions
+        self.cooldown = cooldown
+        self.max_cooldown = max_cooldown
+        self.reset_after = reset_after
+        self._cond = threading.Condition()
+
+    @contextmanager
+    def lease(self, timeout: float | None = None) -> Iterator[Session]:
+        """Hold a session; throttling errors raised in the block are recorded."""
+        started = time.monotonic()
+        with self._cond:
+            if not self._cond.wait_for(self._has_free, timeout):
+                raise TimeoutError(f"No free {self.platform} session")
+            session = self._pick()
+            session.leased = True
+        SESSION_LEASE_SECONDS.labels(self.platform).observe(time.monotonic() - started)
+
+        try:
+            session.log_in()
+            yield session
+        except Exception as e:
+            if is_throttled(e):
+                self.report_throttled(session)
+            raise
+        else:
+            session.strikes = 0
+        finally:
+            with self._cond:
+                session.leased = False
+                session.last_used = time.monotonic()
+                self._cond.notify()
+
+    def report_throttled(self, session: Session) -> None:
+        session.strikes += 1
+        delay = min(self.cooldown * 2 ** (session.strikes - 1), self.max_cooldown)
+        session.throttled_until = time.monotonic() + delay
+        SESSION_THROTTLED.labels(self.platform).inc()
+        logger.warning(
+            f"{self.platform} session {session.name} throttled, "
+            f"cooling down for {delay:.0f}s"
+        )
+        if session.strikes >= self.reset_after:
+            # Сессию, которую режут раз за разом, пересоздаём с нуля
+            session.reset()
+
+    def _has_free(self) -> bool:
+        return any(not session.leased for session in self.sessions)
+
+    def _pick(self) -> Session:
+        free = [session for session in self.sessions if not session.leased]
+        healthy = [session for session in free if session.healthy]
+        if healthy:
+            return min(
+                healthy,
+                key=lambda s: (not (s.authenticated or s.login_due), s.last_used),
+            )
+        # Все свободные на паузе - берём ту, что освободится раньше
+        return min(free, key=lambda s: s.throttled_until)
+
+
+def is_throttled(error: BaseException) -> bool:
+    message = str(error).lower()
+    return any(marker in message for marker in THROTTLE_MARKERS)
+
+
+def instagram_login(username: str, password: str) -> dict[str, str]:
+    """Log in with instaloader and return the session cookies."""
+    import instaloader
+
+    loader = instaloader.Instaloader(quiet=True, max_connection_attempts=1)
+    # Аккаунт с 2FA так не войдёт - для него нужен INSTAGRAM_COOKIES_FILE
+    loader.login(username, password)
+    return loader.save_session()
+
+
+def write_cookie_file(path: Path, domain: str, cookies: dict[str, str]) -> None:
+    """Write cookies of ``domain`` as a Netscape cookie file yt-dlp can load."""
+    expires = int(time.time()) + 365 * 24 * 3600
+    lines = ["# Netscape HTTP Cookie File"]
+    lines.extend(
+        f"{domain}\tTRUE\t/\tTRUE\t{expires}\t{name}\t{value}"
+        for name, value in cookies.items()
+    )
+    tmp = path.with_suffix(".tmp")
+    tmp.write_text("\n".join(lines) + "\n", "utf-8")
+    tmp.replace(path)
+
+
+def fetch_twitter_app_token(api_key: str, api_secret: str) -> str | None:
+    """App-only OAuth2 bearer token for the Twitter API."""
+    credentials = (
+        f"{urllib.parse.quote(api_key)}:{urllib.parse.quote(api_secret)}".encode()
+    )
+    request = urllib.request.Request(
+        TWITTER_TOKEN_URL,
+        data=b"grant_type=client_credentials",
+        headers={
+            "Authorization": f"Basic {base64.b64encode(credentials).decode()}",
+            "Content-Type": "application/x-www-form-urlencoded;charset=UTF-8",
+        },
+    )
+    try:
+        with urllib.request.urlopen(request, timeout=10) as response:
+            return json.load(response)["access_token"]
+    except Exception as e:
+        logger.warning(f"Failed to obtain Twitter app token: {e}")
+        return None
+
+
+def build_pool(platform: str) -> SessionPool:
+    """Pool of ``session_pool_size`` anonymous sessions plus seeded ones."""
+    directory = Path(settings.storage_dir) / "sessions"
+    sessions = [
+        Session(platform, f"anon{i}", directory / f"{platform}_anon{i}.txt")
+        for i in range(settings.session_pool_size)
+    ]
+
+    if platform == "instagram" and (
+        settings.instagram_cookies_file
+        or (settings.instagram_username and settings.instagram_password)
+    ):
+        sessions.insert(
+            0,
+            Session(
+                platform,
+                "account",
+                directory / "instagram_account.txt",
+                username=settings.instagram_username,
+                password=settings.instagram_password,
+                seed_cookie_file=(
+                    Path(settings.instagram_cookies_file)
+                    if settings.instagram_cookies_file
+                    else None
+                ),
+            ),
+        )
+
+    if (
+        platform == "twitter"
+        and settings.twitter_api_key
+        and settings.twitter_api_secret
+    ):
+        token = fetch_twitter_app_token(
+            settings.twitter_api_key, settings.twitter_api_secret
+        )
+        if token:
+            sessions.insert(
+                0,
+                Session(
+                    platform,
+                    "app",
+                    directory / "twitter_app.txt",
+                    bearer_token=token,
+                ),
+            )
+
+    return SessionPool(platform, sessions)
+
+
+_pools: dict[str, SessionPool] = {}
+_pools_lock = threading.Lock()
+
+
+def session_pool(platform: str) -> SessionPool:
+    """Process-wide session pool of a platform (created on first use)."""
+    with _pools_lock:
+        pool = _pools.get(platform)
+        if pool is None:
+            pool = _pools[platform] = build_pool(platform)
+        return pool
+
+
+def app_bearer_token(platform: str) -> str | None:
+    """Bearer token of the platform's app session, if one is configured."""
+    return next(
+        (s.bearer_token for s in session_pool(platform).sessions if s.bearer_token),
+        None,
+    )
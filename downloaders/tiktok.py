@@ -1,41 +1,52 @@
 """TikTok downloader."""
 import os
-from pathlib import Path
-from typing import Dict, Any
+from typing import TYPE_CHECKING, Dict, Any, Optional
 
-from config import settings
+from downloaders.common import direct_url, media_metadata, run_blocking, url_item
+from downloaders.registry import register_downloader
+from downloaders.ydl_pool import ydl_pool
 
+if TYPE_CHECKING:
+    from services.progress import ProgressStream
 
-async def download_tiktok_video(url: str) -> Dict[str, Any]:
-    """Download TikTok video."""
+
+@register_downloader("tiktok")
+async def download_tiktok_video(
+    url: str, progress: Optional["ProgressStream"] = None
+) -> Dict[str, Any]:
+    """Download TikTok video (or pass its CDN URL on if Telegram can fetch it)."""
+    # yt-dlp блокирующий - выполняем в потоке, чтобы не стопорить event loop
+    return await run_blocking(_download_tiktok_video, url, progress)
+
+
+def _download_tiktok_video(url: str, progress: Optional["ProgressStream"]) -> Dict[str, Any]:
     try:
         # Using yt-dlp for TikTok (most reliable)
-        import yt_dlp
-        
-        output_dir = Path(settings.temp_dir)
-        output_dir.mkdir(parents=True, exist_ok=True)
-        
-        ydl_opts = {
-            'format': 'best',
-            'outtmpl': str(output_dir / 'tiktok_%(id)s.%(ext)s'),
-            'quiet': True,
-            'no_warnings': True,
-        }
-        
-        with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-            info = ydl.extract_info(url, download=True)
-            filename = ydl.prepare_filename(info)
-            
-            # Get file size
-            file_size = os.path.getsize(filename) if os.path.exists(filename) else 0
-            
+        with ydl_pool.lease("tiktok", progress) as ydl:
+            info = ydl.extract_info(url, download=False)
+        media_url = direct_url(info, "video")
+        if media_url:
             return {
                 "success": True,
-                "file_path": filename,
-                "content_type": "video",
-                "file_size": file_size,
                 "title": info.get("title", "TikTok Video"),
+                **url_item(info, "video", media_url),
             }
+        # Ссылку Telegram не скачает - загружаем файл сами, сессия уже свободна
+        with ydl_pool.lease("tiktok_media", progress) as ydl:
+            info = ydl.process_ie_result(info, download=True)
+            filename = ydl.prepare_filename(info)
+        
+        # Get file size
+        file_size = os.path.getsize(filename) if os.path.exists(filename) else 0
+        
+        return {
+            "success": True,
+            "file_path": filename,
+            "content_type": "video",
+            "file_size": file_size,
+            "title": info.get("title", "TikTok Video"),
+            **media_metadata(info),
+        }
     except Exception as e:
         return {
             "success": False,
@@ -1,49 +1,232 @@
 """Twitter/X downloader."""
+import asyncio
+import math
 import os
+from dataclasses import dataclass, field
 from pathlib import Path
-from typing import Dict, Any
+from typing import TYPE_CHECKING, Dict, Any, List, Optional
 
-from config import settings
+from loguru import logger
 
+from downloaders.common import (
+    direct_url,
+    format_post,
+    media_metadata,
+    run_blocking,
+    url_item,
+)
+from downloaders.http import fetch_json
+from downloaders.registry import register_downloader
+from downloaders.router import route
+from downloaders.sessions import app_bearer_token
+from downloaders.ydl_pool import ydl_pool
 
-async def download_twitter_content(url: str) -> Dict[str, Any]:
-    """Download Twitter/X content."""
-    try:
-        import yt_dlp
-        
-        output_dir = Path(settings.temp_dir)
-        output_dir.mkdir(parents=True, exist_ok=True)
-        
-        ydl_opts = {
-            'format': 'best',
-            'outtmpl': str(output_dir / 'twitter_%(id)s.%(ext)s'),
-            'quiet': True,
-            'no_warnings': True,
+if TYPE_CHECKING:
+    from services.progress import ProgressStream
+
+API_TWEET_URL = "https://api.twitter.com/2/tweets/{}"
+API_TWEET_PARAMS = {
+    "expansions": "attachments.media_keys,author_id",
+    "tweet.fields": "text,note_tweet,entities",
+    "media.fields": "type,url",
+    "user.fields": "name,username",
+}
+# Публичный эндпоинт встраиваемых твитов, работает без ключей API
+SYNDICATION_URL = "https://cdn.syndication.twimg.com/tweet-result"
+
+VIDEO_TYPES = ("video", "animated_gif")
+
+
+@dataclass
+class Tweet:
+    """Text, author and media of a tweet, known without downloading anything."""
+
+    author: str
+    username: str
+    text: str
+    photos: List[str] = field(default_factory=list)
+    has_video: bool = False
+
+
+def parse_api_tweet(payload: Dict[str, Any]) -> Tweet:
+    """Tweet from an API v2 ``/2/tweets/:id`` response."""
+    data = payload["data"]
+    includes = payload.get("includes") or {}
+    user = (includes.get("users") or [{}])[0]
+    media = includes.get("media") or []
+    return Tweet(
+        author=user.get("name") or "",
+        username=user.get("username") or "",
+        text=_expand_links((data.get("note_tweet") or data)["text"], data, bool(media)),
+        photos=[item["url"] for item in media if item.get("type") == "photo"],
+        has_video=any(item.get("type") in VIDEO_TYPES for item in media),
+    )
+
+
+def parse_syndication_tweet(payload: Dict[str, Any]) -> Tweet:
+    """Tweet from a syndication ``tweet-result`` response."""
+    if payload.get("__typename") == "TweetTombstone" or "text" not in payload:
+        raise ValueError("Tweet is unavailable")
+    user = payload.get("user") or {}
+    media = payload.get("mediaDetails") or []
+    text = (payload.get("note_tweet") or {}).get("text") or payload["text"]
+    return Tweet(
+        author=user.get("name") or "",
+        username=user.get("screen_name") or "",
+        text=_expand_links(text, payload, bool(media)),
+        photos=[
+            item["media_url_https"] for item in media if item.get("type") == "photo"
+        ],
+        has_video=any(item.get("type") in VIDEO_TYPES for item in media),
+    )
+
+
+def _expand_links(text: str, tweet: Dict[str, Any], has_media: bool) -> str:
+    # t.co ссылки заменяем настоящими, ссылка на само медиа в конце не нужна
+    for url in (tweet.get("entities") or {}).get("urls") or []:
+        if url.get("url") and url.get("expanded_url"):
+            text = text.replace(url["url"], url["expanded_url"])
+    words = text.rsplit(maxsplit=1)
+    if has_media and words and words[-1].startswith("https://t.co/"):
+        text = words[0] if len(words) == 2 else ""
+    return text.strip()
+
+
+def syndication_token(tweet_id: str) -> str:
+    """``((id / 1e15) * Math.PI).toString(36)`` without zeros and the dot."""
+    digits = "0123456789abcdefghijklmnopqrstuvwxyz"
+    value = int(tweet_id) / 1e15 * math.pi
+    whole, fraction = int(value), value - int(value)
+    token = ""
+    while whole:
+        whole, digit = divmod(whole, 36)
+        token = digits[digit] + token
+    for _ in range(11):
+        if not fraction:
+            break
+        fraction *= 36
+        token += digits[int(fraction)]
+        fraction -= int(fraction)
+    return token.replace("0", "")
+
+
+async def fetch_tweet(tweet_id: str) -> Tweet:
+    """
+    Tweet metadata: API v2 with the app session's bearer token if one is
+    configured, the public syndication endpoint otherwise.
+    """
+    # Пул сессий при первом обращении получает токен блокирующим запросом
+    token = await asyncio.to_thread(app_bearer_token, "twitter")
+    if token:
+        try:
+            payload = await fetch_json(
+                API_TWEET_URL.format(tweet_id),
+                params=API_TWEET_PARAMS,
+                headers={"Authorization": f"Bearer {token}"},
+            )
+            return parse_api_tweet(payload)
+        except Exception as e:
+            logger.warning(f"Twitter API lookup of {tweet_id} failed: {e}")
+
+    payload = await fetch_json(
+        SYNDICATION_URL,
+        params={"id": tweet_id, "token": syndication_token(tweet_id), "lang": "en"},
+    )
+    return parse_syndication_tweet(payload)
+
+
+@register_downloader("twitter")
+async def download_twitter_content(
+    url: str, progress: Optional["ProgressStream"] = None
+) -> Dict[str, Any]:
+    """
+    Download Twitter/X content.
+
+    The tweet's text and media list are fetched first: text tweets are
+    returned as ``text`` and image tweets as ``media_url`` items that
+    Telegram fetches itself. Only tweets with video are downloaded, and
+    only if Telegram cannot fetch the video by URL either.
+    """
+    link = route(url)
+    tweet = None
+    if link is not None and link.media_id:
+        try:
+            tweet = await fetch_tweet(link.media_id)
+        except Exception as e:
+            logger.warning(f"Failed to fetch tweet {link.media_id}: {e}")
+
+    if tweet is not None and not tweet.has_video:
+        return _tweet_result(tweet)
+
+    # yt-dlp блокирующий - выполняем в потоке, чтобы не стопорить event loop
+    return await run_blocking(_download_twitter_content, url, progress)
+
+
+def _tweet_result(tweet: Tweet) -> Dict[str, Any]:
+    title = f"{tweet.author} (@{tweet.username})" if tweet.username else tweet.author
+    if not tweet.photos:
+        return {
+            "success": True,
+            "content_type": "text",
+            "text": format_post(title or "Twitter", tweet.text),
+            "file_size": 0,
+            "title": title or "Twitter Content",
         }
-        
-        with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-            info = ydl.extract_info(url, download=True)
-            filename = ydl.prepare_filename(info)
-            
-            # Determine content type
-            ext = Path(filename).suffix.lower()
-            if ext in ['.mp4', '.mov', '.webm']:
-                content_type = "video"
-            elif ext in ['.jpg', '.jpeg', '.png', '.webp']:
-                content_type = "photo"
-            else:
-                content_type = "text"
-            
-            # Get file size
-            file_size = os.path.getsize(filename) if os.path.exists(filename) else 0
-            
+
+    # large - до 2048px, укладывается в лимит Telegram на фото по ссылке
+    items = [
+        {"content_type": "photo", "media_url": f"{photo}?name=large", "file_size": 0}
+        for photo in tweet.photos
+    ]
+    # Текст твита в заголовке, как у видео из yt-dlp («автор - текст»)
+    caption = f"{tweet.author} - {tweet.text}" if tweet.text else title
+    result = {
+        "success": True,
+        "content_type": "photo",
+        "file_size": 0,
+        "title": caption or "Twitter Content",
+    }
+    if len(items) == 1:
+        return {**result, **items[0]}
+    return {**result, "items": items}
+
+
+def _download_twitter_content(url: str, progress: Optional["ProgressStream"]) -> Dict[str, Any]:
+    try:
+        with ydl_pool.lease("twitter", progress) as ydl:
+            info = ydl.extract_info(url, download=False)
+        media_url = direct_url(info, "video")
+        if media_url:
             return {
                 "success": True,
-                "file_path": filename,
-                "content_type": content_type,
-                "file_size": file_size,
                 "title": info.get("title", "Twitter Content"),
+                **url_item(info, "video", media_url),
             }
+        # Ссылку Telegram не скачает - загружаем файл сами, сессия уже свободна
+        with ydl_pool.lease("twitter_media", progress) as ydl:
+            info = ydl.process_ie_result(info, download=True)
+            filename = ydl.prepare_filename(info)
+
+        # Determine content type
+        ext = Path(filename).suffix.lower()
+        if ext in ['.mp4', '.mov', '.webm']:
+            content_type = "video"
+        elif ext in ['.jpg', '.jpeg', '.png', '.webp']:
+            content_type = "photo"
+        else:
+            content_type = "document"
+
+        # Get file size
+        file_size = os.path.getsize(filename) if os.path.exists(filename) else 0
+
+        return {
+            "success": True,
+            "file_path": filename,
+            "content_type": content_type,
+            "file_size": file_size,
+            "title": info.get("title", "Twitter Content"),
+            **media_metadata(info),
+        }
     except Exception as e:
         return {
             "success": False,
@@ -0,0 +1,240 @@
+"""Pre-built, reusable YoutubeDL instances per option profile."""
+
+import queue
+from collections.abc import Iterator
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import TYPE_CHECKING, Any
+
+from loguru import logger
+
+from config import settings
+from downloaders.bandwidth import DownloadBudget, install_budget
+from downloaders.sessions import Session, session_pool
+
+if TYPE_CHECKING:
+    from services.progress import ProgressStream
+
+
+YOUTUBE_CLIENT_OPTS = {
+    # Используем Android client для обхода блокировок
+    "extractor_args": {
+        "youtube": {
+            "player_client": ["android", "android_embedded", "ios"],
+            # Пропускаем проблемные форматы; DASH качается кусками по range
+            "skip": ["hls"] if settings.adaptive_downloads else ["hls", "dash"],
+        }
+    },
+    # User-Agent Android YouTube app
+    "http_headers": {
+        "User-Agent": "com.google.android.youtube/19.09.37 (Linux; U; Android 11) gzip",
+        "Accept": "*/*",
+        "Accept-Language": "en-US,en;q=0.9",
+        "Accept-Encoding": "gzip, deflate",
+    },
+    # Повторные попытки
+    "retries": 10,
+    "fragment_retries": 10,
+    "skip_unavailable_fragments": True,
+    # Лимит отправки; задачи, которые пережмут, поднимают его на время аренды
+    "max_filesize": settings.max_file_size_mb * 1024 * 1024,
+    "nocheckcertificate": True,
+    "prefer_free_formats": True,
+    "geo_bypass": True,
+}
+
+
+@dataclass(frozen=True)
+class Profile:
+    """
+    yt-dlp options of one kind of download.
+
+    ``platform`` with ``sessions=True`` binds instances to the platform's
+    session pool (cookie jar, login); otherwise instances are anonymous.
+    """
+
+    name: str
+    platform: str
+    options: dict[str, Any] = field(default_factory=dict)
+    sessions: bool = False
+    # Префикс имени файла, по умолчанию имя профиля
+    outtmpl_prefix: str | None = None
+
+    def build_options(self) -> dict[str, Any]:
+        output_dir = Path(settings.temp_dir)
+        output_dir.mkdir(parents=True, exist_ok=True)
+        return {
+            "outtmpl": str(
+                output_dir / f"{self.outtmpl_prefix or self.name}_%(id)s.%(ext)s"
+            ),
+            "quiet": True,
+            "no_warnings": True,
+            # Перезапущенная задача докачивает .part вместо загрузки с нуля
+            "continuedl": True,
+            "nopart": False,
+            **self.options,
+        }
+
+
+PROFILES = {
+    profile.name: profile
+    for profile in (
+        # Сессия держится только на время извлечения; файлы качаются
+        # профилями *_media без сессии - куки сессии приходят в info["cookies"]
+        Profile("tiktok", "tiktok", {"format": "best"}, sessions=True),
+        Profile(
+            "tiktok_media", "tiktok", {"format": "best"}, outtmpl_prefix="tiktok"
+        ),
+        Profile("instagram", "instagram", {"format": "best"}, sessions=True),
+        Profile(
+            "instagram_media",
+            "instagram",
+            {"format": "best"},
+            outtmpl_prefix="instagram",
+        ),
+        Profile("twitter", "twitter", {"format": "best"}, sessions=True),
+        Profile(
+            "twitter_media", "twitter", {"format": "best"}, outtmpl_prefix="twitter"
+        ),
+        # Только видео-пины: картинки берутся из JSON страницы без yt-dlp
+        Profile("pinterest", "pinterest", {"format": "best"}),
+        Profile(
+            "youtube_video",
+            "youtube",
+            {
+                # Используем комбинированные форматы или fallback на best
+                "format": "bv*[height<=720][ext=mp4]+ba[ext=m4a]/b[height<=720][ext=mp4]/b[height<=720]/best",
+                "merge_output_format": "mp4",
+                **YOUTUBE_CLIENT_OPTS,
+            },
+        ),
+        Profile(
+            "youtube_audio",
+            "youtube",
+            {
+                # AAC remuxes without re-encoding in the post-processing pool
+                "format": "bestaudio[ext=m4a]/bestaudio/best",
+                # Не скачиваем thumbnail - часто вызывает 403
+                "writethumbnail": False,
+                "embedthumbnail": False,
+                **YOUTUBE_CLIENT_OPTS,
+            },
+        ),
+    )
+}
+
+
+class PooledYDL:
+    """
+    A ``YoutubeDL`` built once and leased to one job at a time.
+
+    Hooks are installed once at construction and forward to the progress
+    stream of the current lease; per-lease params (PO token, ...) are set on
+    ``params`` and restored when the lease ends. With adaptive downloads
+    every download takes connections from the CDN's budget, returned when
+    the lease ends.
+    """
+
+    def __init__(self, options: dict[str, Any]):
+        import yt_dlp
+
+        self.progress: ProgressStream | None = None
+        self.ydl = yt_dlp.YoutubeDL(
+            {
+                **options,
+                "progress_hooks": [self._progress_hook],
+                "postprocessor_hooks": [self._postprocessor_hook],
+            }
+        )
+        self.budget: DownloadBudget | None = None
+        if settings.adaptive_downloads:
+            self.budget = install_budget(self.ydl)
+
+    def _progress_hook(self, d: dict[str, Any]) -> None:
+        if self.budget is not None:
+            self.budget.record(d)
+        if self.progress is not None:
+            self.progress.progress_hook(d)
+
+    def _postprocessor_hook(self, d: dict[str, Any]) -> None:
+        if self.progress is not None:
+            self.progress.postprocessor_hook(d)
+
+    @contextmanager
+    def bind(
+        self, progress: "ProgressStream | None", params: dict[str, Any] | None
+    ) -> Iterator[Any]:
+        saved = {key: self.ydl.params.get(key) for key in params or {}}
+        self.ydl.params.update(params or {})
+        self.progress = progress
+        try:
+            yield self.ydl
+        finally:
+            if self.budget is not None:
+                self.budget.release()
+            self.progress = None
+            self.ydl.params.update(saved)
+            if self.ydl.params.get("cookiefile"):
+                self.ydl.save_cookies()
+
+
+class YDLPool:
+    """Free instances of every anonymous profile, grown on demand."""
+
+    def __init__(self):
+        self._free: dict[str, queue.SimpleQueue[PooledYDL]] = {}
+
+    @contextmanager
+    def lease(
+        self,
+        name: str,
+        progress: "ProgressStream | None" = None,
+        params: dict[str, Any] | None = None,
+    ) -> Iterator[Any]:
+        """Hold a ``YoutubeDL`` of profile ``name`` for one job."""
+        profile = PROFILES[name]
+        if profile.sessions:
+            pool = session_pool(profile.platform)
+            with pool.lease(settings.session_lease_timeout) as session:
+                client = self._session_client(profile, session)
+                with client.bind(progress, params) as ydl:
+                    yield ydl
+            return
+
+        free = self._free.setdefault(name, queue.SimpleQueue())
+        try:
+            client = free.get_nowait()
+        except queue.Empty:
+            client = PooledYDL(profile.build_options())
+        try:
+            with client.bind(progress, params) as ydl:
+                yield ydl
+        finally:
+            free.put(client)
+
+    def warm_up(self, per_profile: int = 1) -> None:
+        """Build instances ahead of the first request (runs in a thread)."""
+        for profile in PROFILES.values():
+            try:
+                if profile.sessions:
+                    for session in session_pool(profile.platform).sessions:
+                        self._session_client(profile, session)
+                    continue
+                free = self._free.setdefault(profile.name, queue.SimpleQueue())
+                for _ in range(max(per_profile - free.qsize(), 0)):
+                    free.put(PooledYDL(profile.build_options()))
+            except Exception as e:
+                logger.warning(f"Failed to warm up {profile.name} instances: {e}")
+        logger.info(f"Warmed up yt-dlp instances for {len(PROFILES)} profiles")
+
+    @staticmethod
+    def _session_client(profile: Profile, session: Session) -> PooledYDL:
+        client = session.clients.get(profile.name)
+        if client is None:
+            client = PooledYDL({**profile.build_options(), **session.ydl_opts()})
+            session.clients[profile.name] = client
+        return client
+
+
+ydl_pool = YDLPool()
@@ -1,16 +1,32 @@
 """YouTube downloader with automatic PO Token management."""
 import os
-from pathlib import Path
+from typing import TYPE_CHECKING, Optional
 
 from loguru import logger
 
 from config import settings
+from downloaders.common import media_metadata, run_blocking
+from downloaders.music import is_music as classify_music
+from downloaders.registry import register_downloader
+from downloaders.ydl_pool import YOUTUBE_CLIENT_OPTS, ydl_pool
 from utils.po_token_cache import POTokenCache
 from downloaders.po_token_manager import POTokenGenerator
 
+if TYPE_CHECKING:
+    from services.progress import ProgressStream
 
-# Инициализация менеджера токенов (глобально)
-_po_token_cache = POTokenCache(cache_file="storage/po_token_cache.json")
+
+# Менеджер токенов создаётся при первом запросе (не при импорте модуля)
+_po_token_cache: Optional[POTokenCache] = None
+
+
+def _get_po_token_cache() -> POTokenCache:
+    global _po_token_cache
+    if _po_token_cache is None:
+        _po_token_cache = POTokenCache(
+            cache_file="storage/po_token_cache.json", redis_url=settings.redis_url
+        )
+    return _po_token_cache
 
 
 def _get_po_token(client: str = "android") -> str:
@@ -24,7 +40,7 @@ def _get_po_token(client: str = "android") -> str:
         PO Token (может быть пустым)
     """
     # Пытаемся получить из кэша
-    token = _po_token_cache.get_token(client)
+    token = _get_po_token_cache().get_token(client)
 
     if token:
         return token
@@ -36,7 +52,7 @@ def _get_po_token(client: str = "android") -> str:
 
     if new_token:
         # Сохраняем в кэш на 3 дня
-        _po_token_cache.set_token(client, new_token, ttl_days=3)
+        _get_po_token_cache().set_token(client, new_token, ttl_days=3)
         return new_token
     else:
         # Fallback - работаем без токена
@@ -46,43 +62,43 @@ def _get_po_token(client: str = "android") -> str:
         return POTokenGenerator.generate_fallback()
 
 
-async def download_youtube_video(url: str) -> dict[str, any]:
+@register_downloader("youtube")
+async def download_youtube_video(
+    url: str, progress: Optional["ProgressStream"] = None
+) -> dict[str, any]:
     """Download YouTube video or audio with automatic PO Token."""
+    # yt-dlp блокирующий - выполняем в потоке, чтобы не стопорить event loop
+    return await run_blocking(_download_youtube_video, url, progress)
+
+
+def _download_youtube_video(
+    url: str, progress: Optional["ProgressStream"]
+) -> dict[str, any]:
     try:
         import yt_dlp
 
-        output_dir = Path(settings.temp_dir)
-        output_dir.mkdir(parents=True, exist_ok=True)
-
         # Автоматически получаем актуальный PO Token
         po_token_android = _get_po_token("android")
 
-        # Получаем информацию о видео
-        info_opts = {
-            "quiet": True,
-            "no_warnings": True,
-            "extract_flat": False,
-            # Используем android client для обхода блокировок
-            "extractor_args": {
+        # Параметры пула меняются на время аренды: лимит размера этой задачи
+        # и PO Token, если есть
+        params = {}
+        if progress is not None and progress.max_filesize:
+            params["max_filesize"] = progress.max_filesize
+        if po_token_android:
+            youtube_args = YOUTUBE_CLIENT_OPTS["extractor_args"]["youtube"]
+            params["extractor_args"] = {
                 "youtube": {
-                    "player_client": ["android", "android_embedded", "ios"],
-                    "skip": ["hls"],  # Пропускаем проблемные форматы
+                    **youtube_args,
+                    "po_token": [f"android.gvs+{po_token_android}"],
                 }
-            },
-            "http_headers": {
-                "User-Agent": "com.google.android.youtube/19.09.37 (Linux; U; Android 11) gzip",
-                "Accept-Language": "en-US,en;q=0.9",
-            },
-        }
-
-        # Добавляем PO Token если есть
-        if po_token_android:
-            info_opts["extractor_args"]["youtube"]["po_token"] = [
-                f"android.gvs+{po_token_android}"
-            ]
+            }
+            logger.debug(f"Using PO Token: {po_token_android[:30]}...")
 
-        with yt_dlp.YoutubeDL(info_opts) as ydl:
-            info = ydl.extract_info(url, download=False)
+        # Получаем информацию о видео. Без обработки: формат выбирает тот
+        # инстанс, который будет качать (видео или аудио профиль)
+        with ydl_pool.lease("youtube_video", progress, params) as ydl:
+            info = ydl.extract_info(url, download=False, process=False)
 
             if not info:
                 return {
@@ -139,114 +155,45 @@ async def download_youtube_video(url: str) -> dict[str, any]:
                 }
 
             # Определение: Музыка или видео?
-            is_music = _is_music_content(info)
-
-            # Формируем параметры скачивания в зависимости от типа контента
-            if is_music:
-                # Для музыки
-                ydl_opts = {
-                    "format": "bestaudio/best",
-                    "outtmpl": str(output_dir / "youtube_audio_%(id)s.%(ext)s"),
-                    "postprocessors": [
-                        {
-                            "key": "FFmpegExtractAudio",
-                            "preferredcodec": "mp3",
-                            "preferredquality": "192",
-                        }
-                    ],
-                    # Не скачиваем thumbnail - часто вызывает 403
-                    "writethumbnail": False,
-                    "embedthumbnail": False,
-                }
-                content_type = "audio"
-            else:
-                # Для видео
-                ydl_opts = {
-                    # Используем комбинированные форматы или fallback на best
-                    "format": "bv*[height<=720][ext=mp4]+ba[ext=m4a]/b[height<=720][ext=mp4]/b[height<=720]/best",
-                    "outtmpl": str(output_dir / "youtube_video_%(id)s.%(ext)s"),
-                    "merge_output_format": "mp4",
-                }
-                content_type = "video"
-
-            # Общие параметры
-            ydl_opts.update(
-                {
-                    "quiet": False,
-                    "no_warnings": False,
-                    "ignoreerrors": False,
-                    # Используем Android client для обхода блокировок
-                    "extractor_args": {
-                        "youtube": {
-                            "player_client": [
-                                "android",
-                                "android_embedded",
-                                "ios",
-                            ],  # Приоритет клиентов
-                            "skip": ["hls", "dash"],  # Пропускаем проблемные форматы
-                        }
-                    },
-                    # User-Agent Android YouTube app
-                    "http_headers": {
-                        "User-Agent": "com.google.android.youtube/19.09.37 (Linux; U; Android 11) gzip",
-                        "Accept": "*/*",
-                        "Accept-Language": "en-US,en;q=0.9",
-                        "Accept-Encoding": "gzip, deflate",
-                    },
-                    # Повторные попытки
-                    "retries": 10,
-                    "fragment_retries": 10,
-                    "skip_unavailable_fragments": True,
-                    "max_filesize": 50 * 1024 * 1024,
-                    "nocheckcertificate": True,
-                    "prefer_free_formats": True,
-                    "geo_bypass": True,
-                }
-            )
-
-            # Добавляем PO Token если есть
-            if po_token_android:
-                ydl_opts["extractor_args"]["youtube"]["po_token"] = [
-                    f"android.gvs+{po_token_android}"
-                ]
-                logger.debug(f"Using PO Token for download: {po_token_android[:30]}...")
-
-            # Скачиваем контент
-            with yt_dlp.YoutubeDL(ydl_opts) as ydl_download:
-                info_downloaded = ydl_download.extract_info(url, download=True)
-                filename = ydl_download.prepare_filename(info_downloaded)
-
-                # Для аудио: после обработки расширение меняется на .mp3
-                if is_music:
-                    # Ищем файл с расширением .mp3
-                    base_name = os.path.splitext(filename)[0]
-                    mp3_file = f"{base_name}.mp3"
-                    if os.path.exists(mp3_file):
-                        filename = mp3_file
-
-                # Проверяем что файл существует и не пустой
-                if not os.path.exists(filename):
-                    return {"success": False, "error": "Файл не был скачан"}
-
-                file_size = os.path.getsize(filename)
-                if file_size == 0:
-                    return {"success": False, "error": "Скачанный файл пустой"}
-
-                # Формируем красивое название
-                title = info.get("title", "YouTube Content")
-                if is_music:
-                    uploader = info.get("uploader", "Unknown Artist")
-                    title = f"🎵 {title} - {uploader}"
-                else:
-                    title = f"🎥 {title}"
+            is_music = classify_music(info)
+            content_type = "audio" if is_music else "video"
+
+            # Скачиваем по уже полученной информации, без повторного запроса
+            if not is_music:
+                info_downloaded = ydl.process_ie_result(info, download=True)
+                filename = ydl.prepare_filename(info_downloaded)
+
+        if is_music:
+            # Аренда видео уже отпущена - у задачи один инстанс и один бюджет
+            # соединений за раз
+            with ydl_pool.lease("youtube_audio", progress, params) as ydl_audio:
+                info_downloaded = ydl_audio.process_ie_result(info, download=True)
+                filename = ydl_audio.prepare_filename(info_downloaded)
+
+        # Проверяем что файл существует и не пустой
+        if not os.path.exists(filename):
+            return {"success": False, "error": "Файл не был скачан"}
+
+        file_size = os.path.getsize(filename)
+        if file_size == 0:
+            return {"success": False, "error": "Скачанный файл пустой"}
+
+        # Формируем красивое название
+        title = info.get("title", "YouTube Content")
+        if is_music:
+            uploader = info.get("uploader", "Unknown Artist")
+            title = f"🎵 {title} - {uploader}"
+        else:
+            title = f"🎥 {title}"
 
-                return {
-                    "success": True,
-                    "file_path": filename,
-                    "content_type": content_type,
-                    "file_size": file_size,
-                    "title": title,
-                }
+        return {
+            "success": True,
+            "file_path": filename,
+            "content_type": content_type,
+            "file_size": file_size,
+            "title": title,
+            **media_metadata(info_downloaded),
+        }
 
     except yt_dlp.utils.DownloadError as e:
         error_msg = str(e)
@@ -265,7 +212,7 @@ async def download_youtube_video(url: str) -> dict[str, any]:
         
         if "HTTP Error 403" in error_msg or "Forbidden" in error_msg:
             # Возможно токен истёк - очищаем кэш
-            _po_token_cache.clear_token("android")
+            _get_po_token_cache().clear_token("android")
             return {
                 "success": False,
                 "error": "⚠️ YouTube временно ограничил доступ. Попробуйте:\n"
@@ -294,80 +241,3 @@ async def download_youtube_video(url: str) -> dict[str, any]:
             "success": False,
             "error": f"⚠️ Неизвестная ошибка: {str(e)[:200]}",
         }
-
-
-def _is_music_content(info: dict) -> bool:
-    """
-    Определяет, является ли контент музыкой.
-
-    Проверяет:
-    - Категорию видео (Music)
-    - Наличие в названии музыкальных слов
-    - Канал является музыкальным (Official, VEVO, Topic)
-    - Короткая длительность (< 10 минут обычно музыка)
-    """
-    # Проверка 1: Категория YouTube
-    categories = info.get("categories", [])
-    if categories and "Music" in categories:
-        return True
-
-    # Проверка 2: Жанр
-    genre = info.get("genre")
-    if genre:
-        genre_lower = str(genre).lower()
-        if any(
-            music_genre in genre_lower
-            for music_genre in ["music", "song", "audio", "soundtrack", "ost"]
-        ):
-            return True
-
-    # Проверка 3: Название содержит музыкальные слова
-    title = info.get("title")
-    if title:
-        title_lower = str(title).lower()
-        music_keywords = [
-            "official music video",
-            "official video",
-            "official audio",
-            "lyrics",
-            "lyric video",
-            "(audio)",
-            "[audio]",
-            "full album",
-            "ost",
-            "soundtrack",
-            "original sound",
-            "music video",
-            "mv",
-        ]
-        if any(keyword in title_lower for keyword in music_keywords):
-            return True
-
-    # Проверка 4: Канал музыкальный
-    uploader = info.get("uploader")
-    channel_id = info.get("channel_id")
-    
-    if uploader:
-        uploader_lower = str(uploader).lower()
-        music_channels = ["vevo", "official", " - topic", "records", "music"]
-        
-        if any(marker in uploader_lower for marker in music_channels):
-            return True
-        
-        # YouTube Music обычно добавляет " - Topic" к названиям каналов
-        if channel_id and "topic" in uploader_lower:
-            return True
-
-    # Проверка 5: Длительность (песни обычно < 10 минут)
-    duration = info.get("duration", 0)
-    if duration and 0 < duration < 600:  # Меньше 10 минут и больше 0
-        # Дополнительная проверка: если короткое И есть музыкальные теги
-        tags = info.get("tags", [])
-        if tags:
-            music_tags = ["music", "song", "audio", "official"]
-
-            if any(str(tag).lower() in music_tags for tag in tags if tag):
-                return True
-
-    # По умолчанию - видео
-    return False
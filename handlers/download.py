@@ -1,34 +1,55 @@
 """Download handlers."""
-import re
+import asyncio
+import os
 from html import escape
 from aiogram import Router, F, Dispatcher
-from aiogram.types import Message, FSInputFile
+from aiogram.exceptions import TelegramBadRequest
+from aiogram.types import (
+    CallbackQuery,
+    FSInputFile,
+    InputMediaAudio,
+    InputMediaDocument,
+    InputMediaPhoto,
+    InputMediaVideo,
+    Message,
+    Update,
+)
 from aiogram.filters import Command
 from aiogram.utils.keyboard import InlineKeyboardBuilder
-from sqlalchemy import select
 from loguru import logger
 
-from database import get_db, User, Download
+from database import User
 from downloaders import (
-    download_tiktok,
-    download_youtube,
-    download_instagram,
-    download_twitter,
-    detect_platform,
+    RouteMatch,
+    extract_links,
+    get_downloader,
+    route,
 )
+from downloaders.http import localize
 from config import settings
+from services import (
+    DownloadEvent,
+    ProgressReporter,
+    ProgressStream,
+    content_index,
+    history_writer,
+    job_journal,
+    job_scheduler,
+)
+from services.postprocess import finalize_result, postprocess_result
+from services.progress import STAGE_UPLOADING
+from services.transcode import (
+    fit_to_budget,
+    source_size_limit,
+    transcode_allowed,
+    transcode_cache,
+)
+from utils.metrics import SENT_BY_URL
 
 router = Router()
 
-# URL patterns
-URL_PATTERNS = {
-    "tiktok": r"(?:https?://)?(?:www\.)?(?:tiktok\.com|vm\.tiktok\.com)",
-    "youtube": r"(?:https?://)?(?:www\.)?(?:youtube\.com|youtu\.be)",
-    "instagram": r"(?:https?://)?(?:www\.)?instagram\.com",
-    "twitter": r"(?:https?://)?(?:www\.)?(?:twitter\.com|x\.com)",
-    "reddit": r"(?:https?://)?(?:www\.)?reddit\.com",
-    "pinterest": r"(?:https?://)?(?:www\.)?pinterest\.com",
-}
+# Telegram limit for sendMediaGroup
+MEDIA_GROUP_SIZE = 10
 
 
 def register_download_handlers(dp: Dispatcher) -> None:
@@ -59,9 +80,250 @@ async def download_menu(message_or_query):
         await message_or_query.answer(text)
 
 
+@router.callback_query(F.data.startswith("cancel_job:"))
+async def cancel_job(callback: CallbackQuery):
+    """Cancel a queued or running download job."""
+    job_id = callback.data.split(":", 1)[1]
+    if job_scheduler.cancel_job(job_id, callback.from_user.id):
+        await callback.answer("Отменяю...")
+    else:
+        await callback.answer("Задача уже завершена")
+
+
+async def _run_download(
+    platform: str, url: str, progress: ProgressStream, premium: bool
+) -> dict | None:
+    """
+    Wait for a job slot, download content and post-process it.
+
+    Videos over the size limit are re-encoded to fit it for premium users
+    (for everyone off-peak); such results are reused on repeat requests.
+    Videos are then made streamable and get their metadata and thumbnail.
+    """
+    downloader = get_downloader(platform)
+    if downloader is None:
+        # Platform is recognized but has no downloader yet
+        return None
+
+    # Пережатое ранее видео отдаём без повторной загрузки
+    link = route(url)
+    media_key = link.media_key if link else None
+    result = transcode_cache.get(media_key) if media_key else None
+
+    if result is None:
+        transcode = transcode_allowed(premium)
+        # Исходник больше лимита отправки качаем, только если его пережмут
+        progress.max_filesize = source_size_limit(transcode)
+        async with job_scheduler.slot(
+            premium=premium, on_position=progress.set_queue_position
+        ):
+            result = await downloader(url, progress)
+        # ffmpeg has its own pool, the download slot is already free
+        result = await postprocess_result(result, progress)
+        if transcode:
+            result = await fit_to_budget(result, media_key, progress)
+    return await finalize_result(result, progress)
+
+
+def _resumable_result(resume_job: dict | None) -> dict | None:
+    """Downloaded result of an interrupted job, if only the upload is left."""
+    if not resume_job or resume_job.get("stage") != STAGE_UPLOADING:
+        return None
+    result = resume_job.get("result") or {}
+    if result.get("file_path") and all(
+        not item.get("file_path") or os.path.exists(item["file_path"])
+        for item in _items(result)
+    ):
+        return result
+    return None
+
+
+def _items(result: dict) -> list[dict]:
+    """Files of a download result (several for carousel posts)."""
+    return result.get("items") or [result]
+
+
+async def _send_processing_message(
+    message: Message,
+    text: str,
+    reply_markup,
+    resume_job: dict | None,
+) -> Message:
+    """Send the processing message, replacing the stale one of a resumed job."""
+    if resume_job:
+        # Старое сообщение о прогрессе осталось от прошлого процесса
+        try:
+            await message.bot.delete_message(message.chat.id, resume_job["message_id"])
+        except (KeyError, TelegramBadRequest):
+            pass
+        text = "🔄 Продолжаю загрузку после перезапуска..."
+    return await message.answer(text, reply_markup=reply_markup)
+
+
+def _journal_job(
+    job, event_update: Update | None, platform: str, url: str, processing_msg
+) -> None:
+    """Record a new job in the journal."""
+    job_journal.record(
+        job.id,
+        job.progress.latest.stage,
+        update_id=event_update.update_id if event_update else None,
+        update=(
+            event_update.model_dump(mode="json", exclude_none=True)
+            if event_update
+            else None
+        ),
+        user_id=job.user_id,
+        platform=platform,
+        url=url,
+        message_id=processing_msg.message_id,
+    )
+
+
+async def _send_result(message: Message, result: dict, caption: str | None) -> Message:
+    """Send one downloaded file (or a text post) according to its content type."""
+    if result["content_type"] == "text":
+        return await message.answer(result["text"])
+    file = _media_source(result)
+    if result["content_type"] == "video":
+        return await message.answer_video(
+            file, caption=caption, **_video_fields(result)
+        )
+    elif result["content_type"] == "photo":
+        return await message.answer_photo(file, caption=caption)
+    elif result["content_type"] == "audio":
+        return await message.answer_audio(file, caption=caption)
+    else:
+        return await message.answer_document(file, caption=caption)
+
+
+def _input_media(result: dict, caption: str | None = None):
+    """InputMedia for one downloaded file."""
+    file = _media_source(result)
+    if result["content_type"] == "video":
+        return InputMediaVideo(media=file, caption=caption, **_video_fields(result))
+    if result["content_type"] == "photo":
+        return InputMediaPhoto(media=file, caption=caption)
+    if result["content_type"] == "audio":
+        return InputMediaAudio(media=file, caption=caption)
+    return InputMediaDocument(media=file, caption=caption)
+
+
+def _media_source(result: dict):
+    """
+    Telegram file_id of identical content sent before, a direct URL for
+    Telegram to fetch, or the file itself.
+    """
+    return (
+        result.get("file_id")
+        or result.get("media_url")
+        or FSInputFile(result["file_path"])
+    )
+
+
+def _video_fields(result: dict) -> dict:
+    """Metadata that lets Telegram show and stream a video without reprocessing."""
+    fields = {"supports_streaming": True}
+    for key in ("duration", "width", "height"):
+        if result.get(key):
+            fields[key] = result[key]
+    # Превью загружается только вместе с самим файлом
+    if (
+        not result.get("file_id")
+        and result.get("thumbnail")
+        and os.path.exists(result["thumbnail"])
+    ):
+        fields["thumbnail"] = FSInputFile(result["thumbnail"])
+    return fields
+
+
+def _sent_file_id(sent: Message) -> str | None:
+    """file_id Telegram assigned to the media of a sent message."""
+    media = sent.video or sent.audio or sent.document
+    if media is None and sent.photo:
+        media = sent.photo[-1]
+    return media.file_id if media else None
+
+
+async def _deliver(message: Message, items: list[dict], caption: str | None) -> None:
+    """
+    Send files as media groups where possible, caption on the first one.
+
+    Files identical to ones sent before go by file_id instead of being
+    uploaded again; uploaded ones are added to the content index. Items
+    with a ``media_url`` are fetched by Telegram itself, and downloaded and
+    uploaded only if Telegram cannot fetch them.
+    """
+    await content_index.resolve(items)
+    for group in _media_groups(items):
+        try:
+            sent = await _send_group(message, group, caption)
+        except TelegramBadRequest:
+            if not any(item.get("file_id") or item.get("media_url") for item in group):
+                raise
+            # file_id больше не принимается или Telegram не смог скачать
+            # файл по ссылке - загружаем файлы сами
+            for item in group:
+                await content_index.forget(item)
+                if item.get("media_url"):
+                    SENT_BY_URL.labels(item["content_type"], "rejected").inc()
+                    await localize(item)
+            sent = await _send_group(message, group, caption)
+        for item, sent_message in zip(group, sent):
+            if item.get("media_url"):
+                SENT_BY_URL.labels(item["content_type"], "sent").inc()
+            await content_index.remember(item, _sent_file_id(sent_message))
+        caption = None
+
+
+async def _send_group(
+    message: Message, group: list[dict], caption: str | None
+) -> list[Message]:
+    if len(group) == 1:
+        # sendMediaGroup принимает от 2 элементов
+        return [await _send_result(message, group[0], caption)]
+    media = [_input_media(item) for item in group]
+    if caption:
+        media[0] = _input_media(group[0], caption)
+    return await message.answer_media_group(media)
+
+
+def _media_groups(results: list[dict]) -> list[list[dict]]:
+    """
+    Split downloaded files into sendMediaGroup batches.
+
+    Photos and videos may share a group, audio and documents only go with
+    their own kind, text posts are sent one by one; each group holds at most
+    ``MEDIA_GROUP_SIZE`` items.
+    """
+    kinds = {"visual": [], "audio": [], "document": []}
+    texts = []
+    for result in results:
+        if result["content_type"] == "text":
+            texts.append([result])
+        elif result["content_type"] in ("video", "photo"):
+            kinds["visual"].append(result)
+        elif result["content_type"] == "audio":
+            kinds["audio"].append(result)
+        else:
+            kinds["document"].append(result)
+
+    return [
+        kind[i : i + MEDIA_GROUP_SIZE]
+        for kind in kinds.values()
+        for i in range(0, len(kind), MEDIA_GROUP_SIZE)
+    ] + texts
+
+
 @router.message(F.text)
-async def handle_url(message: Message, user: User = None, rate_limited: bool = False):
-    """Handle URL message."""
+async def handle_url(
+    message: Message,
+    user: User = None,
+    rate_limited: bool = False,
+    event_update: Update | None = None,
+    resume_job: dict | None = None,
+):
+    """Handle URL message (``resume_job`` is set when resuming from the journal)."""
     if not user:
         return  # User not found, skip
 
@@ -69,7 +331,8 @@ async def handle_url(message: Message, user: User = None, rate_limited: bool = F
     user_id = user.id
     user_is_premium = user.is_premium
 
-    if rate_limited:
+    # Прерванная задача уже прошла проверку лимита при первом запуске
+    if rate_limited and not resume_job:
         keyboard = InlineKeyboardBuilder()
         keyboard.button(text="⭐ Получить Premium", callback_data="premium")
         await message.answer(
@@ -79,106 +342,156 @@ async def handle_url(message: Message, user: User = None, rate_limited: bool = F
         )
         return
 
-    text = message.text.strip()
-
-    # Check if it's a URL
-    if not any(
-        re.search(pattern, text, re.IGNORECASE) for pattern in URL_PATTERNS.values()
-    ):
+    # Every supported link of the message (plain text and link entities)
+    links = extract_links(message.text, message.entities)
+    if not links:
         return  # Not a URL, ignore
 
-    # Detect platform
-    platform = detect_platform(text)
-    if not platform:
-        await message.answer("❌ Не удалось определить платформу. Проверьте ссылку.")
+    # Не берём больше ссылок, чем осталось в дневном лимите
+    limit = settings.premium_user_limit if user_is_premium else settings.free_user_limit
+    allowed = max(1, min(limit - user.downloads_today, settings.max_links_per_message))
+    if len(links) > allowed and not resume_job:
+        await message.answer(
+            f"ℹ️ Обработаю только {allowed} из {len(links)} ссылок "
+            f"(лимит на сообщение или на сегодня)."
+        )
+    links = links[:allowed]
+
+    if len(links) > 1:
+        await _handle_batch(
+            message, user_id, user_is_premium, links, event_update, resume_job
+        )
         return
 
-    # Send processing message with premium status
+    url, platform = links[0].url, links[0].platform
+
+    # Send processing message with premium status and a cancel button
+    progress = ProgressStream()
+    job = job_scheduler.create_job(
+        user_id=user_id,
+        progress=progress,
+        job_id=resume_job["id"] if resume_job else None,
+    )
+    cancel_keyboard = InlineKeyboardBuilder()
+    cancel_keyboard.button(text="🚫 Отменить", callback_data=f"cancel_job:{job.id}")
+    cancel_markup = cancel_keyboard.as_markup()
+
     processing_emoji = "⚡" if user_is_premium else "⏳"
-    processing_msg = await message.answer(f"{processing_emoji} Обрабатываю запрос...")
+    processing_msg = await _send_processing_message(
+        message,
+        f"{processing_emoji} Обрабатываю запрос...",
+        cancel_markup,
+        resume_job,
+    )
+
+    # Journal the job so a crash or restart can resume it from its .part file
+    _journal_job(job, event_update, platform, url, processing_msg)
+    progress.on_checkpoint = lambda event: job_journal.record(
+        job.id, event.stage, part_path=progress.part_path
+    )
 
+    # Live progress: yt-dlp hooks -> coalesced edits of processing message
+    reporter = ProgressReporter(
+        processing_msg,
+        progress,
+        interval=settings.progress_edit_interval,
+        emoji=processing_emoji,
+        reply_markup=cancel_markup,
+    )
+    reporter.start()
+
+    interrupted = False
     try:
-        # Download content based on platform
-        result = None
-        if platform == "tiktok":
-            result = await download_tiktok(text)
-        elif platform == "youtube":
-            result = await download_youtube(text)
-        elif platform == "instagram":
-            result = await download_instagram(text)
-        elif platform == "twitter":
-            result = await download_twitter(text)
-        # Add other platforms as needed
+        result = _resumable_result(resume_job)
+        if result is None:
+            job.task = asyncio.create_task(
+                _run_download(platform, url, progress, user_is_premium)
+            )
+        try:
+            if job.task is not None:
+                result = await job.task
+        except asyncio.CancelledError:
+            if not job.cancelled:
+                raise
+            await reporter.stop()
+            await processing_msg.edit_text("🚫 Загрузка отменена")
+            logger.info(f"Download cancelled by user {user_id}: {platform}")
+            return
+        finally:
+            # Дальше (отправка файла) отменить уже нельзя
+            job_scheduler.finish_job(job.id)
+            reporter.reply_markup = None
 
         if not result or not result.get("success"):
-            await processing_msg.edit_text(
-                f"❌ Ошибка при скачивании: {result.get('error', 'Неизвестная ошибка')}"
+            error = (
+                result.get("error", "Неизвестная ошибка")
+                if result
+                else "Платформа не поддерживается"
             )
+            await reporter.stop()
+            await processing_msg.edit_text(f"❌ Ошибка при скачивании: {error}")
             logger.info(
                 f"Download failed for user {user_id} (premium: {user_is_premium}) "
-                f"from {platform}: {result.get('error')}"
+                f"from {platform}: {error}"
             )
             return
 
         # Send file
-        file_path = result["file_path"]
         file_size_mb = result.get("file_size", 0) / (1024 * 1024)
+        largest_mb = max(item.get("file_size", 0) for item in _items(result)) / (
+            1024 * 1024
+        )
 
-        if file_size_mb > settings.max_file_size_mb:
+        if largest_mb > settings.max_file_size_mb:
+            await reporter.stop()
+            hint = ""
+            if settings.transcode_enabled and not user_is_premium:
+                hint = "\n\n⭐ Premium-пользователям такие видео приходят сжатыми."
             await processing_msg.edit_text(
-                f"❌ Файл слишком большой ({file_size_mb:.1f} MB). "
-                f"Максимальный размер: {settings.max_file_size_mb} MB"
+                f"❌ Файл слишком большой ({largest_mb:.1f} MB). "
+                f"Максимальный размер: {settings.max_file_size_mb} MB{hint}"
             )
             return
 
-        file = FSInputFile(file_path)
         premium_badge = "⭐ " if user_is_premium else ""
         caption = (
             f"✅ {premium_badge}<b>Контент скачан!</b>\n\n"
-            f"Платформа: {platform.upper()}\n"
-            f"Размер: {file_size_mb:.1f} MB"
+            f"Платформа: {platform.upper()}"
         )
+        # Размер неизвестен, если файл отправляется ссылкой
+        if result.get("file_size"):
+            caption += f"\nРазмер: {file_size_mb:.1f} MB"
 
-        if result["content_type"] == "video":
-            await message.answer_video(file, caption=caption)
-        elif result["content_type"] == "photo":
-            await message.answer_photo(file, caption=caption)
-        else:
-            await message.answer_document(file, caption=caption)
+        job_journal.record(job.id, result=result)
+        progress.set_stage(STAGE_UPLOADING)
+        await _deliver(message, _items(result), caption)
 
+        await reporter.stop()
         await processing_msg.delete()
 
-        # Update user stats
-        async for session in get_db():
-            # Refresh user to get current values
-            db_result = await session.execute(select(User).where(User.id == user_id))
-            fresh_user = db_result.scalar_one_or_none()
-
-            if fresh_user:
-                # fresh_user attached into current session
-                fresh_user.downloads_today += 1
-                fresh_user.total_downloads += 1
+        # Update user stats (batched, off the request path)
+        history_writer.record(
+            DownloadEvent(
+                user_id=user_id,
+                platform=platform,
+                url=url,
+                content_type=result["content_type"],
+                file_size=result.get("file_size"),
+            )
+        )
 
-                # Save download history
-                download = Download(
-                    user_id=user_id,
-                    platform=platform,
-                    url=text,
-                    content_type=result["content_type"],
-                    file_size=result.get("file_size"),
-                    status="completed",
-                )
-                session.add(download)
-                await session.commit()
-                
-                # Log успешного скачивания с указанием premium статуса
-                logger.info(
-                    f"Download completed for user {user_id} (premium: {user_is_premium}): "
-                    f"{platform} - {file_size_mb:.1f}MB"
-                )
-            break
+        # Log успешного скачивания с указанием premium статуса
+        logger.info(
+            f"Download completed for user {user_id} (premium: {user_is_premium}): "
+            f"{platform} - {file_size_mb:.1f}MB"
+        )
 
+    except asyncio.CancelledError:
+        # Остановка бота: задача остаётся в журнале и будет продолжена
+        interrupted = True
+        raise
     except Exception as e:
+        await reporter.stop()
         logger.error(
             f"Download error for user {user_id} (premium: {user_is_premium}): {e}",
             exc_info=True,
@@ -188,3 +501,135 @@ async def handle_url(message: Message, user: User = None, rate_limited: bool = F
         await processing_msg.edit_text(
             f"❌ Произошла ошибка:\n<code>{safe_error}</code>", parse_mode="HTML"
         )
+    finally:
+        if not interrupted:
+            job_journal.complete(job.id)
+
+
+async def _handle_batch(
+    message: Message,
+    user_id: int,
+    user_is_premium: bool,
+    links: list[RouteMatch],
+    event_update: Update | None,
+    resume_job: dict | None,
+) -> None:
+    """
+    Download several links of one message concurrently.
+
+    Every link takes its own job slot, so the batch is bounded by the
+    scheduler like single downloads. All links share one progress stream:
+    the cancel button stops them together.
+    """
+    urls = [link.url for link in links]
+    progress = ProgressStream()
+    job = job_scheduler.create_job(
+        user_id=user_id,
+        progress=progress,
+        job_id=resume_job["id"] if resume_job else None,
+    )
+    cancel_keyboard = InlineKeyboardBuilder()
+    cancel_keyboard.button(text="🚫 Отменить", callback_data=f"cancel_job:{job.id}")
+    cancel_markup = cancel_keyboard.as_markup()
+
+    processing_emoji = "⚡" if user_is_premium else "⏳"
+    processing_msg = await _send_processing_message(
+        message,
+        f"{processing_emoji} Скачиваю ссылки: 0/{len(urls)}",
+        cancel_markup,
+        resume_job,
+    )
+    _journal_job(job, event_update, "batch", " ".join(urls), processing_msg)
+
+    done = 0
+
+    async def download_one(link: RouteMatch) -> dict:
+        nonlocal done
+        url, platform = link.url, link.platform
+        try:
+            result = await _run_download(platform, url, progress, user_is_premium)
+        except Exception as e:
+            result = {"success": False, "error": str(e)}
+        result = dict(
+            result or {"success": False, "error": "Платформа не поддерживается"}
+        )
+        result.update(url=url, platform=platform)
+
+        done += 1
+        try:
+            await processing_msg.edit_text(
+                f"{processing_emoji} Скачиваю ссылки: {done}/{len(urls)}",
+                reply_markup=cancel_markup,
+            )
+        except TelegramBadRequest:
+            pass
+        return result
+
+    interrupted = False
+    try:
+        job.task = asyncio.create_task(
+            asyncio.gather(*(download_one(link) for link in links))
+        )
+        try:
+            results = await job.task
+        except asyncio.CancelledError:
+            if not job.cancelled:
+                raise
+            await processing_msg.edit_text("🚫 Загрузка отменена")
+            logger.info(f"Batch download cancelled by user {user_id}")
+            return
+        finally:
+            job_scheduler.finish_job(job.id)
+
+        max_size = settings.max_file_size_mb * 1024 * 1024
+        delivered, failed = [], []
+        for result in results:
+            if not result.get("success"):
+                failed.append(f"{result['url']}: {result.get('error')}")
+            elif any(item.get("file_size", 0) > max_size for item in _items(result)):
+                failed.append(f"{result['url']}: файл слишком большой")
+            else:
+                delivered.append(result)
+
+        if delivered:
+            job_journal.record(job.id, STAGE_UPLOADING)
+            await processing_msg.edit_text("📤 Отправляю файлы...")
+            await _deliver(
+                message, [item for result in delivered for item in _items(result)], None
+            )
+
+        for result in delivered:
+            history_writer.record(
+                DownloadEvent(
+                    user_id=user_id,
+                    platform=result["platform"],
+                    url=result["url"],
+                    content_type=result["content_type"],
+                    file_size=result.get("file_size"),
+                )
+            )
+
+        premium_badge = "⭐ " if user_is_premium else ""
+        summary = f"✅ {premium_badge}<b>Скачано {len(delivered)} из {len(urls)}</b>"
+        if failed:
+            errors = "\n".join(f"• {escape(line)}" for line in failed)
+            summary += f"\n\n❌ Не удалось скачать:\n{errors}"
+        await processing_msg.edit_text(summary, parse_mode="HTML")
+
+        logger.info(
+            f"Batch download for user {user_id} (premium: {user_is_premium}): "
+            f"{len(delivered)}/{len(urls)} delivered"
+        )
+
+    except asyncio.CancelledError:
+        # Остановка бота: задача остаётся в журнале и будет продолжена
+        interrupted = True
+        raise
+    except Exception as e:
+        logger.error(f"Batch download error for user {user_id}: {e}", exc_info=True)
+        await processing_msg.edit_text(
+            f"❌ Произошла ошибка:\n<code>{escape(str(e))}</code>", parse_mode="HTML"
+        )
+    finally:
+        if not interrupted:
+            job_journal.complete(job.id)
@@ -1,22 +1,47 @@
 """Main entry point for the TikTube Download Bot."""
 import asyncio
+import signal
 from aiogram import Bot, Dispatcher
 from aiogram.client.default import DefaultBotProperties
 from aiogram.enums import ParseMode
-from aiogram.webhook.aiohttp_server import SimpleRequestHandler, setup_application
+from aiogram.webhook.aiohttp_server import setup_application
 from aiohttp import web
 from loguru import logger
 
 from config import settings
 from handlers import register_handlers
 from database import init_db
+from downloaders import ydl_pool
+from downloaders.http import close_http_session
 from middleware import RateLimitMiddleware, UserMiddleware
+from services import QueuedRequestHandler, SendScheduler, history_writer, job_journal
+from services.drain import resume_loop, stop_intake, update_tracker
+from utils import shared_state
+from utils.metrics import render_metrics
 
 
-async def on_startup(bot: Bot) -> None:
+async def on_startup(
+    bot: Bot, dispatcher: Dispatcher, supervised: bool = False
+) -> None:
     """Initialize on bot startup."""
     logger.info("Bot is starting up...")
     
+    # Shared state for multi-worker mode (Redis)
+    await shared_state.connect()
+    
+    # Start batched download history writer and the job journal
+    await history_writer.start()
+    await job_journal.start()
+    
+    # Resume jobs interrupted by a shutdown or crash (ours or other workers')
+    dispatcher["resume_task"] = asyncio.create_task(
+        resume_loop(bot, dispatcher, settings.journal_sweep_interval)
+    )
+    
+    if supervised:
+        # Schema and webhook are managed once by the supervisor
+        return
+    
     # Initialize database
     await init_db()
     
@@ -24,18 +49,39 @@ async def on_startup(bot: Bot) -> None:
     if settings.webhook_url:
         await bot.set_webhook(
             url=f"{settings.webhook_url}/webhook",
-            drop_pending_updates=True
+            # Updates queued by Telegram during a deploy are still valid
+            drop_pending_updates=False
         )
         logger.info(f"Webhook set to {settings.webhook_url}/webhook")
     else:
+        # Webhook could be left registered by a previous webhook-mode run
+        await bot.delete_webhook(drop_pending_updates=False)
         logger.info("Running in polling mode")
 
 
-async def on_shutdown(bot: Bot) -> None:
+async def on_shutdown(bot: Bot, dispatcher: Dispatcher) -> None:
     """Cleanup on bot shutdown."""
     logger.info("Bot is shutting down...")
-    if settings.webhook_url:
-        await bot.delete_webhook(drop_pending_updates=True)
+    
+    # Let in-flight jobs finish, persist the rest for the next start;
+    # unfinished jobs are released to other workers via the journal.
+    # In webhook mode the request handler has already done this.
+    await stop_intake(dispatcher)
+    await job_journal.stop()
+    
+    # Flush buffered download history before exit
+    await history_writer.stop()
+    await shared_state.close()
+    await close_http_session()
+    
+    # The webhook stays registered: Telegram retries undelivered updates
+    # until the next process (or another worker) is up
+
+
+async def metrics_handler(request: web.Request) -> web.Response:
+    """Expose Prometheus metrics."""
+    body, content_type = render_metrics()
+    return web.Response(body=body, headers={"Content-Type": content_type})
 
 
 def setup_logging():
@@ -55,8 +101,27 @@ def setup_logging():
     )
 
 
-async def main():
-    """Main function to run the bot."""
+def install_uvloop() -> None:
+    """Use uvloop event loop if enabled and installed."""
+    if not settings.use_uvloop:
+        return
+    try:
+        import uvloop
+
+        uvloop.install()
+        logger.info("uvloop event loop enabled")
+    except ImportError:
+        logger.warning("USE_UVLOOP is set but uvloop is not installed")
+
+
+async def main(supervised: bool = False, ready=None):
+    """
+    Main function to run the bot.
+
+    Args:
+        supervised: Running as a worker process under the supervisor
+        ready: Event set once the webhook server accepts connections
+    """
     setup_logging()
     
     # Initialize bot and dispatcher
@@ -64,9 +129,22 @@ async def main():
         token=settings.bot_token,
         default=DefaultBotProperties(parse_mode=ParseMode.HTML)
     )
+    # All outgoing calls go through the rate-limited send scheduler
+    bot.session.middleware(
+        SendScheduler(
+            global_rate=settings.send_global_rate,
+            chat_rate=settings.send_chat_rate,
+            chat_burst=settings.send_chat_burst,
+            group_rate=settings.send_group_rate_per_min / 60,
+            max_retries=settings.send_max_retries,
+            workers=settings.workers,
+        )
+    )
     dp = Dispatcher()
+    dp["supervised"] = supervised
     
     # Register middleware
+    dp.update.outer_middleware(update_tracker)
     dp.message.middleware(UserMiddleware())
     dp.message.middleware(RateLimitMiddleware())
     dp.callback_query.middleware(UserMiddleware())
@@ -81,34 +159,55 @@ async def main():
     if settings.webhook_url:
         # Webhook mode (for production)
         app = web.Application()
-        webhook_requests_handler = SimpleRequestHandler(
+        webhook_requests_handler = QueuedRequestHandler(
             dispatcher=dp,
             bot=bot,
+            queue_size=settings.webhook_queue_size,
+            workers=settings.webhook_workers,
         )
         webhook_requests_handler.register(app, path="/webhook")
+        app.router.add_get("/metrics", metrics_handler)
         setup_application(app, dp, bot=bot)
 
         runner = web.AppRunner(app)
         await runner.setup()
-        site = web.TCPSite(runner, settings.host, settings.port)
+        # Workers share the port via SO_REUSEPORT, the kernel balances connections
+        site = web.TCPSite(
+            runner, settings.host, settings.port, reuse_port=True if supervised else None
+        )
         await site.start()
         
         logger.info(f"Starting webhook server on {settings.host}:{settings.port}")
+        if ready is not None:
+            ready.set()
+        
+        # Build yt-dlp instances in the background once we already serve
+        dp["warmup_task"] = asyncio.create_task(asyncio.to_thread(ydl_pool.warm_up))
 
-        # Держим сервер запущенным
+        # Держим сервер запущенным до SIGTERM/SIGINT
+        stop = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGTERM, signal.SIGINT):
+            loop.add_signal_handler(sig, stop.set)
         try:
-            while True:
-                await asyncio.sleep(3600)
+            await stop.wait()
         finally:
             await runner.cleanup()
     else:
         # Polling mode (for development)
         logger.info("Starting bot in polling mode...")
+        dp["warmup_task"] = asyncio.create_task(asyncio.to_thread(ydl_pool.warm_up))
         await dp.start_polling(bot, allowed_updates=dp.resolve_used_update_types())
 
 
 if __name__ == "__main__":
-    try:
-        asyncio.run(main())
-    except KeyboardInterrupt:
-        logger.info("Bot stopped by user")
+    if settings.webhook_url and settings.workers > 1:
+        from supervisor import Supervisor
+
+        Supervisor(settings.workers).run()
+    else:
+        install_uvloop()
+        try:
+            asyncio.run(main())
+        except KeyboardInterrupt:
+            logger.info("Bot stopped by user")
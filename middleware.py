@@ -3,11 +3,14 @@ from typing import Callable, Dict, Any, Awaitable
 from aiogram import BaseMiddleware
 from aiogram.types import TelegramObject, User as TgUser
 from datetime import datetime
-from sqlalchemy import select, update
+from sqlalchemy import case, func, or_
+from sqlalchemy.dialects.postgresql import insert
 
-from database import get_db, User
+from database import get_engine, User
 from config import settings
 
+users = User.__table__
+
 
 class UserMiddleware(BaseMiddleware):
     """Middleware to track and update user information."""
@@ -23,39 +26,40 @@ class UserMiddleware(BaseMiddleware):
         if not tg_user:
             return await handler(event, data)
         
-        async for session in get_db():
-            # Get or create user
-            result = await session.execute(
-                select(User).where(User.id == tg_user.id)
-            )
-            user = result.scalar_one_or_none()
-            
-            if not user:
-                user = User(
-                    id=tg_user.id,
-                    username=tg_user.username,
-                    first_name=tg_user.first_name,
-                    last_name=tg_user.last_name,
-                    is_premium=tg_user.is_premium or False,
-                )
-                session.add(user)
-                await session.commit()
-            else:
-                # Update user info
-                user.username = tg_user.username
-                user.first_name = tg_user.first_name
-                user.last_name = tg_user.last_name
-                user.is_premium = tg_user.is_premium or user.is_premium
-                user.last_activity = datetime.utcnow()
-                await session.commit()
-            
-            # Make attributes persistent before session closes
-            _ = user.downloads_today  # Trigger lazy load
-            _ = user.total_downloads  # Trigger lazy load
-            _ = user.is_premium  # Trigger lazy load
-            
-            data["user"] = user
-            break
+        # Single upsert round trip instead of SELECT + ORM flush.
+        # The daily counter is reset in the same statement.
+        now = datetime.utcnow()
+        stmt = insert(users).values(
+            id=tg_user.id,
+            username=tg_user.username,
+            first_name=tg_user.first_name,
+            last_name=tg_user.last_name,
+            is_premium=tg_user.is_premium or False,
+            downloads_today=0,
+            total_downloads=0,
+            created_at=now,
+            last_activity=now,
+        )
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[users.c.id],
+            set_={
+                "username": stmt.excluded.username,
+                "first_name": stmt.excluded.first_name,
+                "last_name": stmt.excluded.last_name,
+                "is_premium": or_(users.c.is_premium, stmt.excluded.is_premium),
+                "downloads_today": case(
+                    (func.date(users.c.last_activity) < now.date(), 0),
+                    else_=users.c.downloads_today,
+                ),
+                "last_activity": now,
+            },
+        ).returning(*users.c)
+        
+        async with get_engine().begin() as conn:
+            row = (await conn.execute(stmt)).one()
+        
+        # Detached snapshot; handlers only read plain columns
+        data["user"] = User(**row._mapping)
         
         return await handler(event, data)
 
@@ -74,22 +78,7 @@ class RateLimitMiddleware(BaseMiddleware):
         if not user:
             return await handler(event, data)
         
-        user_id = user.id  # Saving ID
-        
-        # Reset daily counter if needed
-        if user.last_activity and user.last_activity.date() < datetime.utcnow().date():
-            async for session in get_db():
-                await session.execute(
-                    update(User)
-                    .where(User.id == user_id)
-                    .values(downloads_today=0)
-                )
-                await session.commit()
-
-                user.downloads_today = 0
-                break
-        
-        # Check limit
+        # Daily counter is already reset by UserMiddleware's upsert
         limit = settings.premium_user_limit if user.is_premium else settings.free_user_limit
         
         if user.downloads_today >= limit:
@@ -0,0 +1,31 @@
+"""Background services package."""
+
+from .content_index import ContentIndex, content_index
+from .history import DownloadEvent, HistoryWriter, history_writer
+from .jobs import Job, JobScheduler, job_scheduler
+from .journal import JobJournal, job_journal
+from .postprocess import PostProcessError, PostProcessor, postprocessor
+from .progress import ProgressEvent, ProgressReporter, ProgressStream
+from .send_scheduler import SendScheduler
+from .webhook import QueuedRequestHandler
+
+__all__ = [
+    "ContentIndex",
+    "DownloadEvent",
+    "HistoryWriter",
+    "Job",
+    "JobJournal",
+    "JobScheduler",
+    "PostProcessError",
+    "PostProcessor",
+    "ProgressEvent",
+    "ProgressReporter",
+    "ProgressStream",
+    "QueuedRequestHandler",
+    "SendScheduler",
+    "content_index",
+    "history_writer",
+    "job_journal",
+    "job_scheduler",
+    "postprocessor",
+]
@@ -0,0 +1,116 @@
+"""Content fingerprint index: identical files are sent by Telegram file_id."""
+
+import asyncio
+import hashlib
+import json
+import os
+
+from loguru import logger
+
+from config import settings
+from utils.metrics import (
+    CONTENT_INDEX_HITS,
+    CONTENT_INDEX_LOOKUPS,
+    CONTENT_INDEX_SAVED_BYTES,
+)
+from utils.shared_state import shared_state
+
+# Bytes hashed at the start, middle and end of a file
+SAMPLE_SIZE = 64 * 1024
+
+
+def fingerprint(path: str, duration: float | None = None) -> str:
+    """
+    Fast content hash of a media file.
+
+    BLAKE2b over the size, the duration and three sampled chunks (the whole
+    file if it is small). Bytes outside the samples are not read: two files
+    of the same size and duration that differ only there would collide.
+    That is unlikely for media (re-encodes and re-muxes change the size and
+    the container headers), and the cost of a collision is resending a
+    wrong but same-sized file, which is accepted for a read of 192 KiB.
+    """
+    size = os.path.getsize(path)
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(f"{size}:{round(duration or 0)}".encode())
+    with open(path, "rb") as f:
+        if size <= 3 * SAMPLE_SIZE:
+            digest.update(f.read())
+        else:
+            for offset in (0, (size - SAMPLE_SIZE) // 2, size - SAMPLE_SIZE):
+                f.seek(offset)
+                digest.update(f.read(SAMPLE_SIZE))
+    return digest.hexdigest()
+
+
+class ContentIndex:
+    """
+    Fingerprint -> Telegram ``file_id`` (and the local file) in shared state.
+
+    A download that produced a file already sent once is delivered by
+    ``file_id`` instead of being uploaded again; hits and saved bytes are
+    counted per content type.
+    """
+
+    def __init__(self, ttl: float):
+        self.ttl = ttl
+
+    async def resolve(self, items: list[dict]) -> None:
+        """Fingerprint items and set ``file_id`` on the known ones."""
+        for item in items:
+            # Текстовые посты отправляются без файла
+            if not item.get("file_path"):
+                continue
+            try:
+                item["fingerprint"] = await asyncio.to_thread(
+                    fingerprint, item["file_path"], item.get("duration")
+                )
+            except OSError as e:
+                logger.warning(f"Failed to fingerprint {item['file_path']}: {e}")
+                continue
+
+            content_type = item.get("content_type", "document")
+            CONTENT_INDEX_LOOKUPS.labels(content_type).inc()
+            entry = await self._get(item["fingerprint"])
+            if entry is None or entry.get("content_type") != content_type:
+                continue
+            item["file_id"] = entry["file_id"]
+            CONTENT_INDEX_HITS.labels(content_type).inc()
+            CONTENT_INDEX_SAVED_BYTES.labels(content_type).inc(item.get("file_size", 0))
+            logger.debug(f"Duplicate content {item['fingerprint']}, sending by file_id")
+
+    async def remember(self, item: dict, file_id: str | None) -> None:
+        """Store the ``file_id`` Telegram assigned to an uploaded item."""
+        if not file_id or not item.get("fingerprint") or item.get("file_id"):
+            return
+        entry = {
+            "file_id": file_id,
+            "content_type": item.get("content_type"),
+            "file_size": item.get("file_size"),
+            "file_path": item.get("file_path"),
+        }
+        await shared_state.set(
+            self._key(item["fingerprint"]), json.dumps(entry), self.ttl
+        )
+
+    async def forget(self, item: dict) -> None:
+        """Drop an entry whose ``file_id`` Telegram no longer accepts."""
+        item.pop("file_id", None)
+        if item.get("fingerprint"):
+            await shared_state.delete(self._key(item["fingerprint"]))
+
+    async def _get(self, fingerprint: str) -> dict | None:
+        value = await shared_state.get(self._key(fingerprint))
+        if value is None:
+            return None
+        try:
+            return json.loads(value)
+        except ValueError:
+            return None
+
+    @staticmethod
+    def _key(fingerprint: str) -> str:
+        return f"content:{fingerprint}"
+
+
+content_index = ContentIndex(ttl=settings.content_index_ttl_days * 86400)
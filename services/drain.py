@@ -0,0 +1,216 @@
+"""Graceful shutdown: drain in-flight updates and persist the rest."""
+
+import asyncio
+import json
+import time
+from collections.abc import Awaitable, Callable
+from pathlib import Path
+from typing import Any
+
+from aiogram import BaseMiddleware, Bot, Dispatcher
+from aiogram.types import TelegramObject, Update
+from loguru import logger
+
+from config import settings
+from services.journal import job_journal
+from utils import shared_state
+
+
+class PendingUpdates:
+    """
+    Durable store of raw updates to replay after a restart.
+
+    Uses a Redis list when shared state is available, so any worker may pick
+    them up, and a JSON-lines spool file otherwise.
+    """
+
+    KEY = "pending_updates"
+
+    def __init__(self, spool_file: str):
+        self.spool_file = Path(spool_file)
+
+    async def save(self, updates: list[dict[str, Any]]) -> None:
+        if not updates:
+            return
+
+        payload = [json.dumps(update, ensure_ascii=False) for update in updates]
+        if shared_state.is_shared:
+            try:
+                await shared_state.redis.rpush(shared_state.key(self.KEY), *payload)
+                logger.info(f"Persisted {len(updates)} pending updates to Redis")
+                return
+            except Exception as e:
+                logger.error(f"Failed to persist pending updates to Redis: {e}")
+
+        self.spool_file.parent.mkdir(parents=True, exist_ok=True)
+        with open(self.spool_file, "a", encoding="utf-8") as f:
+            f.write("\n".join(payload) + "\n")
+        logger.info(f"Persisted {len(updates)} pending updates to {self.spool_file}")
+
+    async def load(self) -> list[dict[str, Any]]:
+        """Take all persisted updates (each is returned to one caller only)."""
+        raw: list[str] = []
+
+        if shared_state.is_shared:
+            key = shared_state.key(self.KEY)
+            async with shared_state.redis.pipeline(transaction=True) as pipe:
+                raw.extend((await pipe.lrange(key, 0, -1).delete(key).execute())[0])
+
+        if self.spool_file.exists():
+            raw.extend(
+                line for line in self.spool_file.read_text("utf-8").splitlines() if line
+            )
+            self.spool_file.unlink()
+
+        return [json.loads(item) for item in raw]
+
+
+class UpdateTracker(BaseMiddleware):
+    """
+    Outer update middleware that knows which updates are being handled.
+
+    On shutdown ``drain()`` waits for them up to a deadline, then cancels the
+    stragglers and returns their raw updates so they can be persisted.
+    """
+
+    def __init__(self):
+        self._inflight: dict[int, tuple[Update, asyncio.Task]] = {}
+        self._idle = asyncio.Event()
+        self._idle.set()
+
+    @property
+    def inflight(self) -> int:
+        return len(self._inflight)
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: dict[str, Any],
+    ) -> Any:
+        task = asyncio.current_task()
+        self._inflight[event.update_id] = (event, task)
+        self._idle.clear()
+        try:
+            return await handler(event, data)
+        finally:
+            self._inflight.pop(event.update_id, None)
+            if not self._inflight:
+                self._idle.set()
+
+    async def drain(self, timeout: float) -> list[dict[str, Any]]:
+        """Wait for in-flight updates; return raw updates that did not finish."""
+        if self._inflight:
+            logger.info(f"Draining {len(self._inflight)} in-flight updates...")
+            try:
+                await asyncio.wait_for(self._idle.wait(), timeout)
+            except TimeoutError:
+                pass
+
+        leftovers = []
+        for update, task in list(self._inflight.values()):
+            leftovers.append(update.model_dump(mode="json", exclude_none=True))
+            task.cancel()
+        self._inflight.clear()
+        self._idle.set()
+
+        if leftovers:
+            logger.warning(f"{len(leftovers)} updates did not finish before deadline")
+        return leftovers
+
+
+update_tracker = UpdateTracker()
+pending_updates = PendingUpdates(
+    str(Path(settings.storage_dir) / "pending_updates.jsonl")
+)
+
+
+async def drain_updates(extra: list[dict[str, Any]] | None = None) -> None:
+    """Drain in-flight updates and persist everything that did not complete."""
+    started = time.monotonic()
+    leftovers = await update_tracker.drain(settings.shutdown_drain_timeout)
+    # Download jobs are resumed from the job journal, not replayed from scratch
+    leftovers = [u for u in leftovers if not job_journal.has_update(u["update_id"])]
+    await pending_updates.save((extra or []) + leftovers)
+    logger.info(f"Drain finished in {time.monotonic() - started:.1f}s")
+
+
+async def stop_intake(
+    dispatcher: Dispatcher, extra: list[dict[str, Any]] | None = None
+) -> None:
+    """
+    Stop resuming work, then drain and persist updates (once per process).
+
+    The resume loop is stopped first: otherwise it could load the updates
+    just persisted and feed them into a process that is shutting down.
+    """
+    if dispatcher.get("intake_stopped"):
+        return
+    dispatcher["intake_stopped"] = True
+
+    resume_task = dispatcher.get("resume_task")
+    if resume_task is not None:
+        resume_task.cancel()
+        # Уже переданные апдейты к этому моменту видны трекеру и попадут в drain
+        await asyncio.gather(resume_task, return_exceptions=True)
+    await drain_updates(extra)
+
+
+async def replay_pending_updates(bot: Bot, dispatcher: Dispatcher) -> None:
+    """
+    Re-feed updates persisted by a drained worker and resume orphaned jobs.
+
+    Journal entries are passed to the handler as ``resume_job`` so the job
+    keeps its id and continues from the last completed stage.
+    """
+    try:
+        updates = await pending_updates.load()
+        jobs = await job_journal.adopt_orphans()
+    except Exception as e:
+        logger.error(f"Failed to load pending updates: {e}")
+        return
+
+    resumable = {}
+    for job in jobs:
+        if job.get("update"):
+            resumable[job["update_id"]] = job
+        else:
+            job_journal.complete(job["id"])
+
+    if not updates and not resumable:
+        return
+
+    logger.info(f"Resuming {len(updates)} pending updates and {len(resumable)} jobs")
+    for update in updates:
+        _feed(bot, dispatcher, update, resumable.pop(update["update_id"], None))
+    for job in resumable.values():
+        _feed(bot, dispatcher, job["update"], job)
+
+
+async def resume_loop(bot: Bot, dispatcher: Dispatcher, interval: float) -> None:
+    """
+    Keep picking up work left by other workers.
+
+    During a rolling restart the old worker drains after the new one has
+    started, and a crashed worker's jobs become orphaned only once its
+    heartbeat expires, so a single replay at startup is not enough.
+    """
+    while True:
+        await replay_pending_updates(bot, dispatcher)
+        await asyncio.sleep(interval)
+
+
+def _feed(
+    bot: Bot,
+    dispatcher: Dispatcher,
+    update: dict[str, Any],
+    resume_job: dict[str, Any] | None,
+) -> None:
+    task = asyncio.create_task(
+        dispatcher.feed_raw_update(bot, update, resume_job=resume_job)
+    )
+    _replay_tasks.add(task)
+    task.add_done_callback(_replay_tasks.discard)
+
+
+_replay_tasks: set[asyncio.Task] = set()
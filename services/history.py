@@ -0,0 +1,220 @@
+"""Buffered writer for download history and user counters."""
+
+import asyncio
+import json
+from collections import Counter
+from dataclasses import asdict, dataclass, field
+from datetime import datetime
+from pathlib import Path
+
+from loguru import logger
+from sqlalchemy import BigInteger, Integer, column, insert, update, values
+from sqlalchemy.exc import DataError, IntegrityError
+
+from config import settings
+from database import Download, User, get_engine
+
+
+@dataclass
+class DownloadEvent:
+    """Single completed download waiting to be persisted."""
+
+    user_id: int
+    platform: str
+    url: str
+    content_type: str
+    file_size: int | None = None
+    status: str = "completed"
+    created_at: str = field(default_factory=lambda: datetime.utcnow().isoformat())
+
+
+class HistoryWriter:
+    """
+    Collects download events in memory and writes them in batches.
+
+    Every flush issues one multi-row ``INSERT`` into ``downloads`` and one
+    aggregated ``UPDATE users ... FROM (VALUES ...)`` for the counters, so the
+    per-download request path never touches the database.  Events that could
+    not be written on shutdown are spooled to disk and replayed on the next
+    start (at-least-once delivery).
+
+    A batch the database rejects is retried row by row; rows it rejects on
+    their own go to ``history_rejected.jsonl`` next to the spool, so one bad
+    row does not block the rest. While the database is unreachable events
+    over ``max_buffer`` are spooled instead of kept in memory.
+    """
+
+    def __init__(
+        self,
+        flush_interval: float = 0.3,
+        batch_size: int = 500,
+        spool_file: str = "storage/history_spool.jsonl",
+        max_buffer: int = 50_000,
+    ):
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self.spool_file = Path(spool_file)
+        self.rejected_file = self.spool_file.with_name("history_rejected.jsonl")
+        self.max_buffer = max(max_buffer, batch_size)
+        self._buffer: list[DownloadEvent] = []
+        self._wakeup = asyncio.Event()
+        self._flush_lock = asyncio.Lock()
+        self._task: asyncio.Task | None = None
+
+    def record(self, event: DownloadEvent) -> None:
+        """Queue an event; never blocks and never touches the database."""
+        self._buffer.append(event)
+        if len(self._buffer) > self.max_buffer:
+            # БД долго недоступна - хвост уходит на диск (голова может писаться)
+            overflow = self._buffer[self.max_buffer :]
+            del self._buffer[self.max_buffer :]
+            self._append_events(self.spool_file, overflow)
+        if len(self._buffer) >= self.batch_size:
+            self._wakeup.set()
+
+    @property
+    def pending(self) -> int:
+        """Number of events not yet written."""
+        return len(self._buffer)
+
+    async def start(self) -> None:
+        """Replay spooled events and start the background flush loop."""
+        self._load_spool()
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Stop the flush loop and write (or spool) everything left."""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+        try:
+            await self.flush()
+        except Exception as e:
+            logger.error(f"Final history flush failed: {e}")
+
+        if self._buffer:
+            self._save_spool()
+
+    async def flush(self) -> int:
+        """Write all buffered events. Returns number of written events."""
+        async with self._flush_lock:
+            written = 0
+            while self._buffer:
+                batch = self._buffer[: self.batch_size]
+                try:
+                    await self._write(batch)
+                except (DataError, IntegrityError) as e:
+                    logger.warning(f"History batch rejected, retrying row by row: {e}")
+                    written += await self._write_rows(len(batch))
+                    continue
+                # Удаляем только после успешной записи (at-least-once)
+                del self._buffer[: len(batch)]
+                written += len(batch)
+            return written
+
+    async def _write_rows(self, count: int) -> int:
+        """Write the first ``count`` events one by one, setting rejected ones aside."""
+        written = 0
+        for _ in range(count):
+            event = self._buffer[0]
+            try:
+                await self._write([event])
+                written += 1
+            except (DataError, IntegrityError) as e:
+                logger.error(f"History event rejected by the database: {e}")
+                self._append_events(self.rejected_file, [event])
+            del self._buffer[0]
+        return written
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self.flush_interval)
+            except TimeoutError:
+                pass
+            self._wakeup.clear()
+
+            try:
+                await self.flush()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(
+                    f"History flush failed, {self.pending} events kept for retry: {e}"
+                )
+
+    async def _write(self, events: list[DownloadEvent]) -> None:
+        downloads = Download.__table__
+        users = User.__table__
+
+        rows = []
+        per_user: Counter[int] = Counter()
+        for event in events:
+            row = asdict(event)
+            row["created_at"] = datetime.fromisoformat(event.created_at)
+            rows.append(row)
+            if event.status == "completed":
+                per_user[event.user_id] += 1
+
+        async with get_engine().begin() as conn:
+            await conn.execute(insert(downloads).values(rows))
+
+            if per_user:
+                increments = values(
+                    column("user_id", BigInteger),
+                    column("n", Integer),
+                    name="increments",
+                ).data(list(per_user.items()))
+                await conn.execute(
+                    update(users)
+                    .where(users.c.id == increments.c.user_id)
+                    .values(
+                        downloads_today=users.c.downloads_today + increments.c.n,
+                        total_downloads=users.c.total_downloads + increments.c.n,
+                    )
+                )
+
+    def _save_spool(self) -> None:
+        if self._append_events(self.spool_file, self._buffer):
+            self._buffer.clear()
+
+    def _append_events(self, path: Path, events: list[DownloadEvent]) -> bool:
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            with open(path, "a", encoding="utf-8") as f:
+                for event in events:
+                    f.write(json.dumps(asdict(event), ensure_ascii=False) + "\n")
+            logger.warning(f"Spooled {len(events)} unwritten history events to {path}")
+            return True
+        except Exception as e:
+            logger.error(f"Failed to spool history events: {e}")
+            return False
+
+    def _load_spool(self) -> None:
+        if not self.spool_file.exists():
+            return
+
+        try:
+            with open(self.spool_file, encoding="utf-8") as f:
+                events = [
+                    DownloadEvent(**json.loads(line)) for line in f if line.strip()
+                ]
+            self._buffer[:0] = events
+            self.spool_file.unlink()
+            logger.info(f"Replaying {len(events)} spooled history events")
+        except Exception as e:
+            logger.error(f"Failed to load history spool: {e}")
+
+
+history_writer = HistoryWriter(
+    flush_interval=settings.history_flush_interval_ms / 1000,
+    batch_size=settings.history_batch_size,
+    max_buffer=settings.history_max_buffer,
+    spool_file=str(Path(settings.storage_dir) / "history_spool.jsonl"),
+)
@@ -0,0 +1,148 @@
+"""Download job scheduling."""
+
+import asyncio
+import bisect
+import itertools
+import uuid
+from collections.abc import AsyncIterator, Callable
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
+
+from config import settings
+from services.progress import ProgressStream
+from utils.metrics import JOBS_CANCELLED, JOBS_QUEUED, JOBS_RUNNING
+
+
+@dataclass
+class Job:
+    """Download job that its owner can cancel."""
+
+    id: str
+    user_id: int
+    progress: ProgressStream
+    task: asyncio.Task | None = None
+    cancelled: bool = False
+
+    def cancel(self) -> None:
+        """Dequeue or abort the job; the slot is released right away."""
+        self.cancelled = True
+        self.progress.cancel()
+        if self.task is not None:
+            self.task.cancel()
+
+
+@dataclass(order=True)
+class _Waiter:
+    priority: int
+    seq: int
+    future: asyncio.Future = field(compare=False)
+    on_position: Callable[[int], None] | None = field(compare=False, default=None)
+
+
+class JobScheduler:
+    """
+    Bounded number of concurrently running download jobs.
+
+    Jobs over the limit wait in an ordered queue (premium users first, then
+    FIFO) and are told their position whenever it changes.
+    """
+
+    def __init__(self, max_concurrent: int):
+        self.max_concurrent = max_concurrent
+        self._running = 0
+        self._waiters: list[_Waiter] = []
+        self._seq = itertools.count()
+        self._jobs: dict[str, Job] = {}
+
+    @property
+    def running(self) -> int:
+        return self._running
+
+    @property
+    def queued(self) -> int:
+        return len(self._waiters)
+
+    def create_job(
+        self, user_id: int, progress: ProgressStream, job_id: str | None = None
+    ) -> Job:
+        """Register a cancellable job (``job_id`` is kept for resumed jobs)."""
+        job = Job(
+            id=job_id or uuid.uuid4().hex[:16], user_id=user_id, progress=progress
+        )
+        self._jobs[job.id] = job
+        return job
+
+    def finish_job(self, job_id: str) -> None:
+        """Forget a job; it can no longer be cancelled."""
+        self._jobs.pop(job_id, None)
+
+    def cancel_job(self, job_id: str, user_id: int) -> bool:
+        """Cancel a job owned by ``user_id``. Returns False if not found."""
+        job = self._jobs.get(job_id)
+        if job is None or job.user_id != user_id:
+            return False
+        self.finish_job(job_id)
+        job.cancel()
+        JOBS_CANCELLED.inc()
+        return True
+
+    @asynccontextmanager
+    async def slot(
+        self,
+        premium: bool = False,
+        on_position: Callable[[int], None] | None = None,
+    ) -> AsyncIterator[None]:
+        """Hold a job slot for the duration of the block."""
+        if self._running < self.max_concurrent and not self._waiters:
+            self._running += 1
+        else:
+            waiter = _Waiter(
+                priority=0 if premium else 1,
+                seq=next(self._seq),
+                future=asyncio.get_running_loop().create_future(),
+                on_position=on_position,
+            )
+            bisect.insort(self._waiters, waiter)
+            self._notify_positions()
+            try:
+                await waiter.future
+            except asyncio.CancelledError:
+                if waiter in self._waiters:
+                    self._waiters.remove(waiter)
+                    self._notify_positions()
+                elif waiter.future.done() and not waiter.future.cancelled():
+                    # Слот уже выдан, но задачу отменили - возвращаем его
+                    self._release()
+                raise
+
+        self._update_metrics()
+        if on_position is not None:
+            on_position(0)
+        try:
+            yield
+        finally:
+            self._release()
+
+    def _release(self) -> None:
+        self._running -= 1
+        while self._waiters and self._running < self.max_concurrent:
+            waiter = self._waiters.pop(0)
+            if waiter.future.done():
+                # Задачу отменили в этом же тике - её слот отдаём следующей
+                continue
+            self._running += 1
+            waiter.future.set_result(None)
+        self._notify_positions()
+
+    def _notify_positions(self) -> None:
+        for position, waiter in enumerate(self._waiters, start=1):
+            if waiter.on_position is not None:
+                waiter.on_position(position)
+        self._update_metrics()
+
+    def _update_metrics(self) -> None:
+        JOBS_RUNNING.set(self._running)
+        JOBS_QUEUED.set(len(self._waiters))
+
+
+job_scheduler = JobScheduler(settings.max_concurrent_jobs)
@@ -0,0 +1,193 @@
+"""Job journal for resuming interrupted downloads."""
+
+import asyncio
+import json
+import time
+import uuid
+from pathlib import Path
+from typing import Any
+
+from loguru import logger
+
+from config import settings
+from utils import shared_state
+
+
+class JobJournal:
+    """
+    Records the stage of every running job so a crash does not lose it.
+
+    Entries live in a Redis hash (or a JSON file without Redis) and carry the
+    raw update, the ``.part`` path while downloading and the download result
+    once uploading starts. Each process owns its entries through a heartbeat
+    key; entries whose owner is gone are orphaned and may be adopted by any
+    worker. Writes are coalesced: ``record()`` only updates memory and a
+    background task persists the latest snapshot of each changed job.
+    """
+
+    KEY = "jobs"
+
+    def __init__(
+        self,
+        journal_file: str,
+        heartbeat_ttl: float = 30,
+        flush_interval: float = 0.5,
+    ):
+        self.journal_file = Path(journal_file)
+        self.heartbeat_ttl = heartbeat_ttl
+        self.flush_interval = flush_interval
+        self.owner = uuid.uuid4().hex
+        self._entries: dict[str, dict[str, Any]] = {}
+        self._dirty: set[str] = set()
+        self._deleted: set[str] = set()
+        self._wakeup = asyncio.Event()
+        self._task: asyncio.Task | None = None
+
+    async def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Persist pending changes and release ownership of our entries."""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+        try:
+            await self.flush()
+            if shared_state.is_shared:
+                await shared_state.delete(self._heartbeat_key(self.owner))
+        except Exception as e:
+            logger.error(f"Failed to flush job journal: {e}")
+
+    def record(self, job_id: str, stage: str | None = None, **fields: Any) -> None:
+        """Update a job entry (a ``services.progress`` stage and extra fields)."""
+        entry = self._entries.setdefault(job_id, {"id": job_id})
+        entry.update(fields)
+        if stage is not None:
+            entry["stage"] = stage
+        entry["owner"] = self.owner
+        entry["updated_at"] = time.time()
+        self._dirty.add(job_id)
+        self._deleted.discard(job_id)
+        self._wakeup.set()
+
+    def complete(self, job_id: str) -> None:
+        """Job finished (delivered, failed or cancelled) - forget it."""
+        self._entries.pop(job_id, None)
+        self._dirty.discard(job_id)
+        self._deleted.add(job_id)
+        self._wakeup.set()
+
+    def has_update(self, update_id: int) -> bool:
+        """True if one of our jobs was started from this update."""
+        return any(e.get("update_id") == update_id for e in self._entries.values())
+
+    async def adopt_orphans(self) -> list[dict[str, Any]]:
+        """Take over entries whose owner process is gone."""
+        entries = await self._load_all()
+        owners = {e.get("owner") for e in entries.values()} - {self.owner}
+        alive = {owner for owner in owners if await self._is_alive(owner)}
+
+        adopted = []
+        for job_id, entry in entries.items():
+            if entry.get("owner") in alive or entry.get("owner") == self.owner:
+                continue
+            if not await shared_state.claim(f"resume:{job_id}", self.heartbeat_ttl):
+                continue
+            self._entries[job_id] = entry
+            self.record(job_id)
+            adopted.append(entry)
+        return adopted
+
+    async def flush(self) -> None:
+        dirty = {job_id: self._entries[job_id] for job_id in self._dirty}
+        deleted = set(self._deleted)
+        self._dirty.clear()
+        self._deleted.clear()
+
+        if shared_state.is_shared:
+            key = shared_state.key(self.KEY)
+            async with shared_state.redis.pipeline(transaction=False) as pipe:
+                if dirty:
+                    pipe.hset(
+                        key,
+                        mapping={
+                            job_id: json.dumps(e, ensure_ascii=False)
+                            for job_id, e in dirty.items()
+                        },
+                    )
+                if deleted:
+                    pipe.hdel(key, *deleted)
+                pipe.set(
+                    self._heartbeat_key(self.owner),
+                    "1",
+                    px=int(self.heartbeat_ttl * 1000),
+                )
+                await pipe.execute()
+            return
+
+        if not dirty and not deleted:
+            return
+        entries = self._read_file()
+        for job_id in deleted:
+            entries.pop(job_id, None)
+        entries.update(dirty)
+        self.journal_file.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.journal_file.with_suffix(".tmp")
+        tmp.write_text(json.dumps(entries, ensure_ascii=False), "utf-8")
+        tmp.replace(self.journal_file)
+
+    async def _run(self) -> None:
+        # Heartbeat обновляется не реже, чем раз в треть TTL
+        heartbeat_every = self.heartbeat_ttl / 3
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), heartbeat_every)
+            except TimeoutError:
+                pass
+            self._wakeup.clear()
+
+            try:
+                await self.flush()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"Job journal flush failed: {e}")
+            await asyncio.sleep(self.flush_interval)
+
+    async def _load_all(self) -> dict[str, dict[str, Any]]:
+        if shared_state.is_shared:
+            raw = await shared_state.redis.hgetall(shared_state.key(self.KEY))
+            return {job_id: json.loads(value) for job_id, value in raw.items()}
+        return self._read_file()
+
+    def _read_file(self) -> dict[str, dict[str, Any]]:
+        if not self.journal_file.exists():
+            return {}
+        try:
+            return json.loads(self.journal_file.read_text("utf-8"))
+        except Exception as e:
+            logger.warning(f"Corrupted job journal, starting empty: {e}")
+            return {}
+
+    async def _is_alive(self, owner: str | None) -> bool:
+        if owner is None or not shared_state.is_shared:
+            # Без Redis воркер один (супервизор иначе не стартует) - чужие
+            # записи остались от прошлого запуска
+            return False
+        return await shared_state.get(self._heartbeat_key(owner)) is not None
+
+    @staticmethod
+    def _heartbeat_key(owner: str) -> str:
+        return f"worker:{owner}"
+
+
+job_journal = JobJournal(
+    str(Path(settings.storage_dir) / "job_journal.json"),
+    heartbeat_ttl=settings.journal_heartbeat_ttl,
+)
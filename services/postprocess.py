@@ -0,0 +1,437 @@
+"""ffmpeg post-processing in a bounded pool of processes."""
+
+import asyncio
+import bisect
+import itertools
+import json
+import os
+import struct
+import time
+from collections.abc import AsyncIterator
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
+from pathlib import Path
+
+from loguru import logger
+
+from config import settings
+from services.progress import STAGE_PROCESSING, ProgressStream
+from utils.metrics import POSTPROCESS_RUNNING, POSTPROCESS_SECONDS
+
+# Audio codec -> container Telegram plays as music without conversion
+AUDIO_CONTAINERS = {"mp3": "mp3", "aac": "m4a", "alac": "m4a"}
+
+TRANSCODE_AUDIO_ARGS = ("-c:a", "libmp3lame", "-b:a", "192k")
+
+MP4_EXTENSIONS = (".mp4", ".m4v", ".mov")
+
+# Telegram shows thumbnails up to 320px on the longer side
+THUMBNAIL_SIZE = 320
+
+PRIORITY_NORMAL = 0
+# Long optional encodes: wait behind everything else and never take the
+# whole pool
+PRIORITY_LOW = 1
+
+
+class PostProcessError(Exception):
+    """ffmpeg/ffprobe exited with an error."""
+
+
+@dataclass(order=True)
+class _Waiter:
+    priority: int
+    seq: int
+    future: asyncio.Future = field(compare=False)
+
+
+class PostProcessor:
+    """
+    Runs ffmpeg/ffprobe as subprocesses, at most ``max_processes`` at once.
+
+    The pool is separate from the download slots: a burst of conversions
+    waits here instead of occupying every core, while new downloads keep
+    running. Low-priority runs start only when no normal run is waiting and
+    hold at most half of the pool. Cancelling a caller kills its process.
+    """
+
+    def __init__(
+        self, max_processes: int, ffmpeg: str = "ffmpeg", ffprobe: str = "ffprobe"
+    ):
+        self.max_processes = max_processes
+        self.max_low_priority = max(1, max_processes // 2)
+        self.ffmpeg = ffmpeg
+        self.ffprobe = ffprobe
+        self._running = 0
+        self._running_low = 0
+        self._waiters: list[_Waiter] = []
+        self._seq = itertools.count()
+
+    @asynccontextmanager
+    async def _slot(self, priority: int) -> AsyncIterator[None]:
+        if self._can_start(priority):
+            self._acquire(priority)
+        else:
+            waiter = _Waiter(
+                priority, next(self._seq), asyncio.get_running_loop().create_future()
+            )
+            bisect.insort(self._waiters, waiter)
+            try:
+                await waiter.future
+            except asyncio.CancelledError:
+                if waiter in self._waiters:
+                    self._waiters.remove(waiter)
+                elif waiter.future.done() and not waiter.future.cancelled():
+                    # Место уже выдано, но вызывающего отменили - возвращаем
+                    self._release(priority)
+                raise
+        try:
+            yield
+        finally:
+            self._release(priority)
+
+    def _can_start(self, priority: int) -> bool:
+        if self._running >= self.max_processes:
+            return False
+        return priority < PRIORITY_LOW or self._running_low < self.max_low_priority
+
+    def _acquire(self, priority: int) -> None:
+        self._running += 1
+        if priority >= PRIORITY_LOW:
+            self._running_low += 1
+
+    def _release(self, priority: int) -> None:
+        self._running -= 1
+        if priority >= PRIORITY_LOW:
+            self._running_low -= 1
+        # Waiters are sorted by priority: the first one that fits starts
+        for waiter in list(self._waiters):
+            if waiter.future.done():
+                # Вызывающего отменили в этом же тике - место ему не нужно
+                self._waiters.remove(waiter)
+                continue
+            if not self._can_start(waiter.priority):
+                continue
+            self._waiters.remove(waiter)
+            self._acquire(waiter.priority)
+            waiter.future.set_result(None)
+
+    async def run(
+        self,
+        program: str,
+        *args: str,
+        operation: str = "run",
+        priority: int = PRIORITY_NORMAL,
+    ) -> bytes:
+        """Run one process in the pool and return its stdout."""
+        async with self._slot(priority):
+            POSTPROCESS_RUNNING.inc()
+            started = time.monotonic()
+            try:
+                process = await asyncio.create_subprocess_exec(
+                    program,
+                    *args,
+                    stdout=asyncio.subprocess.PIPE,
+                    stderr=asyncio.subprocess.PIPE,
+                )
+                try:
+                    stdout, stderr = await process.communicate()
+                except asyncio.CancelledError:
+                    process.kill()
+                    await process.wait()
+                    raise
+            finally:
+                POSTPROCESS_RUNNING.dec()
+                POSTPROCESS_SECONDS.labels(operation).observe(
+                    time.monotonic() - started
+                )
+
+        if process.returncode != 0:
+            message = stderr.decode(errors="replace").strip()[-500:]
+            raise PostProcessError(
+                f"{program} exited with {process.returncode}: {message}"
+            )
+        return stdout
+
+    async def probe(self, path: str) -> dict:
+        """Streams and format of a media file (``ffprobe -show_streams``)."""
+        output = await self.run(
+            self.ffprobe,
+            "-v",
+            "error",
+            "-print_format",
+            "json",
+            "-show_format",
+            "-show_streams",
+            path,
+            operation="probe",
+        )
+        return json.loads(output or b"{}")
+
+    async def ffmpeg_to(
+        self,
+        source: str | list[str],
+        target: str,
+        *args: str,
+        operation: str,
+        priority: int = PRIORITY_NORMAL,
+    ) -> str:
+        """
+        Write ``target`` from ``source`` (one or several inputs) with ffmpeg ``args``.
+
+        Output goes to a temporary name first, so an interrupted run never
+        leaves a truncated file under the final name.
+        """
+        root, ext = os.path.splitext(target)
+        tmp_target = f"{root}.tmp{ext}"
+        sources = [source] if isinstance(source, str) else source
+        try:
+            await self.run(
+                self.ffmpeg,
+                "-y",
+                "-v",
+                "error",
+                *itertools.chain.from_iterable(("-i", path) for path in sources),
+                *args,
+                tmp_target,
+                operation=operation,
+                priority=priority,
+            )
+            os.replace(tmp_target, target)
+        finally:
+            if os.path.exists(tmp_target):
+                os.remove(tmp_target)
+        return target
+
+    async def encode_to_bitrate(
+        self,
+        source: str,
+        target: str,
+        video_kbps: int,
+        audio_kbps: int,
+        priority: int = PRIORITY_LOW,
+    ) -> str:
+        """
+        Re-encode to H.264/AAC with the video bitrate capped at ``video_kbps``.
+
+        A single CRF pass with ``maxrate``: simple scenes stay below the
+        cap, and the output size is bounded by duration times bitrate.
+        """
+        return await self.ffmpeg_to(
+            source,
+            target,
+            *("-c:v", "libx264", "-preset", "veryfast", "-crf", "23"),
+            *("-maxrate", f"{video_kbps}k", "-bufsize", f"{video_kbps}k"),
+            *("-c:a", "aac", "-b:a", f"{audio_kbps}k"),
+            *("-movflags", "+faststart"),
+            operation="encode",
+            priority=priority,
+        )
+
+    async def faststart(self, path: str) -> str:
+        """Move the MP4 index to the front with a stream-copy remux."""
+        return await self.ffmpeg_to(
+            path,
+            path,
+            *("-map", "0", "-c", "copy", "-movflags", "+faststart"),
+            operation="faststart",
+        )
+
+    async def mux(self, video: str, audio: str, target: str) -> str:
+        """Join separate video and audio streams into one MP4 with stream copy."""
+        return await self.ffmpeg_to(
+            [video, audio],
+            target,
+            *("-map", "0:v:0", "-map", "1:a:0", "-c", "copy"),
+            *("-movflags", "+faststart"),
+            operation="mux",
+        )
+
+    async def thumbnail(self, path: str, target: str, at: float = 0.0) -> str:
+        """Small JPEG of the frame at ``at`` seconds."""
+        scale = f"scale={THUMBNAIL_SIZE}:{THUMBNAIL_SIZE}:force_original_aspect_ratio=decrease"
+        return await self.ffmpeg_to(
+            path,
+            target,
+            *("-ss", f"{at:.2f}", "-frames:v", "1", "-vf", scale, "-q:v", "5"),
+            operation="thumbnail",
+        )
+
+    async def extract_audio(self, path: str) -> str:
+        """
+        Turn a downloaded audio stream into a file Telegram plays as music.
+
+        AAC and MP3 are kept (remuxed with stream copy if the container
+        differs); anything else is transcoded to MP3. Returns the new path,
+        the source is removed if it was replaced.
+        """
+        info = await self.probe(path)
+        codec = next(
+            (
+                stream.get("codec_name")
+                for stream in info.get("streams", [])
+                if stream.get("codec_type") == "audio"
+            ),
+            None,
+        )
+        if codec is None:
+            raise PostProcessError(f"No audio stream in {path}")
+
+        root, ext = os.path.splitext(path)
+        container = AUDIO_CONTAINERS.get(codec)
+        if container is not None and ext.lower() == f".{container}":
+            return path
+
+        if container is not None:
+            # Кодек подходит - меняем только контейнер, без перекодирования
+            target = await self.ffmpeg_to(
+                path, f"{root}.{container}", "-vn", "-c:a", "copy", operation="remux"
+            )
+        else:
+            logger.debug(f"Transcoding {codec} audio of {path} to mp3")
+            target = await self.ffmpeg_to(
+                path, f"{root}.mp3", "-vn", *TRANSCODE_AUDIO_ARGS, operation="transcode"
+            )
+
+        if target != path:
+            os.remove(path)
+        return target
+
+
+async def postprocess_result(
+    result: dict | None, progress: ProgressStream | None = None
+) -> dict | None:
+    """Post-process the files of a successful download result in place."""
+    if not result or not result.get("success"):
+        return result
+
+    items = result.get("items") or [result]
+    if not any(item.get("content_type") == "audio" for item in items):
+        return result
+
+    if progress is not None:
+        progress.set_stage(STAGE_PROCESSING)
+    try:
+        for item in items:
+            if item.get("content_type") == "audio":
+                item["file_path"] = await postprocessor.extract_audio(item["file_path"])
+                item["file_size"] = os.path.getsize(item["file_path"])
+    except (PostProcessError, OSError) as e:
+        logger.error(f"Post-processing failed: {e}")
+        return {"success": False, "error": "⚠️ Не удалось обработать аудио"}
+
+    if result.get("items"):
+        result["file_path"] = items[0]["file_path"]
+        result["file_size"] = sum(item["file_size"] for item in items)
+    return result
+
+
+async def finalize_result(
+    result: dict | None, progress: ProgressStream | None = None
+) -> dict | None:
+    """
+    Prepare the videos of a successful result for streamable delivery.
+
+    Moves the MP4 index to the front if needed, fills in duration and
+    dimensions missing from the info dict and renders a thumbnail. Failures
+    are logged: the file is still sent, only without the extras.
+    """
+    if not result or not result.get("success"):
+        return result
+
+    items = result.get("items") or [result]
+    # Отправляемые ссылкой видео обрабатывать нечем - файла нет
+    videos = [
+        item
+        for item in items
+        if item.get("content_type") == "video" and item.get("file_path")
+    ]
+    if not videos:
+        return result
+
+    if progress is not None:
+        progress.set_stage(STAGE_PROCESSING)
+    for item in videos:
+        try:
+            await _finalize_video(item)
+        except (PostProcessError, OSError, ValueError) as e:
+            logger.warning(f"Failed to finalize {item['file_path']}: {e}")
+
+    if result.get("items"):
+        result["file_size"] = sum(item.get("file_size", 0) for item in items)
+    return result
+
+
+async def _finalize_video(item: dict) -> None:
+    path = item["file_path"]
+    if path.lower().endswith(MP4_EXTENSIONS) and moov_before_mdat(path) is False:
+        await postprocessor.faststart(path)
+        item["file_size"] = os.path.getsize(path)
+
+    if not all(item.get(key) for key in ("duration", "width", "height")):
+        metadata = video_metadata(await postprocessor.probe(path))
+        for key, value in metadata.items():
+            item.setdefault(key, value)
+
+    thumbnail = Path(settings.temp_dir) / f"{Path(path).stem}.thumb.jpg"
+    if not thumbnail.exists():
+        # Первый кадр часто чёрный - берём чуть дальше
+        at = min(1.0, (item.get("duration") or 0) / 2)
+        await postprocessor.thumbnail(path, str(thumbnail), at)
+    item["thumbnail"] = str(thumbnail)
+
+
+def moov_before_mdat(path: str) -> bool | None:
+    """
+    Whether the index (``moov``) of an MP4 precedes its media (``mdat``).
+
+    Reads only the top-level box headers. ``None`` if the file is not an MP4
+    or has neither box.
+    """
+    with open(path, "rb") as f:
+        while True:
+            header = f.read(8)
+            if len(header) < 8:
+                return None
+            size, kind = struct.unpack(">I4s", header)
+            header_size = 8
+            if size == 1:
+                size = struct.unpack(">Q", f.read(8))[0]
+                header_size = 16
+            if kind == b"moov":
+                return True
+            if kind == b"mdat":
+                return False
+            if size < header_size:
+                # size 0 - бокс до конца файла, меньше заголовка - не MP4
+                return None
+            f.seek(size - header_size, os.SEEK_CUR)
+
+
+def video_metadata(info: dict) -> dict[str, int]:
+    """Duration and display dimensions from ``ffprobe`` output."""
+    stream = next(
+        (s for s in info.get("streams", []) if s.get("codec_type") == "video"), {}
+    )
+    metadata = {}
+    duration = info.get("format", {}).get("duration") or stream.get("duration")
+    if duration:
+        metadata["duration"] = round(float(duration))
+    width, height = stream.get("width"), stream.get("height")
+    if width and height:
+        rotation = next(
+            (
+                data["rotation"]
+                for data in stream.get("side_data_list", [])
+                if "rotation" in data
+            ),
+            0,
+        )
+        # Снято вертикально с поворотом в метаданных - показываем как есть
+        if abs(int(rotation)) % 180 == 90:
+            width, height = height, width
+        metadata["width"], metadata["height"] = int(width), int(height)
+    return metadata
+
+
+postprocessor = PostProcessor(settings.ffmpeg_max_processes or os.cpu_count() or 1)
@@ -0,0 +1,273 @@
+"""Live progress reporting for download jobs."""
+
+import asyncio
+import glob
+import os
+import threading
+import time
+from collections.abc import Callable
+from dataclasses import dataclass, replace
+from typing import Any
+
+from aiogram.exceptions import TelegramBadRequest
+from aiogram.types import InlineKeyboardMarkup, Message
+from loguru import logger
+
+STAGE_QUEUED = "queued"
+STAGE_PROBING = "probing"
+STAGE_DOWNLOADING = "downloading"
+STAGE_PROCESSING = "processing"
+STAGE_UPLOADING = "uploading"
+
+
+@dataclass(frozen=True)
+class ProgressEvent:
+    """Snapshot of job progress."""
+
+    stage: str
+    percent: float | None = None
+    speed: float | None = None
+    eta: int | None = None
+    queue_position: int | None = None
+
+
+class ProgressStream:
+    """
+    Latest-value progress stream fed from yt-dlp hooks.
+
+    ``progress_hook``/``postprocessor_hook`` are called from the downloader
+    thread and only hand the newest snapshot to the event loop; consumers
+    iterating the stream always get the most recent state, intermediate
+    updates are coalesced.
+
+    The stream is also the job's cancellation channel: after ``cancel()`` the
+    next hook call raises ``DownloadCancelled`` inside the downloader thread,
+    and the files seen by the hooks can be removed with ``cleanup_partials()``.
+
+    ``on_checkpoint`` (if set) is called in the event loop whenever the stage
+    or the partial file changes - the points a crashed job can resume from.
+
+    ``max_filesize`` (if set) is the largest source file worth downloading
+    for the job; downloaders that know sizes up front skip bigger ones.
+    """
+
+    def __init__(self):
+        self._loop = asyncio.get_running_loop()
+        self._latest = ProgressEvent(stage=STAGE_QUEUED)
+        self._changed = asyncio.Event()
+        self._closed = False
+        self._cancelled = threading.Event()
+        self._files: set[str] = set()
+        self._part_path: str | None = None
+        self._checkpoint: tuple[str, str | None] | None = None
+        self.on_checkpoint: Callable[[ProgressEvent], None] | None = None
+        self.max_filesize: int | None = None
+
+    @property
+    def latest(self) -> ProgressEvent:
+        return self._latest
+
+    def publish(self, event: ProgressEvent) -> None:
+        """Publish from the event loop thread."""
+        self._latest = event
+        self._changed.set()
+
+        checkpoint = (event.stage, self._part_path)
+        if self.on_checkpoint is not None and checkpoint != self._checkpoint:
+            self._checkpoint = checkpoint
+            self.on_checkpoint(event)
+
+    def publish_threadsafe(self, event: ProgressEvent) -> None:
+        """Publish from a worker thread."""
+        self._loop.call_soon_threadsafe(self.publish, event)
+
+    def set_stage(self, stage: str) -> None:
+        self.publish(ProgressEvent(stage=stage))
+
+    def set_queue_position(self, position: int) -> None:
+        if position > 0:
+            self.publish(ProgressEvent(stage=STAGE_QUEUED, queue_position=position))
+        elif self._latest.stage == STAGE_QUEUED:
+            self.publish(ProgressEvent(stage=STAGE_PROBING))
+
+    @property
+    def part_path(self) -> str | None:
+        """Partial file yt-dlp is currently writing to."""
+        return self._part_path
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancelled.is_set()
+
+    def cancel(self) -> None:
+        """Ask the downloader thread to stop at the next hook call."""
+        self._cancelled.set()
+
+    def check_cancelled(self) -> None:
+        """Raise inside the downloader thread if the job was cancelled."""
+        if self._cancelled.is_set():
+            from yt_dlp.utils import DownloadCancelled
+
+            raise DownloadCancelled("Cancelled by user")
+
+    def track_file(self, path: str | None) -> None:
+        """Remember a file produced by the job (for cleanup on cancel)."""
+        if path:
+            self._files.add(path)
+
+    def cleanup_partials(self) -> None:
+        """Remove partial and intermediate files of a cancelled job."""
+        for path in self._files:
+            for candidate in (
+                path,
+                f"{path}.part",
+                f"{path}.ytdl",
+                *glob.glob(f"{glob.escape(path)}.part-Frag*"),
+            ):
+                try:
+                    os.remove(candidate)
+                except FileNotFoundError:
+                    pass
+                except OSError as e:
+                    logger.warning(f"Failed to remove partial file {candidate}: {e}")
+        self._files.clear()
+
+    def progress_hook(self, d: dict[str, Any]) -> None:
+        """yt-dlp ``progress_hooks`` entry."""
+        self.check_cancelled()
+        if d.get("tmpfilename"):
+            self._part_path = d["tmpfilename"]
+        self.track_file(d.get("tmpfilename"))
+        self.track_file(d.get("filename"))
+        if d.get("status") != "downloading":
+            return
+
+        total = d.get("total_bytes") or d.get("total_bytes_estimate")
+        downloaded = d.get("downloaded_bytes") or 0
+        percent = downloaded * 100 / total if total else None
+        self.publish_threadsafe(
+            ProgressEvent(
+                stage=STAGE_DOWNLOADING,
+                percent=percent,
+                speed=d.get("speed"),
+                eta=d.get("eta"),
+            )
+        )
+
+    def postprocessor_hook(self, d: dict[str, Any]) -> None:
+        """yt-dlp ``postprocessor_hooks`` entry."""
+        # Отмена до запуска ffmpeg; сам процесс yt-dlp прервать не даёт
+        self.check_cancelled()
+        self.track_file((d.get("info_dict") or {}).get("filepath"))
+        if d.get("status") == "started":
+            self.publish_threadsafe(ProgressEvent(stage=STAGE_PROCESSING))
+
+    @property
+    def closed(self) -> bool:
+        return self._closed
+
+    def close(self) -> None:
+        self._closed = True
+        self._changed.set()
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self) -> ProgressEvent:
+        await self._changed.wait()
+        self._changed.clear()
+        if self._closed:
+            raise StopAsyncIteration
+        return self._latest
+
+
+def render_progress(event: ProgressEvent, emoji: str = "⏳") -> str:
+    """Human readable progress text."""
+    if event.stage in (STAGE_QUEUED, STAGE_PROBING):
+        if event.queue_position:
+            return f"🕐 В очереди: {event.queue_position}"
+        return f"{emoji} Обрабатываю запрос..."
+
+    if event.stage == STAGE_PROCESSING:
+        return "⚙️ Обрабатываю файл..."
+
+    if event.stage == STAGE_UPLOADING:
+        return "📤 Отправляю файл..."
+
+    parts = [f"{emoji} Скачиваю"]
+    if event.percent is not None:
+        parts[0] += f": {event.percent:.0f}%"
+    if event.speed:
+        parts.append(f"{event.speed / (1024 * 1024):.1f} MB/s")
+    if event.eta is not None:
+        parts.append(f"осталось {event.eta // 60}:{event.eta % 60:02d}")
+    return " • ".join(parts)
+
+
+class ProgressReporter:
+    """
+    Edits the processing message from a progress stream.
+
+    At most one edit per ``interval`` seconds, and only when the rendered text
+    actually changed; percentages are rounded down to ``step`` to keep edit
+    traffic minimal.
+    """
+
+    def __init__(
+        self,
+        message: Message,
+        stream: ProgressStream,
+        interval: float = 3.0,
+        step: int = 5,
+        emoji: str = "⏳",
+        reply_markup: InlineKeyboardMarkup | None = None,
+    ):
+        self.message = message
+        self.stream = stream
+        self.interval = interval
+        self.step = step
+        self.emoji = emoji
+        self.reply_markup = reply_markup
+        self._last_text = message.text
+        self._task: asyncio.Task | None = None
+
+    def start(self) -> None:
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Stop after the edit in flight (if any) completes."""
+        self.stream.close()
+        if self._task is not None:
+            await self._task
+            self._task = None
+
+    async def _run(self) -> None:
+        last_edit = 0.0
+        async for event in self.stream:
+            # Throttle: ждём конец интервала, за это время событие может обновиться
+            wait = last_edit + self.interval - time.monotonic()
+            if wait > 0:
+                await asyncio.sleep(wait)
+                if self.stream.closed:
+                    break
+                event = self.stream.latest
+
+            text = render_progress(self._quantize(event), self.emoji)
+            if text == self._last_text:
+                continue
+
+            try:
+                await self.message.edit_text(text, reply_markup=self.reply_markup)
+                self._last_text = text
+            except TelegramBadRequest as e:
+                logger.debug(f"Progress edit skipped: {e}")
+            except Exception as e:
+                logger.warning(f"Progress edit failed: {e}")
+            last_edit = time.monotonic()
+
+    def _quantize(self, event: ProgressEvent) -> ProgressEvent:
+        if event.percent is None or self.step <= 1:
+            return event
+        return replace(
+            event, percent=float(int(event.percent) // self.step * self.step)
+        )
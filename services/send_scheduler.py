@@ -0,0 +1,349 @@
+"""Outbound Bot API scheduler honoring Telegram rate limits."""
+
+import asyncio
+import itertools
+import time
+from dataclasses import dataclass, field
+from typing import Any
+
+from aiogram import Bot
+from aiogram.client.session.middlewares.base import (
+    BaseRequestMiddleware,
+    NextRequestMiddlewareType,
+)
+from aiogram.exceptions import TelegramRetryAfter
+from aiogram.methods import (
+    EditMessageCaption,
+    EditMessageReplyMarkup,
+    EditMessageText,
+    SendAnimation,
+    SendAudio,
+    SendChatAction,
+    SendDocument,
+    SendMediaGroup,
+    SendPhoto,
+    SendVideo,
+    TelegramMethod,
+)
+from loguru import logger
+
+from utils.metrics import OUTBOUND_QUEUE_DEPTH, OUTBOUND_RETRY_AFTER
+
+# Меньше значение - выше приоритет
+PRIORITY_DELIVERY = 0
+PRIORITY_DEFAULT = 1
+PRIORITY_PROGRESS = 2
+
+DELIVERY_METHODS = (
+    SendVideo,
+    SendAudio,
+    SendPhoto,
+    SendDocument,
+    SendAnimation,
+    SendMediaGroup,
+)
+PROGRESS_METHODS = (
+    EditMessageText,
+    EditMessageCaption,
+    EditMessageReplyMarkup,
+    SendChatAction,
+)
+
+
+class TokenBucket:
+    """Classic token bucket: ``rate`` tokens per second, up to ``capacity``."""
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+
+    def _refill(self, now: float) -> None:
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def delay(self, now: float) -> float:
+        """Seconds until one token is available."""
+        self._refill(now)
+        if now < self.paused_until:
+            return self.paused_until - now
+        if self.tokens >= 1:
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+    def take(self, now: float) -> None:
+        self._refill(now)
+        self.tokens -= 1
+
+    def pause(self, seconds: float) -> None:
+        """Block the bucket (used for 429 ``retry_after``)."""
+        self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+        self.tokens = 0
+
+    def idle(self, now: float) -> bool:
+        self._refill(now)
+        return self.tokens >= self.capacity and now >= self.paused_until
+
+
+@dataclass
+class _Request:
+    priority: int
+    seq: int
+    chat_id: int | str
+    method: TelegramMethod
+    bot: Bot
+    make_request: NextRequestMiddlewareType
+    future: asyncio.Future
+    merge_key: tuple | None = None
+    attempts: int = 0
+    waiters: int = 0
+    order: tuple = field(init=False)
+
+    def __post_init__(self) -> None:
+        self.order = (self.priority, self.seq)
+
+
+class SendScheduler(BaseRequestMiddleware):
+    """
+    Session middleware that schedules every chat-bound Bot API call.
+
+    - global and per-chat token buckets (private chats and groups have
+      different limits);
+    - final deliveries go before plain messages, progress edits go last;
+    - a pending edit of the same message is replaced by the newer one, both
+      callers receive the result of the single request actually sent;
+    - ``429 retry_after`` pauses the chat and the request is retried here,
+      callers never see flood errors unless retries are exhausted.
+
+    Buckets are process-local: with ``workers`` processes each one gets an
+    equal share of every limit, so together they stay within Telegram's.
+    """
+
+    def __init__(
+        self,
+        global_rate: float = 30,
+        chat_rate: float = 1,
+        chat_burst: float = 3,
+        group_rate: float = 20 / 60,
+        max_retries: int = 3,
+        workers: int = 1,
+    ):
+        share = max(1, workers)
+        global_rate /= share
+        self.chat_rate = chat_rate / share
+        # Хотя бы одно сообщение должно помещаться в ведро
+        self.chat_burst = max(1.0, chat_burst / share)
+        self.group_rate = group_rate / share
+        self.max_retries = max_retries
+        self._global = TokenBucket(global_rate, max(1.0, global_rate))
+        self._chats: dict[int | str, TokenBucket] = {}
+        self._pending: list[_Request] = []
+        self._merge: dict[tuple, _Request] = {}
+        self._seq = itertools.count()
+        self._wakeup = asyncio.Event()
+        self._task: asyncio.Task | None = None
+        self._inflight: set[asyncio.Task] = set()
+
+    async def __call__(
+        self,
+        make_request: NextRequestMiddlewareType,
+        bot: Bot,
+        method: TelegramMethod,
+    ) -> Any:
+        chat_id = getattr(method, "chat_id", None)
+        if chat_id is None:
+            # getMe, setWebhook, answerCallbackQuery, ... - не ограничиваются по чату
+            return await make_request(bot, method)
+
+        merge_key = None
+        if isinstance(method, PROGRESS_METHODS) and not isinstance(
+            method, SendChatAction
+        ):
+            merge_key = (type(method), chat_id, method.message_id)
+            pending = self._merge.get(merge_key)
+            if pending is not None:
+                # Ещё не отправлено - просто подменяем текст на актуальный
+                pending.method = method
+                return await self._wait(pending)
+
+        request = _Request(
+            priority=self._priority(method),
+            seq=next(self._seq),
+            chat_id=chat_id,
+            method=method,
+            bot=bot,
+            make_request=make_request,
+            future=asyncio.get_running_loop().create_future(),
+            merge_key=merge_key,
+        )
+        self._enqueue(request)
+        self._ensure_running()
+        return await self._wait(request)
+
+    @staticmethod
+    async def _wait(request: _Request) -> Any:
+        """
+        Await a request that may be shared by merged callers.
+
+        Cancelling one caller must not cancel the others: the future is
+        shielded and only cancelled once nobody waits for it any more.
+        """
+        request.waiters += 1
+        try:
+            return await asyncio.shield(request.future)
+        finally:
+            request.waiters -= 1
+            if not request.waiters and not request.future.done():
+                # Ответа больше никто не ждёт - не отправляем
+                request.future.cancel()
+
+    async def close(self) -> None:
+        """Stop the dispatch loop."""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    @staticmethod
+    def _priority(method: TelegramMethod) -> int:
+        if isinstance(method, DELIVERY_METHODS):
+            return PRIORITY_DELIVERY
+        if isinstance(method, PROGRESS_METHODS):
+            return PRIORITY_PROGRESS
+        return PRIORITY_DEFAULT
+
+    def _bucket(self, chat_id: int | str) -> TokenBucket:
+        bucket = self._chats.get(chat_id)
+        if bucket is None:
+            is_private = isinstance(chat_id, int) and chat_id > 0
+            if is_private:
+                bucket = TokenBucket(self.chat_rate, self.chat_burst)
+            else:
+                bucket = TokenBucket(self.group_rate, self.chat_burst)
+            self._chats[chat_id] = bucket
+        return bucket
+
+    def _enqueue(self, request: _Request) -> None:
+        self._pending.append(request)
+        if request.merge_key is not None:
+            self._merge[request.merge_key] = request
+        OUTBOUND_QUEUE_DEPTH.set(len(self._pending))
+        self._wakeup.set()
+
+    def _ensure_running(self) -> None:
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    def _next_ready(self, now: float) -> tuple[_Request | None, float]:
+        """Highest priority request whose chat may send now, and time to wait."""
+        best = None
+        wait = float("inf")
+        for request in self._pending:
+            delay = self._bucket(request.chat_id).delay(now)
+            if delay > 0:
+                wait = min(wait, delay)
+            elif best is None or request.order < best.order:
+                best = request
+        return best, wait
+
+    async def _run(self) -> None:
+        while True:
+            self._wakeup.clear()
+            now = time.monotonic()
+
+            request, wait = self._next_ready(now)
+            global_delay = self._global.delay(now)
+            if request is not None and global_delay == 0:
+                self._dispatch(request, now)
+                continue
+
+            if request is not None:
+                wait = global_delay
+            self._gc_buckets(now)
+
+            try:
+                timeout = None if wait == float("inf") else wait
+                await asyncio.wait_for(self._wakeup.wait(), timeout)
+            except TimeoutError:
+                pass
+
+    def _dispatch(self, request: _Request, now: float) -> None:
+        self._pending.remove(request)
+        if request.merge_key is not None:
+            self._merge.pop(request.merge_key, None)
+        OUTBOUND_QUEUE_DEPTH.set(len(self._pending))
+        if request.future.cancelled():
+            # Вызывающий уже не ждёт ответа
+            return
+
+        self._global.take(now)
+        self._bucket(request.chat_id).take(now)
+
+        task = asyncio.create_task(self._send(request))
+        self._inflight.add(task)
+        task.add_done_callback(self._inflight.discard)
+
+    async def _send(self, request: _Request) -> None:
+        try:
+            result = await request.make_request(request.bot, request.method)
+        except TelegramRetryAfter as e:
+            OUTBOUND_RETRY_AFTER.inc()
+            request.attempts += 1
+            self._bucket(request.chat_id).pause(e.retry_after)
+            if request.attempts > self.max_retries:
+                if not request.future.done():
+                    request.future.set_exception(e)
+                return
+            logger.warning(
+                f"Flood control in chat {request.chat_id}, "
+                f"retry in {e.retry_after}s (attempt {request.attempts})"
+            )
+            newer = self._merge.get(request.merge_key) if request.merge_key else None
+            if newer is not None:
+                # Пока ждали, пришла более свежая правка - она и будет ответом
+                newer.future.add_done_callback(
+                    lambda f: self._follow(f, request)
+                )
+                return
+            self._enqueue(request)
+        except Exception as e:
+            if not request.future.done():
+                request.future.set_exception(e)
+        else:
+            if not request.future.done():
+                request.future.set_result(result)
+
+    def _follow(self, newer: asyncio.Future, request: _Request) -> None:
+        """Answer a flooded edit with the result of the newer one."""
+        if newer.cancelled() and not request.future.done():
+            # Вызывающие новой правки ушли - старую всё ещё ждут, отправляем её
+            self._enqueue(request)
+            self._ensure_running()
+            return
+        _copy_result(newer, request.future)
+
+    def _gc_buckets(self, now: float) -> None:
+        """Drop buckets of chats that are idle and have nothing pending."""
+        if len(self._chats) < 1024:
+            return
+        busy = {request.chat_id for request in self._pending}
+        for chat_id in [
+            c for c, b in self._chats.items() if c not in busy and b.idle(now)
+        ]:
+            del self._chats[chat_id]
+
+
+def _copy_result(source: asyncio.Future, target: asyncio.Future) -> None:
+    if target.done():
+        return
+    if source.cancelled():
+        target.cancel()
+    elif source.exception() is not None:
+        target.set_exception(source.exception())
+    else:
+        target.set_result(source.result())
@@ -0,0 +1,193 @@
+"""Fit-to-budget re-encoding of videos over the Telegram size limit."""
+
+import json
+import os
+import re
+import shutil
+from datetime import datetime
+from pathlib import Path
+
+from loguru import logger
+
+from config import settings
+from services.postprocess import PostProcessError, postprocessor
+from services.progress import STAGE_PROCESSING, ProgressStream
+
+AUDIO_KBPS = 96
+# Ниже этого видео уже не смотрибельно - лучше честно отказать
+MIN_VIDEO_KBPS = 150
+# Запас на контейнер и неточность rate control
+SIZE_MARGIN = 0.9
+
+
+def target_bitrates(duration: float, budget_bytes: int) -> tuple[int, int] | None:
+    """Video and audio kbps that fit ``duration`` seconds into the budget."""
+    if duration <= 0:
+        return None
+    total_kbps = budget_bytes * 8 * SIZE_MARGIN / duration / 1000
+    video_kbps = int(total_kbps - AUDIO_KBPS)
+    if video_kbps < MIN_VIDEO_KBPS:
+        return None
+    return video_kbps, AUDIO_KBPS
+
+
+def is_off_peak(now: datetime | None = None) -> bool:
+    """Whether the local hour is inside the off-peak window (may wrap midnight)."""
+    hour = (now or datetime.now()).hour
+    start, end = settings.transcode_offpeak_start, settings.transcode_offpeak_end
+    if start <= end:
+        return start <= hour < end
+    return hour >= start or hour < end
+
+
+def transcode_allowed(premium: bool, now: datetime | None = None) -> bool:
+    """Re-encoding is offered to premium users, and to everyone off-peak."""
+    return settings.transcode_enabled and (premium or is_off_peak(now))
+
+
+def source_size_limit(transcode: bool) -> int:
+    """Largest source worth downloading, in bytes: re-encoding allows bigger ones."""
+    limit_mb = settings.max_file_size_mb
+    if transcode:
+        limit_mb = max(limit_mb, settings.transcode_max_input_mb)
+    return limit_mb * 1024 * 1024
+
+
+class TranscodeCache:
+    """
+    Re-encoded download results by media key.
+
+    Every entry is a JSON copy of the result next to its files; the least
+    recently used entries are evicted once the directory exceeds
+    ``max_bytes``.
+    """
+
+    def __init__(self, directory: Path, max_bytes: int):
+        self.directory = Path(directory)
+        self.max_bytes = max_bytes
+
+    def get(self, key: str) -> dict | None:
+        meta = self._meta_path(key)
+        try:
+            result = json.loads(meta.read_text("utf-8"))
+        except (FileNotFoundError, ValueError):
+            return None
+        if not all(os.path.exists(item["file_path"]) for item in _files(result)):
+            return None
+        meta.touch()
+        return result
+
+    def put(self, key: str, result: dict) -> dict:
+        """Move the files of ``result`` into the cache and return the new result."""
+        self.directory.mkdir(parents=True, exist_ok=True)
+        name = _safe_name(key)
+        for i, item in enumerate(_files(result)):
+            target = self.directory / f"{name}_{i}{Path(item['file_path']).suffix}"
+            shutil.move(item["file_path"], target)
+            item["file_path"] = str(target)
+        if result.get("items"):
+            result["file_path"] = result["items"][0].get("file_path")
+
+        meta = self._meta_path(key)
+        tmp = meta.with_suffix(".tmp")
+        tmp.write_text(json.dumps(result, ensure_ascii=False), "utf-8")
+        os.replace(tmp, meta)
+        self._prune(keep=meta)
+        return result
+
+    def _meta_path(self, key: str) -> Path:
+        return self.directory / f"{_safe_name(key)}.json"
+
+    def _prune(self, keep: Path) -> None:
+        entries = []
+        for meta in self.directory.glob("*.json"):
+            try:
+                result = json.loads(meta.read_text("utf-8"))
+                files = [Path(item["file_path"]) for item in _files(result)]
+            except (OSError, ValueError, KeyError):
+                files = []
+            size = sum(path.stat().st_size for path in files if path.exists())
+            entries.append((meta.stat().st_mtime, meta, files, size))
+
+        total = sum(entry[3] for entry in entries)
+        for _, meta, files, size in sorted(entries, key=lambda entry: entry[0]):
+            if total <= self.max_bytes:
+                break
+            if meta == keep:
+                continue
+            for path in (meta, *files):
+                path.unlink(missing_ok=True)
+            total -= size
+
+
+async def fit_to_budget(
+    result: dict | None,
+    media_key: str | None = None,
+    progress: ProgressStream | None = None,
+) -> dict | None:
+    """
+    Re-encode the oversized videos of a result to fit ``max_file_size_mb``.
+
+    Runs at low priority in the post-processing pool. The result is
+    returned unchanged if nothing is oversized or it cannot be made to fit;
+    re-encoded results are cached under ``media_key``.
+    """
+    if not result or not result.get("success"):
+        return result
+
+    budget = settings.max_file_size_mb * 1024 * 1024
+    items = _items(result)
+    oversized = [item for item in _files(result) if item.get("file_size", 0) > budget]
+    if not oversized or any(item["content_type"] != "video" for item in oversized):
+        return result
+
+    if progress is not None:
+        progress.set_stage(STAGE_PROCESSING)
+    for item in oversized:
+        source = item["file_path"]
+        try:
+            info = await postprocessor.probe(source)
+            duration = float(info.get("format", {}).get("duration") or 0)
+            bitrates = target_bitrates(duration, budget)
+            if bitrates is None:
+                return result
+            target = await postprocessor.encode_to_bitrate(
+                source, f"{os.path.splitext(source)[0]}.fit.mp4", *bitrates
+            )
+        except (PostProcessError, OSError, ValueError) as e:
+            logger.error(f"Failed to fit {source} into {budget} bytes: {e}")
+            return result
+
+        size = os.path.getsize(target)
+        if size > budget:
+            os.remove(target)
+            return result
+        os.remove(source)
+        item.update(file_path=target, file_size=size)
+        logger.info(f"Re-encoded {source} at {bitrates[0]}k to {size} bytes")
+
+    if result.get("items"):
+        result["file_path"] = items[0].get("file_path")
+        result["file_size"] = sum(item["file_size"] for item in items)
+    if media_key:
+        result = transcode_cache.put(media_key, result)
+    return result
+
+
+def _items(result: dict) -> list[dict]:
+    return result.get("items") or [result]
+
+
+def _files(result: dict) -> list[dict]:
+    """Items of a result stored locally (not sent by URL)."""
+    return [item for item in _items(result) if item.get("file_path")]
+
+
+def _safe_name(key: str) -> str:
+    return re.sub(r"[^\w-]", "_", key)
+
+
+transcode_cache = TranscodeCache(
+    Path(settings.storage_dir) / "transcoded",
+    settings.transcode_cache_size_mb * 1024 * 1024,
+)
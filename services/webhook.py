@@ -0,0 +1,161 @@
+"""Webhook ingestion with a bounded update queue."""
+
+import asyncio
+from collections import deque
+from typing import Any
+
+from aiogram import Bot, Dispatcher
+from aiogram.methods import AnswerCallbackQuery, SendMessage, TelegramMethod
+from aiogram.webhook.aiohttp_server import SimpleRequestHandler
+from aiohttp import web
+from loguru import logger
+
+from services.drain import stop_intake
+from utils import shared_state
+from utils.metrics import (
+    WEBHOOK_DUPLICATE_UPDATES,
+    WEBHOOK_QUEUE_DEPTH,
+    WEBHOOK_SHED_UPDATES,
+)
+
+# Telegram retries a webhook delivery for up to ~24h, one hour covers the usual case
+DEDUP_TTL = 3600
+
+BUSY_TEXT = "⏳ Бот сейчас перегружен. Попробуйте ещё раз через минуту."
+
+
+class QueuedRequestHandler(SimpleRequestHandler):
+    """
+    Acknowledge webhook requests immediately and process updates in the background.
+
+    Updates are put into a bounded queue drained by a fixed number of dispatcher
+    tasks. Redelivered updates are rejected by ``update_id``. When the queue is
+    full the update is shed: the "busy" reply is returned in the webhook
+    response body itself, so it costs no extra Bot API request.
+    """
+
+    def __init__(
+        self,
+        dispatcher: Dispatcher,
+        bot: Bot,
+        queue_size: int = 1000,
+        workers: int = 16,
+        dedup_window: int = 10000,
+        **data: Any,
+    ) -> None:
+        super().__init__(dispatcher=dispatcher, bot=bot, **data)
+        self.queue: asyncio.Queue[dict[str, Any]] = asyncio.Queue(maxsize=queue_size)
+        self.workers = workers
+        self._seen_ids: set[int] = set()
+        self._seen_order: deque[int] = deque()
+        self._dedup_window = dedup_window
+        self._worker_tasks: list[asyncio.Task] = []
+        self._draining = False
+
+    def register(self, app: web.Application, /, path: str, **kwargs: Any) -> None:
+        """Register route and start dispatcher tasks with the application."""
+        super().register(app, path=path, **kwargs)
+        app.on_startup.append(self._start_workers)
+
+    async def _start_workers(self, app: web.Application) -> None:
+        self._worker_tasks = [
+            asyncio.create_task(self._worker(i)) for i in range(self.workers)
+        ]
+        logger.info(
+            f"Webhook queue started: {self.workers} workers, "
+            f"capacity {self.queue.maxsize}"
+        )
+
+    async def close(self) -> None:
+        """Drain in-flight updates, persist queued ones and stop dispatcher tasks."""
+        self._draining = True
+
+        # Ещё не начатые апдейты сохраняем для следующего запуска
+        queued = []
+        while not self.queue.empty():
+            queued.append(self.queue.get_nowait())
+            self.queue.task_done()
+        # Runs before the dispatcher shutdown hooks, so it stops the resume loop too
+        await stop_intake(self.dispatcher, queued)
+
+        for task in self._worker_tasks:
+            task.cancel()
+        await asyncio.gather(*self._worker_tasks, return_exceptions=True)
+        self._worker_tasks = []
+        await super().close()
+
+    async def is_duplicate(self, update_id: int | None) -> bool:
+        """Remember ``update_id`` and report whether it was already seen."""
+        if update_id is None:
+            return False
+        if update_id in self._seen_ids:
+            return True
+
+        self._seen_ids.add(update_id)
+        self._seen_order.append(update_id)
+        if len(self._seen_order) > self._dedup_window:
+            self._seen_ids.discard(self._seen_order.popleft())
+
+        # Другой воркер мог уже принять этот апдейт
+        if shared_state.is_shared:
+            return not await shared_state.claim(f"update:{update_id}", DEDUP_TTL)
+        return False
+
+    async def handle(self, request: web.Request) -> web.Response:
+        bot = await self.resolve_bot(request)
+        if not self.verify_secret(
+            request.headers.get("X-Telegram-Bot-Api-Secret-Token", ""), bot
+        ):
+            return web.Response(body="Unauthorized", status=401)
+
+        if self._draining:
+            # Telegram повторит доставку - её примет другой воркер или новый процесс
+            return web.Response(body="Shutting down", status=503)
+
+        update = await request.json(loads=bot.session.json_loads)
+
+        if await self.is_duplicate(update.get("update_id")):
+            WEBHOOK_DUPLICATE_UPDATES.inc()
+            logger.debug(f"Duplicate update {update.get('update_id')} ignored")
+            return web.json_response({}, dumps=bot.session.json_dumps)
+
+        try:
+            self.queue.put_nowait(update)
+        except asyncio.QueueFull:
+            WEBHOOK_SHED_UPDATES.inc()
+            logger.warning(
+                f"Webhook queue full, shedding update {update.get('update_id')}"
+            )
+            return web.Response(
+                body=self._build_response_writer(bot=bot, result=busy_reply(update))
+            )
+
+        WEBHOOK_QUEUE_DEPTH.set(self.queue.qsize())
+        return web.json_response({}, dumps=bot.session.json_dumps)
+
+    __call__ = handle
+
+    async def _worker(self, index: int) -> None:
+        while True:
+            update = await self.queue.get()
+            WEBHOOK_QUEUE_DEPTH.set(self.queue.qsize())
+            try:
+                await self._background_feed_update(bot=self.bot, update=update)
+            except Exception as e:
+                logger.error(
+                    f"Webhook worker {index} failed on update: {e}", exc_info=True
+                )
+            finally:
+                self.queue.task_done()
+
+
+def busy_reply(update: dict[str, Any]) -> TelegramMethod | None:
+    """Build a cheap "try later" answer for a shed update."""
+    if callback := update.get("callback_query"):
+        return AnswerCallbackQuery(callback_query_id=callback["id"], text=BUSY_TEXT)
+
+    message = update.get("message")
+    if message and message.get("chat", {}).get("type") == "private":
+        return SendMessage(chat_id=message["chat"]["id"], text=BUSY_TEXT)
+
+    return None
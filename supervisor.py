@@ -0,0 +1,158 @@
+"""Multi-process supervisor for webhook mode."""
+
+import asyncio
+import multiprocessing as mp
+import os
+import signal
+import time
+
+from aiogram import Bot
+from loguru import logger
+
+from config import settings
+
+# spawn: воркеры не наследуют состояние event loop и соединения родителя
+_ctx = mp.get_context("spawn")
+
+
+def _run_worker(ready) -> None:
+    """Worker process entry point."""
+    import main
+
+    main.install_uvloop()
+    asyncio.run(main.main(supervised=True, ready=ready))
+
+
+class Supervisor:
+    """
+    Fork N webhook workers sharing one port via ``SO_REUSEPORT``.
+
+    The supervisor owns one-time work (schema, webhook registration), restarts
+    crashed workers and performs a rolling restart on ``SIGHUP``: each worker
+    is replaced only after its successor reports ready, so the port is never
+    left without listeners.
+    """
+
+    def __init__(self, workers: int):
+        self.size = workers
+        self.workers: list[tuple[mp.Process, object]] = []
+        self._stopping = False
+        self._reload = False
+
+    def run(self) -> None:
+        """Run the supervisor until SIGTERM/SIGINT."""
+        from main import setup_logging
+
+        setup_logging()
+        if not asyncio.run(self._shared_state_reachable()):
+            # Без Redis каждый воркер считает задачи соседей брошенными и
+            # перезапускает их, а общий файл журнала они перезаписывают друг другу
+            logger.error(
+                f"{self.size} workers need Redis at {settings.redis_url} for shared "
+                "state; start it or run a single worker (WORKERS=1)"
+            )
+            raise SystemExit(1)
+        logger.info(f"Supervisor {os.getpid()} starting {self.size} workers")
+
+        asyncio.run(self._prepare())
+
+        signal.signal(signal.SIGTERM, self._on_stop)
+        signal.signal(signal.SIGINT, self._on_stop)
+        signal.signal(signal.SIGHUP, self._on_reload)
+
+        for _ in range(self.size):
+            self.workers.append(self._spawn())
+
+        while not self._stopping:
+            if self._reload:
+                self._reload = False
+                self._rolling_restart()
+            self._reap()
+            time.sleep(1)
+
+        self._shutdown()
+
+    @staticmethod
+    async def _shared_state_reachable() -> bool:
+        """Workers coordinate jobs, dedup and the journal only through Redis."""
+        from utils import shared_state
+
+        try:
+            return await shared_state.connect()
+        finally:
+            await shared_state.close()
+
+    async def _prepare(self) -> None:
+        """One-time startup work that must not race between workers."""
+        from database import init_db
+
+        await init_db()
+
+        bot = Bot(token=settings.bot_token)
+        try:
+            await bot.set_webhook(
+                url=f"{settings.webhook_url}/webhook", drop_pending_updates=False
+            )
+            logger.info(f"Webhook set to {settings.webhook_url}/webhook")
+        finally:
+            await bot.session.close()
+
+    def _spawn(self) -> tuple[mp.Process, object]:
+        ready = _ctx.Event()
+        process = _ctx.Process(target=_run_worker, args=(ready,), daemon=False)
+        process.start()
+        logger.info(f"Worker {process.pid} started")
+        return process, ready
+
+    def _reap(self) -> None:
+        """Respawn workers that exited unexpectedly."""
+        for i, (process, _) in enumerate(self.workers):
+            if not process.is_alive() and not self._stopping:
+                logger.error(
+                    f"Worker {process.pid} exited with {process.exitcode}, respawning"
+                )
+                self.workers[i] = self._spawn()
+
+    def _rolling_restart(self) -> None:
+        logger.info("Rolling restart of workers")
+        for i, (old, _) in enumerate(list(self.workers)):
+            new, ready = self._spawn()
+            if not ready.wait(timeout=settings.worker_shutdown_timeout):
+                logger.error(
+                    f"Worker {new.pid} did not become ready, keeping {old.pid}"
+                )
+                self._terminate(new)
+                continue
+            self.workers[i] = (new, ready)
+            self._terminate(old)
+        logger.info("Rolling restart finished")
+
+    def _terminate(self, process: mp.Process) -> None:
+        """SIGTERM, wait for graceful drain, then SIGKILL."""
+        if not process.is_alive():
+            return
+        process.terminate()
+        process.join(settings.worker_shutdown_timeout)
+        if process.is_alive():
+            logger.warning(f"Worker {process.pid} did not stop in time, killing")
+            process.kill()
+            process.join()
+
+    def _shutdown(self) -> None:
+        logger.info("Supervisor stopping workers...")
+        for process, _ in self.workers:
+            if process.is_alive():
+                process.terminate()
+        deadline = time.monotonic() + settings.worker_shutdown_timeout
+        for process, _ in self.workers:
+            process.join(max(0.0, deadline - time.monotonic()))
+            if process.is_alive():
+                process.kill()
+                process.join()
+        logger.info("Supervisor stopped")
+
+    def _on_stop(self, signum, frame) -> None:
+        self._stopping = True
+
+    def _on_reload(self, signum, frame) -> None:
+        self._reload = True
@@ -0,0 +1,131 @@
+import os
+import sys
+import threading
+import time
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from downloaders.bandwidth import (
+    DEFAULT_CHUNK_SIZE,
+    MAX_CHUNK_SIZE,
+    MIN_CHUNK_SIZE,
+    ConnectionLimiter,
+    DownloadBudget,
+    ThroughputTuner,
+    cdn_key,
+)
+
+MB = 1024 * 1024
+
+
+def test_connections_capped_per_job_and_per_cdn():
+    """Задача получает не больше своего бюджета, CDN - не больше общего лимита."""
+    limiter = ConnectionLimiter(per_host=6, per_job=4)
+
+    assert limiter.acquire("googlevideo.com") == 4
+    # На остаток лимита CDN - меньше бюджета задачи
+    assert limiter.acquire("googlevideo.com") == 2
+    # Другой CDN считается отдельно
+    assert limiter.acquire("tiktokcdn.com") == 4
+    with pytest.raises(TimeoutError):
+        limiter.acquire("googlevideo.com", timeout=0.01)
+
+    granted = []
+    waiter = threading.Thread(
+        target=lambda: granted.append(limiter.acquire("googlevideo.com"))
+    )
+    waiter.start()
+    time.sleep(0.05)
+    assert not granted
+    limiter.release("googlevideo.com", 2)
+    waiter.join(timeout=1)
+    assert granted == [2]
+
+
+def test_chunk_size_follows_smoothed_throughput():
+    """Размер куска растёт со скоростью CDN и остаётся в пределах."""
+    tuner = ThroughputTuner()
+    assert tuner.chunk_size("cdn.com") == DEFAULT_CHUNK_SIZE
+
+    # 100 KB/s на соединение - минимальный кусок
+    tuner.record("cdn.com", 10 * MB, 100.0)
+    assert tuner.chunk_size("cdn.com") == MIN_CHUNK_SIZE
+
+    # Быстрые загрузки поднимают размер постепенно, до потолка
+    sizes = []
+    for _ in range(10):
+        tuner.record("cdn.com", 40 * MB, 4.0, connections=2)
+        sizes.append(tuner.chunk_size("cdn.com"))
+    assert sizes == sorted(sizes)
+    assert MIN_CHUNK_SIZE < sizes[0] < MAX_CHUNK_SIZE
+    assert sizes[-1] == MAX_CHUNK_SIZE
+
+    # Короткие загрузки не учитываются
+    before = tuner.chunk_size("other.com")
+    tuner.record("other.com", 1000, 0.001)
+    assert tuner.chunk_size("other.com") == before
+
+
+def test_budget_sets_download_params_per_lease():
+    """Перед загрузкой выставляются соединения и кусок, после аренды - снимаются."""
+    limiter = ConnectionLimiter(per_host=16, per_job=4)
+    tuner = ThroughputTuner()
+    params = {}
+    budget = DownloadBudget(params, limiter, tuner)
+
+    budget.reserve(
+        {
+            "requested_formats": [
+                {"url": "https://rr3---sn-a.googlevideo.com/videoplayback?x"},
+                {"url": "https://rr3---sn-a.googlevideo.com/videoplayback?y"},
+            ]
+        }
+    )
+    assert params == {
+        "concurrent_fragment_downloads": 4,
+        "http_chunk_size": DEFAULT_CHUNK_SIZE,
+    }
+
+    budget.record(
+        {
+            "status": "finished",
+            "total_bytes": 30 * MB,
+            "elapsed": 10.0,
+            "info_dict": {"protocol": "http_dash_segments"},
+        }
+    )
+    # 30 MB за 10 с на 4 соединения: 0.75 MB/s на соединение
+    assert tuner.chunk_size("googlevideo.com") == int(30 * MB / 10 / 4 * 5)
+
+    budget.release()
+    assert params == {}
+    assert limiter.acquire("googlevideo.com", timeout=0) == 4
+
+
+def test_busy_cdn_falls_back_to_one_connection(monkeypatch):
+    """Если CDN занят дольше таймаута, загрузка идёт в одно соединение вне бюджета."""
+    from downloaders import bandwidth
+
+    monkeypatch.setattr(bandwidth, "ACQUIRE_TIMEOUT", 0.01)
+    limiter = ConnectionLimiter(per_host=4, per_job=4)
+    assert limiter.acquire("googlevideo.com") == 4
+    params = {}
+    budget = DownloadBudget(params, limiter, ThroughputTuner())
+
+    budget.reserve({"url": "https://rr1---sn-a.googlevideo.com/videoplayback"})
+    assert params["concurrent_fragment_downloads"] == 1
+
+    budget.release()
+    assert params == {}
+    # Чужие соединения не возвращены за него
+    with pytest.raises(TimeoutError):
+        limiter.acquire("googlevideo.com", timeout=0)
+
+
+def test_cdn_edges_share_a_key():
+    """Edge-хосты одного CDN делят общий лимит."""
+    assert cdn_key("https://rr1---sn-x.googlevideo.com/a") == "googlevideo.com"
+    assert cdn_key("https://rr5---sn-y.googlevideo.com/b") == "googlevideo.com"
+    assert cdn_key("not a url") is None
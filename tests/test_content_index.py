@@ -0,0 +1,79 @@
+import os
+import sys
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+from aiogram.exceptions import TelegramBadRequest
+from aiogram.methods import SendVideo
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from handlers.download import _deliver
+from services.content_index import SAMPLE_SIZE, ContentIndex, fingerprint
+
+
+def video(tmp_path, name: str, payload: bytes) -> dict:
+    path = tmp_path / name
+    path.write_bytes(payload)
+    return {"file_path": str(path), "content_type": "video", "file_size": len(payload)}
+
+
+def test_fingerprint_matches_identical_bytes_only(tmp_path):
+    """Одинаковые файлы под разными именами совпадают, изменённый - нет."""
+    payload = os.urandom(4 * SAMPLE_SIZE)
+    changed = bytearray(payload)
+    changed[2 * SAMPLE_SIZE] ^= 0xFF
+    a, b, c = (tmp_path / name for name in ("a.mp4", "b.mp4", "c.mp4"))
+    a.write_bytes(payload)
+    b.write_bytes(payload)
+    c.write_bytes(bytes(changed))
+
+    assert fingerprint(str(a), 10) == fingerprint(str(b), 10)
+    assert fingerprint(str(a), 10) != fingerprint(str(c), 10)
+    assert fingerprint(str(a), 10) != fingerprint(str(a), 11)
+
+
+@pytest.mark.asyncio
+async def test_duplicate_download_is_sent_by_file_id(tmp_path):
+    """Второй раз тот же файл уходит по file_id без загрузки."""
+    index = ContentIndex(ttl=60)
+    payload = os.urandom(1024)
+    first = video(tmp_path, "tiktok_1.mp4", payload)
+    await index.resolve([first])
+    await index.remember(first, "FILE_ID")
+
+    repost = video(tmp_path, "tiktok_2.mp4", payload)
+    await index.resolve([repost])
+
+    assert repost["file_id"] == "FILE_ID"
+
+
+@pytest.mark.asyncio
+async def test_rejected_file_id_falls_back_to_upload(tmp_path, monkeypatch):
+    """Если Telegram не принял file_id, файл загружается заново."""
+    from handlers import download
+
+    index = ContentIndex(ttl=60)
+    monkeypatch.setattr(download, "content_index", index)
+    payload = os.urandom(1024)
+    first = video(tmp_path, "a.mp4", payload)
+    await index.resolve([first])
+    await index.remember(first, "STALE")
+
+    sent = MagicMock(video=MagicMock(file_id="FRESH"))
+    message = MagicMock()
+    message.answer_video = AsyncMock(
+        side_effect=[
+            TelegramBadRequest(SendVideo(chat_id=1, video="STALE"), "wrong file id"),
+            sent,
+        ]
+    )
+    item = video(tmp_path, "b.mp4", payload)
+
+    await _deliver(message, [item], caption=None)
+
+    uploads = [call.args[0] for call in message.answer_video.call_args_list]
+    assert uploads[0] == "STALE"
+    assert uploads[1].path == item["file_path"]
+    await index.resolve([item])
+    assert item["file_id"] == "FRESH"
@@ -11,11 +11,8 @@ with patch('sqlalchemy.dialects.postgresql.psycopg2') as mock_psycopg2:
 import os
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from handlers.download import (
-    URL_PATTERNS 
-    # handle_url, 
-    # download_menu
-)
+from downloaders import URL_PATTERNS
+# from handlers.download import handle_url, download_menu
 from database import User
 
 @pytest.fixture(autouse=True)
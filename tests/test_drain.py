@@ -0,0 +1,82 @@
+import asyncio
+import os
+import sys
+
+import pytest
+from aiogram.types import Update
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.drain import PendingUpdates, UpdateTracker
+
+
+def make_update(update_id: int) -> Update:
+    return Update.model_validate(
+        {
+            "update_id": update_id,
+            "message": {
+                "message_id": 1,
+                "date": 0,
+                "chat": {"id": 42, "type": "private"},
+                "text": "https://youtu.be/dQw4w9WgXcQ",
+            },
+        }
+    )
+
+
+@pytest.mark.asyncio
+async def test_drain_waits_then_returns_unfinished_updates():
+    """Быстрые обработчики успевают завершиться, зависшие возвращаются для повтора."""
+    tracker = UpdateTracker()
+
+    async def fast(event, data):
+        await asyncio.sleep(0.01)
+
+    async def slow(event, data):
+        await asyncio.sleep(10)
+
+    fast_task = asyncio.create_task(tracker(fast, make_update(1), {}))
+    slow_task = asyncio.create_task(tracker(slow, make_update(2), {}))
+    await asyncio.sleep(0)
+
+    leftovers = await tracker.drain(timeout=0.1)
+
+    assert fast_task.done() and not fast_task.cancelled()
+    assert [update["update_id"] for update in leftovers] == [2]
+    with pytest.raises(asyncio.CancelledError):
+        await slow_task
+
+
+@pytest.mark.asyncio
+async def test_pending_updates_survive_restart(tmp_path):
+    """Сохранённые апдейты читаются один раз после перезапуска."""
+    store = PendingUpdates(str(tmp_path / "pending.jsonl"))
+    update = make_update(5).model_dump(mode="json", exclude_none=True)
+
+    await store.save([update])
+
+    assert await store.load() == [update]
+    assert await store.load() == []
+
+
+@pytest.mark.asyncio
+async def test_resume_loop_stopped_before_drain_and_drained_once(monkeypatch):
+    """Цикл возобновления останавливается до сохранения апдейтов, drain - один раз."""
+    from aiogram import Dispatcher
+
+    from services import drain
+
+    dispatcher = Dispatcher()
+    dispatcher["resume_task"] = asyncio.create_task(asyncio.sleep(10))
+    drained = []
+
+    async def fake_drain(extra=None):
+        assert dispatcher["resume_task"].cancelled()
+        drained.append(extra)
+
+    monkeypatch.setattr(drain, "drain_updates", fake_drain)
+
+    await drain.stop_intake(dispatcher, [{"update_id": 1}])
+    await drain.stop_intake(dispatcher)
+
+    assert drained == [[{"update_id": 1}]]
@@ -0,0 +1,94 @@
+import os
+import sys
+from unittest.mock import AsyncMock
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.history import DownloadEvent, HistoryWriter
+
+
+def make_event(user_id: int = 1) -> DownloadEvent:
+    return DownloadEvent(
+        user_id=user_id,
+        platform="tiktok",
+        url="https://vm.tiktok.com/abc/",
+        content_type="video",
+        file_size=1024,
+    )
+
+
+@pytest.mark.asyncio
+async def test_flush_writes_in_batches(tmp_path):
+    """События пишутся пачками не больше batch_size."""
+    writer = HistoryWriter(batch_size=2, spool_file=str(tmp_path / "spool.jsonl"))
+    writer._write = AsyncMock()
+
+    for i in range(5):
+        writer.record(make_event(i))
+
+    assert await writer.flush() == 5
+    assert [len(call.args[0]) for call in writer._write.await_args_list] == [2, 2, 1]
+    assert writer.pending == 0
+
+
+@pytest.mark.asyncio
+async def test_failed_flush_keeps_events_and_spools_on_stop(tmp_path):
+    """При ошибке БД события не теряются и переживают перезапуск."""
+    spool = tmp_path / "spool.jsonl"
+    writer = HistoryWriter(spool_file=str(spool))
+    writer._write = AsyncMock(side_effect=RuntimeError("db down"))
+
+    writer.record(make_event(1))
+    writer.record(make_event(2))
+    await writer.stop()
+
+    assert spool.exists()
+
+    restarted = HistoryWriter(spool_file=str(spool))
+    restarted._write = AsyncMock()
+    await restarted.start()
+    await restarted.stop()
+
+    written = restarted._write.await_args_list[0].args[0]
+    assert [event.user_id for event in written] == [1, 2]
+    assert not spool.exists()
+
+
+def rejected() -> Exception:
+    from sqlalchemy.exc import IntegrityError
+
+    return IntegrityError("INSERT", {}, Exception("constraint"))
+
+
+@pytest.mark.asyncio
+async def test_rejected_row_does_not_block_others(tmp_path):
+    """Строку, которую отвергла БД, откладываем; остальные записываются."""
+    spool = tmp_path / "spool.jsonl"
+    writer = HistoryWriter(spool_file=str(spool))
+
+    async def write(events):
+        if any(event.user_id == 2 for event in events):
+            raise rejected()
+
+    writer._write = AsyncMock(side_effect=write)
+    for i in range(1, 4):
+        writer.record(make_event(i))
+
+    assert await writer.flush() == 2
+    assert writer.pending == 0
+    lines = (tmp_path / "history_rejected.jsonl").read_text().splitlines()
+    assert len(lines) == 1 and '"user_id": 2' in lines[0]
+
+
+def test_buffer_is_capped_while_db_is_down(tmp_path):
+    """Пока БД недоступна, лишние события уходят в spool, а не в память."""
+    spool = tmp_path / "spool.jsonl"
+    writer = HistoryWriter(batch_size=2, spool_file=str(spool), max_buffer=3)
+
+    for i in range(5):
+        writer.record(make_event(i))
+
+    assert writer.pending == 3
+    assert len(spool.read_text().splitlines()) == 2
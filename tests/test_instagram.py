@@ -0,0 +1,96 @@
+import os
+import sys
+import threading
+import time
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from downloaders import instagram
+
+
+@pytest.mark.asyncio
+async def test_carousel_entries_fetched_in_parallel_with_limit(monkeypatch):
+    """Все элементы карусели скачиваются параллельно, но не больше лимита."""
+    monkeypatch.setattr(instagram.settings, "instagram_fetch_concurrency", 2)
+    monkeypatch.setattr(
+        instagram,
+        "_extract_instagram_info",
+        lambda url, progress: {
+            "_type": "playlist",
+            "title": "Carousel",
+            "extractor": "Instagram",
+            "entries": [{"id": str(i)} for i in range(5)],
+        },
+    )
+
+    active = 0
+    peak = 0
+    lock = threading.Lock()
+
+    def fake_entry(entry, progress):
+        nonlocal active, peak
+        with lock:
+            active += 1
+            peak = max(peak, active)
+        time.sleep(0.05)
+        with lock:
+            active -= 1
+        assert entry["extractor"] == "Instagram"
+        content_type = "video" if entry["id"] == "0" else "photo"
+        return {
+            "file_path": f"/tmp/{entry['id']}",
+            "content_type": content_type,
+            "file_size": 10,
+        }
+
+    monkeypatch.setattr(instagram, "_download_instagram_entry", fake_entry)
+
+    result = await instagram.download_instagram_content("https://instagram.com/p/x")
+
+    assert result["success"]
+    assert [item["file_path"] for item in result["items"]] == [
+        f"/tmp/{i}" for i in range(5)
+    ]
+    assert result["file_size"] == 50
+    assert peak == 2
+
+
+@pytest.mark.parametrize("source", ["login", "cookies_file"])
+def test_account_session_extracts_with_login_cookies(tmp_path, monkeypatch, source):
+    """Аккаунт-сессия извлекает посты с куками логина, а не анонимно."""
+    import importlib
+
+    from downloaders import sessions
+    from downloaders.sessions import Session, SessionPool
+
+    # downloaders.ydl_pool в пакете - экземпляр пула, нужен сам модуль
+    ydl_pool = importlib.import_module("downloaders.ydl_pool")
+
+    monkeypatch.setattr(ydl_pool.settings, "temp_dir", str(tmp_path))
+    if source == "login":
+        monkeypatch.setattr(
+            sessions, "instagram_login", lambda u, p: {"sessionid": "abc"}
+        )
+        account = Session(
+            "instagram", "account", tmp_path / "acc.txt", username="u", password="p"
+        )
+    else:
+        exported = tmp_path / "browser.txt"
+        sessions.write_cookie_file(
+            exported, sessions.INSTAGRAM_COOKIE_DOMAIN, {"sessionid": "abc"}
+        )
+        account = Session(
+            "instagram", "account", tmp_path / "acc.txt", seed_cookie_file=exported
+        )
+    pool = SessionPool(
+        "instagram", [Session("instagram", "anon", tmp_path / "anon.txt"), account]
+    )
+    monkeypatch.setattr(ydl_pool, "session_pool", lambda platform: pool)
+
+    with ydl_pool.YDLPool().lease("instagram") as ydl:
+        header = ydl.cookiejar.get_cookie_header("https://www.instagram.com/p/x/")
+
+    assert account.authenticated
+    assert "sessionid=abc" in header
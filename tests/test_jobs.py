@@ -0,0 +1,135 @@
+import asyncio
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.jobs import JobScheduler
+
+
+@pytest.mark.asyncio
+async def test_slots_are_bounded_and_positions_reported():
+    """Больше max_concurrent задач одновременно не выполняется, очередь видит позиции."""
+    scheduler = JobScheduler(max_concurrent=1)
+    release = asyncio.Event()
+    positions: dict[str, list[int]] = {"a": [], "b": []}
+
+    async def holder():
+        async with scheduler.slot():
+            await release.wait()
+
+    async def waiter(name: str, premium: bool = False):
+        async with scheduler.slot(premium=premium, on_position=positions[name].append):
+            pass
+
+    first = asyncio.create_task(holder())
+    await asyncio.sleep(0)
+    a = asyncio.create_task(waiter("a"))
+    await asyncio.sleep(0)
+    b = asyncio.create_task(waiter("b", premium=True))
+    await asyncio.sleep(0)
+
+    assert scheduler.running == 1
+    assert scheduler.queued == 2
+    # Premium обгоняет обычного пользователя в очереди
+    assert positions["a"][-1] == 2
+    assert positions["b"][-1] == 1
+
+    release.set()
+    await asyncio.gather(first, a, b)
+
+    assert positions["a"][-1] == 0
+    assert scheduler.running == 0
+
+
+@pytest.mark.asyncio
+async def test_cancelled_waiter_leaves_queue():
+    """Отменённая задача из очереди не занимает слот."""
+    scheduler = JobScheduler(max_concurrent=1)
+    release = asyncio.Event()
+
+    async def holder():
+        async with scheduler.slot():
+            await release.wait()
+
+    async def waiter():
+        async with scheduler.slot():
+            pass
+
+    first = asyncio.create_task(holder())
+    await asyncio.sleep(0)
+    queued = asyncio.create_task(waiter())
+    await asyncio.sleep(0)
+
+    queued.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await queued
+
+    assert scheduler.queued == 0
+    release.set()
+    await first
+    assert scheduler.running == 0
+
+
+@pytest.mark.asyncio
+async def test_waiter_cancelled_in_same_tick_as_release():
+    """Отмена ожидающей задачи в тот же тик, что и освобождение слота, его не теряет."""
+    scheduler = JobScheduler(max_concurrent=1)
+
+    async def waiter():
+        async with scheduler.slot():
+            pass
+
+    async with scheduler.slot():
+        queued = asyncio.create_task(waiter())
+        await asyncio.sleep(0)
+        # Отмена в очереди: future уже отменён, задача ещё не проснулась
+        queued.cancel()
+
+    with pytest.raises(asyncio.CancelledError):
+        await queued
+    assert scheduler.running == 0
+    assert scheduler.queued == 0
+
+
+@pytest.mark.asyncio
+async def test_cancel_job_stops_running_download(tmp_path):
+    """Отмена прерывает поток yt-dlp на следующем хуке и удаляет .part файлы."""
+    from downloaders.common import run_blocking
+    from services.progress import ProgressStream
+
+    scheduler = JobScheduler(max_concurrent=1)
+    progress = ProgressStream()
+    job = scheduler.create_job(user_id=7, progress=progress)
+    part = tmp_path / "video.mp4.part"
+    started = asyncio.Event()
+    loop = asyncio.get_running_loop()
+
+    def fake_download(url, progress):
+        hook = {"status": "downloading", "filename": str(tmp_path / "video.mp4")}
+        progress.progress_hook(hook)
+        part.write_bytes(b"partial")
+        loop.call_soon_threadsafe(started.set)
+        while True:
+            progress.progress_hook(hook)
+
+    async def run():
+        async with scheduler.slot():
+            return await run_blocking(fake_download, "url", progress)
+
+    job.task = asyncio.create_task(run())
+    await started.wait()
+
+    assert not scheduler.cancel_job(job.id, user_id=8)
+    assert scheduler.cancel_job(job.id, user_id=7)
+    with pytest.raises(asyncio.CancelledError):
+        await job.task
+
+    assert scheduler.running == 0
+    for _ in range(100):
+        if not part.exists():
+            break
+        await asyncio.sleep(0.01)
+    assert not part.exists()
@@ -0,0 +1,62 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.journal import JobJournal
+from services.progress import STAGE_DOWNLOADING, STAGE_UPLOADING
+
+
+@pytest.mark.asyncio
+async def test_interrupted_job_is_adopted_after_restart(tmp_path):
+    """Незавершённая задача прошлого процесса подхватывается с её стадией и .part."""
+    journal_file = str(tmp_path / "journal.json")
+    crashed = JobJournal(journal_file)
+    crashed.record("job1", STAGE_DOWNLOADING, update_id=7, part_path="/tmp/a.part")
+    crashed.record("job2", STAGE_UPLOADING, update_id=8)
+    crashed.complete("job2")
+    await crashed.flush()
+
+    restarted = JobJournal(journal_file)
+    adopted = await restarted.adopt_orphans()
+
+    assert [job["id"] for job in adopted] == ["job1"]
+    assert adopted[0]["stage"] == STAGE_DOWNLOADING
+    assert adopted[0]["part_path"] == "/tmp/a.part"
+    assert restarted.has_update(7)
+
+    # Усыновлённая задача теперь наша и повторно не выдаётся
+    await restarted.flush()
+    assert await restarted.adopt_orphans() == []
+
+
+@pytest.mark.asyncio
+async def test_own_jobs_are_not_adopted(tmp_path):
+    """Свои выполняющиеся задачи процесс не перезапускает."""
+    journal = JobJournal(str(tmp_path / "journal.json"))
+    journal.record("job1", STAGE_DOWNLOADING, update_id=1)
+    await journal.flush()
+
+    assert await journal.adopt_orphans() == []
+
+
+def test_supervisor_refuses_several_workers_without_redis(monkeypatch):
+    """Без Redis несколько воркеров не запускаются: они бы забирали задачи друг друга."""
+    import main
+    from supervisor import Supervisor
+    from utils import shared_state
+
+    async def unreachable():
+        return False
+
+    def no_spawn(self):
+        raise AssertionError("workers must not be started")
+
+    monkeypatch.setattr(main, "setup_logging", lambda: None)
+    monkeypatch.setattr(shared_state, "connect", unreachable)
+    monkeypatch.setattr(Supervisor, "_spawn", no_spawn)
+
+    with pytest.raises(SystemExit):
+        Supervisor(2).run()
@@ -0,0 +1,43 @@
+import os
+import sys
+
+from aiogram.types import MessageEntity
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from downloaders import extract_urls
+from handlers.download import MEDIA_GROUP_SIZE, _media_groups
+
+
+def test_extract_urls_from_text_and_entities():
+    """Все поддерживаемые ссылки сообщения, по порядку и без повторов."""
+    text = (
+        "смотри https://vm.tiktok.com/ZSaD796vL/, и https://youtu.be/dQw4w9WgXcQ "
+        "ещё https://example.com/x и снова https://vm.tiktok.com/ZSaD796vL/ тут"
+    )
+    entities = [
+        MessageEntity(
+            type="text_link", offset=0, length=7, url="https://x.com/a/status/1"
+        ),
+    ]
+
+    assert extract_urls(text, entities) == [
+        "https://x.com/a/status/1",
+        "https://vm.tiktok.com/ZSaD796vL/",
+        "https://youtu.be/dQw4w9WgXcQ",
+    ]
+
+
+def test_media_groups_split_by_kind_and_size():
+    """Фото и видео идут вместе, аудио отдельно, не больше 10 в группе."""
+    results = [
+        {"file_path": f"/tmp/{i}.mp4", "content_type": "video"} for i in range(12)
+    ]
+    results.append({"file_path": "/tmp/p.jpg", "content_type": "photo"})
+    results.append({"file_path": "/tmp/a.mp3", "content_type": "audio"})
+
+    groups = _media_groups(results)
+
+    assert [len(group) for group in groups] == [MEDIA_GROUP_SIZE, 3, 1]
+    assert groups[1][-1]["content_type"] == "photo"
+    assert groups[2][0]["content_type"] == "audio"
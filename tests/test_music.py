@@ -0,0 +1,44 @@
+import json
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from downloaders.music import classify_batch, is_music
+
+CORPUS_FILE = os.path.join(os.path.dirname(__file__), "data", "music_corpus.json")
+
+
+def load_corpus() -> list[dict]:
+    with open(CORPUS_FILE, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def test_classifier_accuracy_on_labeled_corpus():
+    """Точность на размеченном корпусе: каждая ошибка - лишняя перекодировка."""
+    corpus = load_corpus()
+    predicted = classify_batch(entry["info"] for entry in corpus)
+
+    correct = sum(p == entry["music"] for p, entry in zip(predicted, corpus))
+    assert correct / len(corpus) >= 0.95
+
+
+def test_common_words_alone_are_not_music():
+    """ "ost" внутри слов, "MV" и "Official" в канале сами по себе не музыка."""
+    assert not is_music({"title": "How to host a website", "duration": 300})
+    assert not is_music({"title": "MV Agusta Brutale review", "duration": 500})
+    assert not is_music({"title": "Launch coverage", "uploader": "NASA Official"})
+    assert is_music({"title": "Song", "uploader": "Artist - Topic"})
+
+
+def test_classifier_latency():
+    """Задержка на один info dict при пакетной оценке."""
+    infos = [entry["info"] for entry in load_corpus()]
+    number = 200
+
+    elapsed = min(timeit.repeat(lambda: classify_batch(infos), number=number, repeat=3))
+    per_call_us = elapsed / (number * len(infos)) * 1e6
+    print(f"\nmusic classifier {per_call_us:.2f} µs/info")
+
+    assert per_call_us < 50
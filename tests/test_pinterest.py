@@ -0,0 +1,195 @@
+import json
+import os
+import sys
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+from aiogram.exceptions import TelegramBadRequest
+from aiogram.methods import SendPhoto
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from downloaders import pinterest
+from handlers.download import _deliver
+
+ORIGINAL = "https://i.pinimg.com/originals/ab/cd/ef.jpg"
+
+
+def page(data: dict) -> str:
+    return (
+        "<html><head>"
+        '<script id="__PWS_DATA__" type="application/json">'
+        f"{json.dumps(data)}</script></head></html>"
+    )
+
+
+def test_pin_found_in_both_page_formats():
+    """Пин находится и в старом __PWS_DATA__, и в relay-формате страницы."""
+    legacy = page(
+        {
+            "props": {
+                "initialReduxState": {
+                    "pins": {
+                        "123": {
+                            "id": "123",
+                            "images": {"orig": {"url": ORIGINAL}, "236x": {"url": "x"}},
+                            "videos": None,
+                        }
+                    }
+                }
+            }
+        }
+    )
+    relay = page(
+        {
+            "response": {
+                "data": {
+                    "v3GetPinQuery": {
+                        "data": {"entityId": "123", "imageSpec_orig": {"url": ORIGINAL}}
+                    }
+                }
+            }
+        }
+    )
+
+    for html in (legacy, relay):
+        pin = pinterest.find_pin(html, "123")
+        assert pinterest.original_image(pin) == ORIGINAL
+        assert not pinterest.is_video_pin(pin)
+    assert pinterest.find_pin(legacy, "999") is None
+
+
+@pytest.mark.asyncio
+async def test_image_pin_sent_by_url_without_ytdlp(monkeypatch):
+    """Картинка отдаётся ссылкой на оригинал, yt-dlp не запускается."""
+
+    async def fake_pin(url):
+        return "https://www.pinterest.com/pin/123/", {
+            "id": "123",
+            "title": "Cat",
+            "images": {"orig": {"url": ORIGINAL}},
+        }
+
+    def no_ytdlp(url, progress):
+        raise AssertionError("image pins must not run yt-dlp")
+
+    monkeypatch.setattr(pinterest, "_fetch_pin", fake_pin)
+    monkeypatch.setattr(pinterest, "_download_pinterest_video", no_ytdlp)
+
+    result = await pinterest.download_pinterest_content("https://pin.it/abc")
+
+    assert result == {
+        "success": True,
+        "content_type": "photo",
+        "media_url": ORIGINAL,
+        "file_size": 0,
+        "title": "Cat",
+    }
+
+
+@pytest.mark.asyncio
+async def test_video_pin_falls_back_to_ytdlp(monkeypatch):
+    """Видео-пин скачивается через yt-dlp по каноничной ссылке."""
+
+    async def fake_pin(url):
+        return "https://www.pinterest.com/pin/123/", {
+            "id": "123",
+            "images": {"orig": {"url": ORIGINAL}},
+            "videos": {"video_list": {"V_720P": {"url": "https://v.pinimg.com/1.mp4"}}},
+        }
+
+    calls = []
+
+    def fake_ytdlp(url, progress):
+        calls.append(url)
+        return {"success": True, "file_path": "/tmp/p.mp4", "content_type": "video"}
+
+    monkeypatch.setattr(pinterest, "_fetch_pin", fake_pin)
+    monkeypatch.setattr(pinterest, "_download_pinterest_video", fake_ytdlp)
+
+    result = await pinterest.download_pinterest_content("https://pin.it/abc")
+
+    assert result["content_type"] == "video"
+    assert calls == ["https://www.pinterest.com/pin/123/"]
+
+
+@pytest.mark.asyncio
+async def test_rejected_url_falls_back_to_upload(tmp_path, monkeypatch):
+    """Если Telegram не смог скачать ссылку, файл качается и загружается сам."""
+    from handlers import download
+
+    async def fake_localize(item):
+        path = tmp_path / "remote.jpg"
+        path.write_bytes(b"jpeg")
+        item.update(file_path=str(path), file_size=4)
+        del item["media_url"]
+
+    monkeypatch.setattr(download, "localize", fake_localize)
+
+    message = MagicMock()
+    message.answer_photo = AsyncMock(
+        side_effect=[
+            TelegramBadRequest(
+                SendPhoto(chat_id=1, photo=ORIGINAL), "failed to get HTTP URL content"
+            ),
+            MagicMock(video=None, audio=None, document=None, photo=[]),
+        ]
+    )
+    item = {"content_type": "photo", "media_url": ORIGINAL, "file_size": 0}
+
+    await _deliver(message, [item], caption=None)
+
+    uploads = [call.args[0] for call in message.answer_photo.call_args_list]
+    assert uploads[0] == ORIGINAL
+    assert uploads[1].path == str(tmp_path / "remote.jpg")
+
+
+@pytest.mark.asyncio
+async def test_failed_localize_is_resumed(tmp_path, monkeypatch):
+    """Оборванная загрузка ссылки докачивается с места обрыва."""
+    from config import settings
+    from downloaders import http
+
+    requests = []
+
+    class FakeContent:
+        def __init__(self, resumed):
+            self.resumed = resumed
+
+        async def iter_chunked(self, size):
+            if self.resumed:
+                yield b"eg"
+                return
+            yield b"jp"
+            raise ConnectionResetError("connection lost")
+
+    class FakeResponse:
+        def __init__(self, resumed):
+            self.status = 206 if resumed else 200
+            self.content_length = 4
+            self.content = FakeContent(resumed)
+
+        async def __aenter__(self):
+            return self
+
+        async def __aexit__(self, *exc):
+            return False
+
+    class FakeSession:
+        def get(self, url, headers=None, **kwargs):
+            requests.append(headers)
+            return FakeResponse(resumed=bool(headers))
+
+    monkeypatch.setattr(http, "get_http_session", lambda: FakeSession())
+    monkeypatch.setattr(settings, "temp_dir", str(tmp_path))
+    item = {"content_type": "photo", "media_url": ORIGINAL, "file_size": 0}
+
+    with pytest.raises(ConnectionResetError):
+        await http.localize(item)
+    assert item["media_url"] == ORIGINAL
+
+    await http.localize(item)
+
+    assert requests == [{}, {"Range": "bytes=2-"}]
+    assert item["file_size"] == 4
+    assert os.listdir(tmp_path) == [os.path.basename(item["file_path"])]
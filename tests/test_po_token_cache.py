@@ -0,0 +1,36 @@
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils import po_token_cache
+from utils.po_token_cache import POTokenCache
+
+
+class FlakyRedis:
+    """Redis, который один раз падает, а потом снова отвечает."""
+
+    def __init__(self):
+        self.calls = 0
+
+    def get(self, key):
+        self.calls += 1
+        if self.calls == 1:
+            raise ConnectionError("Redis blip")
+        return json.dumps({"token": "shared", "expires_at": "2999-01-01T00:00:00"})
+
+
+def test_redis_is_retried_after_backoff(tmp_path, monkeypatch):
+    """После сбоя Redis файловый кэш используется только до конца паузы."""
+    now = [100.0]
+    monkeypatch.setattr(po_token_cache.time, "monotonic", lambda: now[0])
+    cache = POTokenCache(cache_file=str(tmp_path / "cache.json"))
+    cache._redis = FlakyRedis()
+
+    assert cache.get_token("android") is None
+    assert cache.get_token("android") is None
+    assert cache._redis.calls == 1
+
+    now[0] += POTokenCache.REDIS_RETRY_INTERVAL
+    assert cache.get_token("android") == "shared"
@@ -0,0 +1,166 @@
+import asyncio
+import os
+import struct
+import sys
+import time
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import settings
+from services import postprocess
+from services.postprocess import PostProcessor, moov_before_mdat, video_metadata
+
+SLEEP = "import sys, time; time.sleep(float(sys.argv[1]))"
+
+
+@pytest.mark.asyncio
+async def test_pool_caps_concurrent_processes():
+    """Одновременно работает не больше max_processes процессов."""
+    pool = PostProcessor(max_processes=2)
+
+    started = time.monotonic()
+    await asyncio.gather(
+        *(pool.run(sys.executable, "-c", SLEEP, "0.3") for _ in range(4))
+    )
+    elapsed = time.monotonic() - started
+
+    assert elapsed >= 0.55
+
+
+@pytest.mark.asyncio
+async def test_cancel_kills_process():
+    """Отмена вызывающего убивает процесс и освобождает место в пуле."""
+    pool = PostProcessor(max_processes=1)
+    task = asyncio.create_task(pool.run(sys.executable, "-c", SLEEP, "30"))
+    await asyncio.sleep(0.2)
+
+    task.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await task
+
+    await asyncio.wait_for(pool.run(sys.executable, "-c", SLEEP, "0"), timeout=5)
+
+
+def fake_pool(codec: str) -> tuple[PostProcessor, list[tuple[str, ...]]]:
+    pool = PostProcessor(max_processes=1)
+    calls = []
+
+    async def probe(path):
+        return {"streams": [{"codec_type": "audio", "codec_name": codec}]}
+
+    async def run(program, *args, **kwargs):
+        calls.append(args)
+        with open(args[-1], "wb") as f:
+            f.write(b"out")
+        return b""
+
+    pool.probe = probe
+    pool.run = run
+    return pool, calls
+
+
+@pytest.mark.asyncio
+async def test_aac_is_remuxed_without_transcoding(tmp_path):
+    """AAC только перекладывается в m4a копированием потока."""
+    source = tmp_path / "song.webm"
+    source.write_bytes(b"src")
+    pool, calls = fake_pool("aac")
+
+    target = await pool.extract_audio(str(source))
+
+    assert target == str(tmp_path / "song.m4a")
+    assert "copy" in calls[0]
+    assert not source.exists()
+
+
+@pytest.mark.asyncio
+async def test_opus_is_transcoded_and_mp3_kept(tmp_path):
+    """Opus перекодируется в mp3, готовый mp3 не трогаем."""
+    source = tmp_path / "song.webm"
+    source.write_bytes(b"src")
+    pool, calls = fake_pool("opus")
+
+    target = await pool.extract_audio(str(source))
+
+    assert target == str(tmp_path / "song.mp3")
+    assert "libmp3lame" in calls[0]
+
+    pool, calls = fake_pool("mp3")
+    assert await pool.extract_audio(target) == target
+    assert calls == []
+
+
+def mp4(*boxes: bytes) -> bytes:
+    return b"".join(struct.pack(">I4s", 8 + 4, kind) + b"\0" * 4 for kind in boxes)
+
+
+def test_moov_position_is_read_from_box_headers(tmp_path):
+    """Положение moov определяется по заголовкам боксов, без ffprobe."""
+    front, back, other = tmp_path / "a.mp4", tmp_path / "b.mp4", tmp_path / "c.webm"
+    front.write_bytes(mp4(b"ftyp", b"moov", b"mdat"))
+    back.write_bytes(mp4(b"ftyp", b"mdat", b"moov"))
+    other.write_bytes(b"\x1a\x45\xdf\xa3")
+
+    assert moov_before_mdat(str(front)) is True
+    assert moov_before_mdat(str(back)) is False
+    assert moov_before_mdat(str(other)) is None
+
+
+def test_video_metadata_accounts_for_rotation():
+    """Повёрнутое видео отдаётся с размерами, как его видно на экране."""
+    info = {
+        "format": {"duration": "12.6"},
+        "streams": [
+            {
+                "codec_type": "video",
+                "width": 1920,
+                "height": 1080,
+                "side_data_list": [{"rotation": -90}],
+            }
+        ],
+    }
+
+    assert video_metadata(info) == {"duration": 13, "width": 1080, "height": 1920}
+
+
+@pytest.mark.asyncio
+async def test_finalize_remuxes_and_adds_thumbnail(tmp_path, monkeypatch):
+    """Видео с moov в конце перепаковывается, метаданные и превью дописываются."""
+    monkeypatch.setattr(settings, "temp_dir", str(tmp_path))
+    video = tmp_path / "clip.mp4"
+    video.write_bytes(mp4(b"ftyp", b"mdat", b"moov"))
+    calls = []
+
+    async def faststart(path):
+        calls.append("faststart")
+        video.write_bytes(mp4(b"ftyp", b"moov", b"mdat"))
+        return path
+
+    async def probe(path):
+        return {"streams": [{"codec_type": "video", "width": 720, "height": 1280}]}
+
+    async def thumbnail(path, target, at=0.0):
+        calls.append("thumbnail")
+        with open(target, "wb") as f:
+            f.write(b"jpg")
+        return target
+
+    monkeypatch.setattr(postprocess.postprocessor, "faststart", faststart)
+    monkeypatch.setattr(postprocess.postprocessor, "probe", probe)
+    monkeypatch.setattr(postprocess.postprocessor, "thumbnail", thumbnail)
+    result = {
+        "success": True,
+        "file_path": str(video),
+        "content_type": "video",
+        "file_size": 1,
+        "duration": 30,
+    }
+
+    result = await postprocess.finalize_result(result)
+
+    assert calls == ["faststart", "thumbnail"]
+    assert (result["duration"], result["width"], result["height"]) == (30, 720, 1280)
+    assert os.path.exists(result["thumbnail"])
+    assert moov_before_mdat(str(video)) is True
@@ -0,0 +1,39 @@
+import asyncio
+import os
+import sys
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.progress import ProgressReporter, ProgressStream
+
+
+@pytest.mark.asyncio
+async def test_reporter_coalesces_hook_updates():
+    """Частые хуки yt-dlp превращаются в редкие правки сообщения."""
+    message = MagicMock()
+    message.text = "⏳ Обрабатываю запрос..."
+    message.edit_text = AsyncMock()
+
+    stream = ProgressStream()
+    reporter = ProgressReporter(message, stream, interval=0.2)
+    reporter.start()
+
+    for downloaded in range(0, 101):
+        stream.progress_hook(
+            {
+                "status": "downloading",
+                "downloaded_bytes": downloaded,
+                "total_bytes": 100,
+            }
+        )
+        await asyncio.sleep(0.002)
+
+    await asyncio.sleep(0.25)
+    await reporter.stop()
+
+    edits = [call.args[0] for call in message.edit_text.await_args_list]
+    assert 1 <= len(edits) <= 4
+    assert edits[-1] == "⏳ Скачиваю: 100%"
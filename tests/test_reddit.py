@@ -0,0 +1,248 @@
+import asyncio
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from downloaders import reddit
+from downloaders.common import TEXT_LIMIT
+from handlers.download import _media_groups
+
+MANIFEST = """<?xml version="1.0" encoding="UTF-8"?>
+<MPD xmlns="urn:mpeg:dash:schema:mpd:2011" mediaPresentationDuration="PT1M4.5S">
+  <Period>
+    <AdaptationSet contentType="video" mimeType="video/mp4">
+      <Representation bandwidth="4800000" height="1080" width="1920" id="1">
+        <BaseURL>DASH_1080.mp4</BaseURL>
+      </Representation>
+      <Representation bandwidth="1200000" height="480" width="854" id="2">
+        <BaseURL>DASH_480.mp4</BaseURL>
+      </Representation>
+    </AdaptationSet>
+    <AdaptationSet contentType="audio" mimeType="audio/mp4">
+      <Representation bandwidth="64000" id="3"><BaseURL>DASH_AUDIO_64.mp4</BaseURL></Representation>
+      <Representation bandwidth="128000" id="4"><BaseURL>DASH_AUDIO_128.mp4</BaseURL></Representation>
+    </AdaptationSet>
+  </Period>
+</MPD>
+"""
+
+
+def test_dash_manifest_parsed_and_streams_fit_budget():
+    """Из манифеста берётся лучшее аудио и лучшее видео, влезающее в лимит."""
+    representations, duration = reddit.parse_dash_manifest(
+        MANIFEST, "https://v.redd.it/abc/DASHPlaylist.mpd?a=1"
+    )
+
+    assert duration == 64.5
+    assert len(representations) == 4
+
+    video, audio = reddit.select_representations(representations, duration, 100 << 20)
+    assert video.url == "https://v.redd.it/abc/DASH_1080.mp4"
+    assert (video.width, video.height) == (1920, 1080)
+    assert audio.url == "https://v.redd.it/abc/DASH_AUDIO_128.mp4"
+
+    # 1080p за 64 секунды - около 40 MB, в 20 MB влезает только 480p
+    video, _ = reddit.select_representations(representations, duration, 20 << 20)
+    assert video.height == 480
+
+
+def test_long_text_post_truncated_to_message_limit():
+    """Длинный текст поста обрезается под лимит сообщения, не ломая HTML."""
+    post = {"title": "A & B", "is_self": True, "selftext": "x < y & " * 1000}
+
+    text = reddit.post_text(post)
+
+    assert text.startswith("<b>A &amp; B</b>\n\n")
+    assert len(text) <= TEXT_LIMIT
+    assert text.endswith("…")
+    tail = text[-12:]
+    assert tail.rfind("&") < tail.rfind(";") or "&" not in tail
+
+
+@pytest.mark.asyncio
+async def test_text_post_needs_no_download(monkeypatch):
+    """Текстовый пост возвращается как текст без скачивания файлов."""
+
+    async def fake_post(url):
+        return {"id": "t1", "title": "Question", "is_self": True, "selftext": "Body"}
+
+    async def no_download(*args, **kwargs):
+        raise AssertionError("text posts must not download media")
+
+    monkeypatch.setattr(reddit, "_fetch_post", fake_post)
+    monkeypatch.setattr(reddit, "download_file", no_download)
+
+    result = await reddit.download_reddit_content("https://redd.it/t1")
+
+    assert result["success"]
+    assert result["content_type"] == "text"
+    assert result["text"] == "<b>Question</b>\n\nBody"
+    assert "file_path" not in result
+    assert _media_groups([result]) == [[result]]
+
+
+@pytest.mark.asyncio
+async def test_video_and_audio_fetched_concurrently_then_muxed(monkeypatch, tmp_path):
+    """Видео и аудио DASH качаются одновременно и склеиваются без перекодирования."""
+    monkeypatch.setattr(reddit.settings, "temp_dir", str(tmp_path))
+
+    async def fake_post(url):
+        return {
+            "id": "v1",
+            "title": "Clip",
+            "secure_media": {
+                "reddit_video": {
+                    "dash_url": "https://v.redd.it/v1/DASHPlaylist.mpd",
+                    "duration": 64,
+                }
+            },
+        }
+
+    async def fake_streams(video):
+        representations, _ = reddit.parse_dash_manifest(MANIFEST, video["dash_url"])
+        return reddit.select_representations(representations, 64, 100 << 20)
+
+    active = 0
+    peak = 0
+    fetched = []
+
+    async def fake_download(url, path, transfer=None):
+        nonlocal active, peak
+        active += 1
+        peak = max(peak, active)
+        await asyncio.sleep(0.05)
+        active -= 1
+        fetched.append(url)
+        with open(path, "wb") as f:
+            f.write(b"x" * 10)
+        return 10
+
+    muxed = []
+
+    async def fake_mux(video, audio, target):
+        muxed.append((video, audio))
+        with open(target, "wb") as f:
+            f.write(b"y" * 20)
+        return target
+
+    monkeypatch.setattr(reddit, "_fetch_post", fake_post)
+    monkeypatch.setattr(reddit, "_select_streams", fake_streams)
+    monkeypatch.setattr(reddit, "download_file", fake_download)
+    monkeypatch.setattr(reddit.postprocessor, "mux", fake_mux)
+
+    result = await reddit.download_reddit_content("https://v.redd.it/v1")
+
+    assert result["success"]
+    assert result["content_type"] == "video"
+    assert result["file_path"] == str(tmp_path / "reddit_v1.mp4")
+    assert result["file_size"] == 20
+    assert (result["width"], result["height"], result["duration"]) == (1920, 1080, 64)
+    assert peak == 2
+    assert sorted(fetched) == [
+        "https://v.redd.it/v1/DASH_1080.mp4",
+        "https://v.redd.it/v1/DASH_AUDIO_128.mp4",
+    ]
+    assert len(muxed) == 1
+    assert sorted(os.listdir(tmp_path)) == ["reddit_v1.mp4"]
+
+
+@pytest.mark.asyncio
+async def test_gallery_returned_as_items(monkeypatch, tmp_path):
+    """Галерея возвращается элементами в порядке поста, битые пропускаются."""
+    monkeypatch.setattr(reddit.settings, "temp_dir", str(tmp_path))
+
+    async def fake_post(url):
+        return {
+            "id": "g1",
+            "title": "Gallery",
+            "is_gallery": True,
+            "gallery_data": {
+                "items": [{"media_id": "a"}, {"media_id": "b"}, {"media_id": "c"}]
+            },
+            "media_metadata": {
+                "a": {"status": "valid", "s": {"u": "https://i.redd.it/a.jpg"}},
+                "b": {"status": "failed"},
+                "c": {
+                    "status": "valid",
+                    "e": "AnimatedImage",
+                    "s": {
+                        "gif": "https://i.redd.it/c.gif",
+                        "mp4": "https://i.redd.it/c.mp4",
+                    },
+                },
+            },
+        }
+
+    async def fake_download(url, path, transfer=None):
+        with open(path, "wb") as f:
+            f.write(b"z" * 5)
+        return 5
+
+    monkeypatch.setattr(reddit, "_fetch_post", fake_post)
+    monkeypatch.setattr(reddit, "download_file", fake_download)
+
+    result = await reddit.download_reddit_content("https://reddit.com/comments/g1")
+
+    assert result["success"]
+    assert [item["content_type"] for item in result["items"]] == ["photo", "video"]
+    assert [os.path.basename(item["file_path"]) for item in result["items"]] == [
+        "reddit_g1_0.jpg",
+        "reddit_g1_1.mp4",
+    ]
+    assert result["file_size"] == 10
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("by_user", [True, False])
+async def test_cancelled_download_part_file(monkeypatch, tmp_path, by_user):
+    """Отмена пользователем удаляет .part, остановка бота оставляет его для докачки."""
+    from downloaders import http
+    from services.progress import ProgressStream
+
+    started = asyncio.Event()
+
+    class FakeContent:
+        async def iter_chunked(self, size):
+            yield b"x" * 10
+            started.set()
+            await asyncio.Event().wait()
+            yield b""
+
+    class FakeResponse:
+        status = 200
+        content_length = 20
+        content = FakeContent()
+
+        async def __aenter__(self):
+            return self
+
+        async def __aexit__(self, *exc):
+            return False
+
+    class FakeSession:
+        def get(self, url, **kwargs):
+            return FakeResponse()
+
+    monkeypatch.setattr(http, "get_http_session", lambda: FakeSession())
+    path = tmp_path / "DASH_480.mp4"
+    progress = ProgressStream()
+
+    task = asyncio.create_task(
+        reddit.download_file(
+            "https://v.redd.it/abc/DASH_480.mp4",
+            str(path),
+            http.TransferProgress(progress),
+        )
+    )
+    await started.wait()
+    if by_user:
+        progress.cancel()
+    task.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await task
+
+    assert os.path.exists(f"{path}.part") is not by_user
+    assert not path.exists()
@@ -0,0 +1,90 @@
+import os
+import re
+import sys
+import timeit
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from downloaders import detect_platform, extract_urls, route
+
+# Прежний способ: все паттерны подряд с re.IGNORECASE по тексту сообщения
+LEGACY_PATTERNS = {
+    "tiktok": r"(?:https?://)?(?:www\.)?(?:tiktok\.com|vm\.tiktok\.com)",
+    "youtube": r"(?:https?://)?(?:www\.)?(?:youtube\.com|youtu\.be)",
+    "instagram": r"(?:https?://)?(?:www\.)?instagram\.com",
+    "twitter": r"(?:https?://)?(?:www\.)?(?:twitter\.com|x\.com)",
+    "reddit": r"(?:https?://)?(?:www\.)?reddit\.com",
+    "pinterest": r"(?:https?://)?(?:www\.)?pinterest\.com",
+}
+
+MESSAGES = [
+    "привет, как дела? завтра созвонимся после обеда",
+    "ну это вообще не смешно, давай потом",
+    "https://www.tiktok.com/@user/video/7593764380861385991",
+    "смотри https://youtu.be/dQw4w9WgXcQ",
+]
+
+
+@pytest.mark.parametrize(
+    "url, platform, media_id",
+    [
+        ("https://vm.tiktok.com/ZSaD796vL/", "tiktok", "ZSaD796vL"),
+        ("https://vt.tiktok.com/ZSaD796vL/", "tiktok", "ZSaD796vL"),
+        ("https://m.tiktok.com/@a/video/759376438", "tiktok", "759376438"),
+        ("https://music.youtube.com/watch?v=dQw4w9WgXcQ", "youtube", "dQw4w9WgXcQ"),
+        ("https://m.youtube.com/shorts/dQw4w9WgXcQ", "youtube", "dQw4w9WgXcQ"),
+        ("youtu.be/dQw4w9WgXcQ", "youtube", "dQw4w9WgXcQ"),
+        ("https://www.instagram.com/reel/C1abc-_/", "instagram", "C1abc-_"),
+        ("https://x.com/user/status/123", "twitter", "123"),
+        ("https://mobile.twitter.com/user/status/9", "twitter", "9"),
+        ("https://old.reddit.com/r/a/comments/abc12/t/", "reddit", "abc12"),
+        ("https://ru.pinterest.com/pin/12345/", "pinterest", "12345"),
+        ("https://pin.it/3xYz", "pinterest", "3xYz"),
+    ],
+)
+def test_route_resolves_platform_and_media_id(url, platform, media_id):
+    """Платформа по домену (с поддоменами) и id медиа за один разбор."""
+    match = route(url)
+
+    assert match.platform == platform
+    assert match.media_id == media_id
+    assert detect_platform(url) == platform
+
+
+@pytest.mark.parametrize(
+    "text",
+    ["https://example.com/tiktok.com", "tiktok.com.evil.com", "привет", "x.co"],
+)
+def test_route_rejects_other_hosts(text):
+    """Домен платформы в пути или как префикс чужого домена не считается."""
+    assert route(text) is None
+
+
+def test_router_faster_than_regex_scan():
+    """Микробенчмарк: роутер не медленнее прежнего скана всех паттернов."""
+    compiled = [re.compile(p, re.IGNORECASE) for p in LEGACY_PATTERNS.values()]
+
+    def legacy():
+        for text in MESSAGES:
+            if any(pattern.search(text) for pattern in compiled):
+                for url in text.split():
+                    lowered = url.lower()
+                    any(re.search(p, lowered) for p in LEGACY_PATTERNS.values())
+
+    def router():
+        for text in MESSAGES:
+            extract_urls(text)
+
+    number = 2000
+    legacy_time = min(timeit.repeat(legacy, number=number, repeat=3))
+    router_time = min(timeit.repeat(router, number=number, repeat=3))
+    per_message_us = router_time / (number * len(MESSAGES)) * 1e6
+    print(
+        f"\nrouter {per_message_us:.2f} µs/message, "
+        f"legacy {legacy_time / (number * len(MESSAGES)) * 1e6:.2f} µs/message"
+    )
+
+    assert per_message_us < 50
+    assert router_time < legacy_time
@@ -0,0 +1,107 @@
+import os
+import sys
+from contextlib import contextmanager
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from downloaders import tiktok
+from downloaders.common import direct_url
+from services.postprocess import finalize_result
+from services.transcode import fit_to_budget
+
+PROGRESSIVE = {
+    "url": "https://cdn.example.com/v.mp4",
+    "ext": "mp4",
+    "protocol": "https",
+    "filesize": 5 * 1024 * 1024,
+    "http_headers": {"User-Agent": "yt-dlp", "Accept": "*/*"},
+}
+
+
+@pytest.mark.parametrize(
+    "changes",
+    [
+        {"requested_formats": [{}, {}]},
+        {"protocol": "m3u8_native"},
+        {"cookies": "tt_chain_token=x; Domain=.tiktok.com"},
+        {"http_headers": {"User-Agent": "yt-dlp", "Referer": "https://x.com/"}},
+        {"filesize": 30 * 1024 * 1024},
+        {"filesize": None},
+        {"ext": "webm"},
+    ],
+)
+def test_only_plain_progressive_files_sent_by_url(changes):
+    """По ссылке идут только простые прогрессивные файлы в пределах лимита."""
+    assert direct_url(PROGRESSIVE, "video") == PROGRESSIVE["url"]
+    assert direct_url({**PROGRESSIVE, **changes}, "video") is None
+
+
+def test_photo_of_unknown_size_sent_by_url(monkeypatch):
+    """Фото неизвестного размера идёт ссылкой, если функция не выключена."""
+    photo = {"url": "https://cdn.example.com/p.jpg", "ext": "jpg"}
+
+    assert direct_url(photo, "photo") == photo["url"]
+    monkeypatch.setattr("downloaders.common.settings.send_by_url", False)
+    assert direct_url(photo, "photo") is None
+
+
+class FakeYDL:
+    def __init__(self, info):
+        self.info = info
+        self.downloaded = False
+
+    def extract_info(self, url, download):
+        assert not download
+        return dict(self.info)
+
+    def process_ie_result(self, info, download):
+        assert download
+        self.downloaded = True
+        return info
+
+    def prepare_filename(self, info):
+        return "/nonexistent/tiktok_1.mp4"
+
+
+@pytest.mark.asyncio
+async def test_tiktok_downloads_only_when_url_cannot_be_used(monkeypatch):
+    """Файл качается, только если Telegram не сможет забрать его по ссылке."""
+    for info, expect_download in (
+        (PROGRESSIVE, False),
+        ({**PROGRESSIVE, "cookies": "a=b"}, True),
+    ):
+        ydl = FakeYDL({**info, "title": "Dance", "duration": 12})
+
+        @contextmanager
+        def lease(profile, progress):
+            yield ydl
+
+        monkeypatch.setattr(tiktok.ydl_pool, "lease", lease)
+
+        result = await tiktok.download_tiktok_video("https://vm.tiktok.com/x/")
+
+        assert result["success"]
+        assert ydl.downloaded is expect_download
+        if expect_download:
+            assert "media_url" not in result
+        else:
+            assert result["media_url"] == PROGRESSIVE["url"]
+            assert result["file_size"] == PROGRESSIVE["filesize"]
+            assert result["duration"] == 12
+            assert "file_path" not in result
+
+
+@pytest.mark.asyncio
+async def test_url_items_skip_local_processing():
+    """Элементы со ссылкой проходят финализацию и пережатие без изменений."""
+    result = {
+        "success": True,
+        "content_type": "video",
+        "media_url": PROGRESSIVE["url"],
+        "file_size": 10**12,
+    }
+
+    assert await finalize_result(dict(result)) == result
+    assert await fit_to_budget(dict(result), "tiktok:1") == result
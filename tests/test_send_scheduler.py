@@ -0,0 +1,122 @@
+import asyncio
+import os
+import sys
+import time
+from unittest.mock import MagicMock
+
+import pytest
+from aiogram.exceptions import TelegramRetryAfter
+from aiogram.methods import EditMessageText, SendMessage, SendVideo
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.send_scheduler import SendScheduler
+
+
+class FakeApi:
+    """Записывает отправленные методы вместо похода в Telegram."""
+
+    def __init__(self, flood_once: bool = False):
+        self.sent = []
+        self.flood_once = flood_once
+
+    async def __call__(self, bot, method):
+        if self.flood_once:
+            self.flood_once = False
+            raise TelegramRetryAfter(method=method, message="flood", retry_after=0)
+        self.sent.append(method)
+        return method
+
+
+@pytest.mark.asyncio
+async def test_pending_edits_are_merged():
+    """Несколько правок одного сообщения схлопываются в последнюю."""
+    scheduler = SendScheduler(chat_rate=1, chat_burst=1)
+    api = FakeApi()
+    bot = MagicMock()
+
+    first = asyncio.create_task(scheduler(api, bot, SendMessage(chat_id=1, text="⏳")))
+    edits = [
+        asyncio.create_task(
+            scheduler(api, bot, EditMessageText(chat_id=1, message_id=10, text=f"{i}%"))
+        )
+        for i in (10, 50, 90)
+    ]
+    await asyncio.gather(first, *edits)
+    await scheduler.close()
+
+    texts = [method.text for method in api.sent]
+    assert texts == ["⏳", "90%"]
+
+
+@pytest.mark.asyncio
+async def test_delivery_goes_before_progress_edits():
+    """Финальная отправка файла обгоняет ожидающие правки прогресса."""
+    scheduler = SendScheduler(chat_rate=20, chat_burst=1)
+    api = FakeApi()
+    bot = MagicMock()
+
+    await scheduler(api, bot, SendMessage(chat_id=1, text="start"))
+    edit = asyncio.create_task(
+        scheduler(api, bot, EditMessageText(chat_id=1, message_id=10, text="50%"))
+    )
+    video = asyncio.create_task(
+        scheduler(api, bot, SendVideo(chat_id=1, video="file_id"))
+    )
+    await asyncio.gather(edit, video)
+    await scheduler.close()
+
+    assert [type(method) for method in api.sent[1:]] == [SendVideo, EditMessageText]
+
+
+@pytest.mark.asyncio
+async def test_retry_after_is_handled_centrally():
+    """429 не доходит до хендлера, запрос повторяется после паузы."""
+    scheduler = SendScheduler(chat_rate=10)
+    api = FakeApi(flood_once=True)
+
+    started = time.monotonic()
+    result = await scheduler(api, MagicMock(), SendMessage(chat_id=1, text="hi"))
+    await scheduler.close()
+
+    assert result.text == "hi"
+    assert len(api.sent) == 1
+    assert time.monotonic() - started < 1
+
+
+@pytest.mark.asyncio
+async def test_cancelled_caller_does_not_cancel_merged_edit():
+    """Отмена одного из схлопнутых вызовов не отменяет правку для остальных."""
+    scheduler = SendScheduler(chat_rate=1, chat_burst=1)
+    api = FakeApi()
+    bot = MagicMock()
+
+    await scheduler(api, bot, SendMessage(chat_id=1, text="⏳"))
+    owner = asyncio.create_task(
+        scheduler(api, bot, EditMessageText(chat_id=1, message_id=10, text="10%"))
+    )
+    await asyncio.sleep(0)
+    merged = asyncio.create_task(
+        scheduler(api, bot, EditMessageText(chat_id=1, message_id=10, text="50%"))
+    )
+    await asyncio.sleep(0)
+    owner.cancel()
+
+    result = await merged
+    await scheduler.close()
+
+    assert owner.cancelled()
+    assert result.text == "50%"
+    assert [method.text for method in api.sent] == ["⏳", "50%"]
+
+
+def test_limits_are_shared_between_workers():
+    """С несколькими воркерами каждый получает свою долю лимитов Telegram."""
+    scheduler = SendScheduler(
+        global_rate=30, chat_rate=1, chat_burst=3, group_rate=20 / 60, workers=4
+    )
+
+    assert scheduler._global.rate == 7.5
+    assert scheduler.chat_rate == 0.25
+    assert scheduler.chat_burst == 1
+    assert scheduler.group_rate == pytest.approx(20 / 60 / 4)
@@ -0,0 +1,135 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from downloaders import sessions
+from downloaders.sessions import Session, SessionPool
+
+
+def make_pool(tmp_path, names=("a", "b")) -> SessionPool:
+    sessions = [Session("tiktok", name, tmp_path / f"{name}.txt") for name in names]
+    return SessionPool("tiktok", sessions, cooldown=60)
+
+
+def test_throttled_session_rotates_out(tmp_path):
+    """После 429 сессия уходит на паузу, следующие задачи берут другую."""
+    pool = make_pool(tmp_path)
+
+    with pytest.raises(RuntimeError):
+        with pool.lease() as session:
+            throttled = session
+            raise RuntimeError("HTTP Error 429: Too Many Requests")
+
+    assert not throttled.healthy
+    for _ in range(3):
+        with pool.lease() as session:
+            assert session is not throttled
+
+
+def test_authenticated_session_preferred_and_logs_in_once(tmp_path, monkeypatch):
+    """Сессия с логином выдаётся первой и логинится, только пока нет куки."""
+    logins = []
+
+    def fake_login(username, password):
+        logins.append(username)
+        return {"sessionid": "abc", "csrftoken": "t"}
+
+    monkeypatch.setattr(sessions, "instagram_login", fake_login)
+    account = Session(
+        "instagram", "account", tmp_path / "acc.txt", username="u", password="p"
+    )
+    pool = SessionPool(
+        "instagram", [Session("instagram", "anon", tmp_path / "anon.txt"), account]
+    )
+    assert not account.authenticated
+
+    with pool.lease() as session:
+        assert session is account
+        assert account.authenticated
+        assert session.ydl_opts() == {"cookiefile": str(account.cookie_file)}
+
+    assert not account.log_in()
+    assert logins == ["u"]
+
+
+def test_failed_login_leaves_session_anonymous(tmp_path, monkeypatch):
+    """Без куки логина сессия не считается авторизованной и не предпочитается."""
+
+    def failing_login(username, password):
+        raise RuntimeError("Checkpoint required")
+
+    monkeypatch.setattr(sessions, "instagram_login", failing_login)
+    anon = Session("instagram", "anon", tmp_path / "anon.txt")
+    account = Session(
+        "instagram", "account", tmp_path / "acc.txt", username="u", password="p"
+    )
+    account.last_used = 1.0
+    pool = SessionPool("instagram", [anon, account])
+
+    assert not account.log_in()
+    assert not account.authenticated
+    with pool.lease() as session:
+        assert session is anon
+
+
+def test_bearer_app_session_not_preferred_for_ytdlp(tmp_path):
+    """Токен API не помогает yt-dlp: app-сессия не считается авторизованной."""
+    anon = Session("twitter", "anon", tmp_path / "anon.txt", last_used=1.0)
+    app = Session(
+        "twitter", "app", tmp_path / "app.txt", bearer_token="t", last_used=5.0
+    )
+    pool = SessionPool("twitter", [anon, app])
+
+    assert not app.authenticated
+    with pool.lease() as session:
+        assert session is anon
+
+
+def test_lease_is_exclusive(tmp_path):
+    """Одна сессия не выдаётся двум задачам одновременно."""
+    pool = make_pool(tmp_path, names=("only",))
+
+    with pool.lease():
+        with pytest.raises(TimeoutError):
+            with pool.lease(timeout=0.05):
+                pass
+
+
+@pytest.mark.asyncio
+async def test_session_released_before_file_download(monkeypatch):
+    """Сессия нужна только для извлечения, файл качается уже без неё."""
+    from contextlib import contextmanager
+
+    from downloaders import tiktok
+
+    held = []
+    downloaded_while = []
+
+    class FakeYDL:
+        def extract_info(self, url, download):
+            return {"id": "1", "url": "https://cdn/v.mp4", "cookies": "a=b"}
+
+        def process_ie_result(self, info, download):
+            downloaded_while.append(list(held))
+            return info
+
+        def prepare_filename(self, info):
+            return "/nonexistent/tiktok_1.mp4"
+
+    @contextmanager
+    def lease(profile, progress=None):
+        held.append(profile)
+        try:
+            yield FakeYDL()
+        finally:
+            held.remove(profile)
+
+    monkeypatch.setattr(tiktok.ydl_pool, "lease", lease)
+
+    result = await tiktok.download_tiktok_video("https://vm.tiktok.com/x/")
+
+    assert result["success"]
+    assert downloaded_while == [["tiktok_media"]]
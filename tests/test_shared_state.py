@@ -0,0 +1,37 @@
+import asyncio
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.shared_state import SharedState
+
+
+@pytest.mark.asyncio
+async def test_claim_is_exclusive_until_ttl():
+    """claim() выигрывает только первый вызов, пока не истёк TTL."""
+    state = SharedState("redis://unused")
+
+    assert await state.claim("update:1", ttl=0.05)
+    assert not await state.claim("update:1", ttl=0.05)
+
+    await asyncio.sleep(0.06)
+    assert await state.claim("update:1", ttl=0.05)
+
+
+@pytest.mark.asyncio
+async def test_memory_fallback_evicts_least_recently_used():
+    """Без Redis память ограничена: вытесняются давно не читанные ключи."""
+    state = SharedState("redis://unused", max_memory_keys=2)
+
+    await state.set("a", "1")
+    await state.set("b", "2")
+    assert await state.get("a") == "1"
+    await state.set("c", "3")
+
+    assert len(state._memory) == 2
+    assert await state.get("b") is None
+    assert await state.get("a") == "1"
+    assert await state.get("c") == "3"
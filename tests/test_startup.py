@@ -0,0 +1,71 @@
+import os
+import subprocess
+import sys
+import time
+from unittest.mock import AsyncMock
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+# Бюджеты с запасом для медленных CI-машин; переопределяются через env
+IMPORT_BUDGET = float(os.environ.get("STARTUP_IMPORT_BUDGET", "6.0"))
+READY_BUDGET = float(os.environ.get("STARTUP_READY_BUDGET", "1.0"))
+
+# Тяжёлые модули, которые не нужны, чтобы начать принимать апдейты
+LAZY_MODULES = ("yt_dlp", "asyncpg", "redis")
+
+
+def test_import_main_within_budget_without_heavy_modules():
+    """Импорт main укладывается в бюджет и не тянет yt-dlp, драйвер БД и Redis."""
+    code = (
+        "import sys, time\n"
+        "started = time.perf_counter()\n"
+        "import main\n"
+        "print(time.perf_counter() - started)\n"
+        f"print(','.join(m for m in {LAZY_MODULES!r} if m in sys.modules))\n"
+    )
+    env = {
+        **os.environ,
+        "BOT_TOKEN": os.environ.get("BOT_TOKEN", "123:test"),
+        "DATABASE_URL": os.environ.get(
+            "DATABASE_URL", "postgresql+asyncpg://test@localhost/test"
+        ),
+    }
+    output = subprocess.run(
+        [sys.executable, "-c", code],
+        cwd=ROOT,
+        env=env,
+        capture_output=True,
+        text=True,
+        check=True,
+    ).stdout.splitlines()
+
+    elapsed, loaded = float(output[-2]), output[-1]
+    assert loaded == ""
+    assert elapsed < IMPORT_BUDGET
+
+
+@pytest.mark.asyncio
+async def test_worker_ready_within_budget(tmp_path, monkeypatch):
+    """Воркер готов принимать апдейты быстро: без БД, yt-dlp и сети."""
+    import main
+    from services import history_writer, job_journal
+    from services.drain import pending_updates
+    from utils import shared_state
+
+    monkeypatch.setattr(shared_state, "url", None)
+    monkeypatch.setattr(history_writer, "spool_file", tmp_path / "history.jsonl")
+    monkeypatch.setattr(job_journal, "journal_file", tmp_path / "journal.json")
+    monkeypatch.setattr(pending_updates, "spool_file", tmp_path / "pending.jsonl")
+    dispatcher = {}
+
+    started = time.perf_counter()
+    await main.on_startup(AsyncMock(), dispatcher, supervised=True)
+    elapsed = time.perf_counter() - started
+
+    try:
+        assert elapsed < READY_BUDGET
+    finally:
+        await main.on_shutdown(AsyncMock(), dispatcher)
@@ -0,0 +1,145 @@
+import asyncio
+import os
+import sys
+from datetime import datetime
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import settings
+from services import transcode
+from services.postprocess import PRIORITY_LOW, PRIORITY_NORMAL, PostProcessor
+from services.transcode import (
+    TranscodeCache,
+    is_off_peak,
+    source_size_limit,
+    target_bitrates,
+)
+
+
+def test_target_bitrate_fits_budget():
+    """Битрейт из длительности и бюджета, слишком длинное видео не сжимаем."""
+    budget = 50 * 1024 * 1024
+    video_kbps, audio_kbps = target_bitrates(300, budget)
+
+    assert (video_kbps + audio_kbps) * 1000 / 8 * 300 <= budget
+    assert target_bitrates(6 * 3600, budget) is None
+
+
+def test_off_peak_window_wraps_midnight(monkeypatch):
+    """Окно «не час пик» может переходить через полночь."""
+    monkeypatch.setattr(settings, "transcode_offpeak_start", 23)
+    monkeypatch.setattr(settings, "transcode_offpeak_end", 6)
+
+    assert is_off_peak(datetime(2026, 1, 1, 23, 30))
+    assert is_off_peak(datetime(2026, 1, 1, 3, 0))
+    assert not is_off_peak(datetime(2026, 1, 1, 12, 0))
+
+
+def test_bigger_sources_only_when_reencoded(monkeypatch):
+    """Исходник больше лимита отправки качается, только если его пережмут."""
+    monkeypatch.setattr(settings, "max_file_size_mb", 50)
+    monkeypatch.setattr(settings, "transcode_max_input_mb", 500)
+
+    assert source_size_limit(transcode=False) == 50 * 1024 * 1024
+    assert source_size_limit(transcode=True) == 500 * 1024 * 1024
+
+
+@pytest.mark.asyncio
+async def test_low_priority_never_takes_whole_pool():
+    """Фоновое сжатие занимает не больше половины пула и не держит обычные задачи."""
+    pool = PostProcessor(max_processes=2)
+    release = asyncio.Event()
+    started = []
+
+    async def hold(name, priority):
+        async with pool._slot(priority):
+            started.append(name)
+            await release.wait()
+
+    tasks = [asyncio.create_task(hold("low1", PRIORITY_LOW))]
+    await asyncio.sleep(0)
+    tasks.append(asyncio.create_task(hold("low2", PRIORITY_LOW)))
+    await asyncio.sleep(0)
+    tasks.append(asyncio.create_task(hold("normal", PRIORITY_NORMAL)))
+    await asyncio.sleep(0)
+
+    assert started == ["low1", "normal"]
+
+    release.set()
+    await asyncio.gather(*tasks)
+    assert started[-1] == "low2"
+
+
+@pytest.mark.asyncio
+async def test_queued_encode_cancelled_in_same_tick_as_release():
+    """Отмена ждущего сжатия в тот же тик, что и освобождение места, его не теряет."""
+    pool = PostProcessor(max_processes=1)
+
+    async def encode():
+        async with pool._slot(PRIORITY_LOW):
+            pass
+
+    async with pool._slot(PRIORITY_NORMAL):
+        queued = asyncio.create_task(encode())
+        await asyncio.sleep(0)
+        # future ожидания уже отменён, задача ещё не проснулась
+        queued.cancel()
+
+    with pytest.raises(asyncio.CancelledError):
+        await queued
+    assert pool._running == pool._running_low == 0
+    assert pool._waiters == []
+
+
+def test_cache_evicts_least_recently_used(tmp_path):
+    """Кэш отдаёт пережатый результат и вытесняет самые старые записи."""
+    cache = TranscodeCache(tmp_path / "cache", max_bytes=15)
+    for key in ("youtube:a", "youtube:b"):
+        path = tmp_path / f"{key[-1]}.mp4"
+        path.write_bytes(b"x" * 10)
+        cache.put(key, {"success": True, "file_path": str(path), "file_size": 10})
+        os.utime(cache._meta_path(key), (0, 0) if key.endswith("a") else None)
+
+    assert cache.get("youtube:a") is None
+    assert cache.get("youtube:b")["file_size"] == 10
+
+
+@pytest.mark.asyncio
+async def test_fit_to_budget_reencodes_and_caches(tmp_path, monkeypatch):
+    """Слишком большое видео пережимается, результат попадает в кэш."""
+    monkeypatch.setattr(settings, "max_file_size_mb", 1)
+    monkeypatch.setattr(
+        transcode, "transcode_cache", TranscodeCache(tmp_path / "cache", 10**9)
+    )
+    source = tmp_path / "video.mp4"
+    source.write_bytes(b"x" * 2 * 1024 * 1024)
+    encoded = {}
+
+    async def probe(path):
+        return {"format": {"duration": "5"}}
+
+    async def encode_to_bitrate(src, target, video_kbps, audio_kbps):
+        encoded["video_kbps"] = video_kbps
+        with open(target, "wb") as f:
+            f.write(b"y" * 1024)
+        return target
+
+    monkeypatch.setattr(transcode.postprocessor, "probe", probe)
+    monkeypatch.setattr(transcode.postprocessor, "encode_to_bitrate", encode_to_bitrate)
+    result = {
+        "success": True,
+        "file_path": str(source),
+        "content_type": "video",
+        "file_size": source.stat().st_size,
+    }
+
+    result = await transcode.fit_to_budget(result, "youtube:abc")
+
+    assert result["file_size"] == 1024
+    assert not source.exists()
+    assert encoded["video_kbps"] > 0
+    assert (
+        transcode.transcode_cache.get("youtube:abc")["file_path"] == result["file_path"]
+    )
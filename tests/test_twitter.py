@@ -0,0 +1,154 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from downloaders import twitter
+
+SYNDICATION_TEXT = {
+    "__typename": "Tweet",
+    "text": "Read this: https://t.co/abc",
+    "entities": {
+        "urls": [{"url": "https://t.co/abc", "expanded_url": "https://example.com/a"}]
+    },
+    "user": {"name": "Jack & Co", "screen_name": "jack"},
+}
+
+SYNDICATION_PHOTOS = {
+    "__typename": "Tweet",
+    "text": "Two cats https://t.co/media",
+    "user": {"name": "Cats", "screen_name": "cats"},
+    "mediaDetails": [
+        {"type": "photo", "media_url_https": "https://pbs.twimg.com/media/a.jpg"},
+        {"type": "photo", "media_url_https": "https://pbs.twimg.com/media/b.jpg"},
+    ],
+}
+
+
+def test_api_and_syndication_responses_parsed():
+    """Ответы API v2 и syndication дают одинаковый твит."""
+    api = twitter.parse_api_tweet(
+        {
+            "data": {"id": "1", "text": "Two cats https://t.co/media"},
+            "includes": {
+                "users": [{"name": "Cats", "username": "cats"}],
+                "media": [
+                    {"type": "photo", "url": "https://pbs.twimg.com/media/a.jpg"},
+                    {"type": "photo", "url": "https://pbs.twimg.com/media/b.jpg"},
+                ],
+            },
+        }
+    )
+
+    assert api == twitter.parse_syndication_tweet(SYNDICATION_PHOTOS)
+    assert api.text == "Two cats"
+    assert not api.has_video
+
+    tweet = twitter.parse_syndication_tweet(SYNDICATION_TEXT)
+    assert tweet.text == "Read this: https://example.com/a"
+    assert tweet.photos == []
+
+
+def test_syndication_token_shape():
+    """Токен syndication - base36 без нулей и точки."""
+    token = twitter.syndication_token("1783215418418643426")
+
+    assert token
+    assert set(token) <= set("123456789abcdefghijklmnopqrstuvwxyz")
+
+
+@pytest.mark.asyncio
+async def test_text_tweet_replied_without_ytdlp(monkeypatch):
+    """Твит без медиа возвращается текстом, yt-dlp не запускается."""
+
+    async def fake_fetch(tweet_id):
+        assert tweet_id == "42"
+        return twitter.parse_syndication_tweet(SYNDICATION_TEXT)
+
+    def no_ytdlp(url, progress):
+        raise AssertionError("text tweets must not run yt-dlp")
+
+    monkeypatch.setattr(twitter, "fetch_tweet", fake_fetch)
+    monkeypatch.setattr(twitter, "_download_twitter_content", no_ytdlp)
+
+    result = await twitter.download_twitter_content("https://x.com/jack/status/42")
+
+    assert result["content_type"] == "text"
+    assert result["text"] == (
+        "<b>Jack &amp; Co (@jack)</b>\n\nRead this: https://example.com/a"
+    )
+
+
+@pytest.mark.asyncio
+async def test_photo_tweet_sent_by_url(monkeypatch):
+    """Фото твита отдаются ссылками, без скачивания."""
+
+    async def fake_fetch(tweet_id):
+        return twitter.parse_syndication_tweet(SYNDICATION_PHOTOS)
+
+    monkeypatch.setattr(twitter, "fetch_tweet", fake_fetch)
+
+    result = await twitter.download_twitter_content("https://x.com/cats/status/7")
+
+    assert [item["media_url"] for item in result["items"]] == [
+        "https://pbs.twimg.com/media/a.jpg?name=large",
+        "https://pbs.twimg.com/media/b.jpg?name=large",
+    ]
+    assert all("file_path" not in item for item in result["items"])
+    # Текст твита не теряется, как и у видео
+    tweet = twitter.parse_syndication_tweet(SYNDICATION_PHOTOS)
+    assert tweet.text and tweet.text in result["title"]
+
+
+@pytest.mark.asyncio
+async def test_video_tweet_and_lookup_failure_use_ytdlp(monkeypatch):
+    """Видео и недоступные метаданные - обычная загрузка через yt-dlp."""
+    tweets = [
+        twitter.Tweet(author="a", username="a", text="", has_video=True),
+        RuntimeError("HTTP 404"),
+    ]
+
+    async def fake_fetch(tweet_id):
+        tweet = tweets.pop(0)
+        if isinstance(tweet, Exception):
+            raise tweet
+        return tweet
+
+    calls = []
+
+    def fake_ytdlp(url, progress):
+        calls.append(url)
+        return {"success": True, "file_path": "/tmp/t.mp4", "content_type": "video"}
+
+    monkeypatch.setattr(twitter, "fetch_tweet", fake_fetch)
+    monkeypatch.setattr(twitter, "_download_twitter_content", fake_ytdlp)
+
+    for _ in range(2):
+        result = await twitter.download_twitter_content("https://x.com/a/status/1")
+        assert result["content_type"] == "video"
+    assert len(calls) == 2
+
+
+@pytest.mark.asyncio
+async def test_api_failure_falls_back_to_syndication(monkeypatch):
+    """Ошибка API v2 не мешает получить твит через syndication."""
+    requested = []
+
+    async def fake_json(url, **kwargs):
+        requested.append(url)
+        if url.startswith("https://api.twitter.com"):
+            raise RuntimeError("HTTP 429")
+        return SYNDICATION_TEXT
+
+    monkeypatch.setattr(twitter, "app_bearer_token", lambda platform: "TOKEN")
+    monkeypatch.setattr(twitter, "fetch_json", fake_json)
+
+    tweet = await twitter.fetch_tweet("42")
+
+    assert tweet.username == "jack"
+    assert requested == [
+        "https://api.twitter.com/2/tweets/42",
+        twitter.SYNDICATION_URL,
+    ]
@@ -0,0 +1,68 @@
+import json
+import os
+import sys
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+from aiogram.methods import SendMessage
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.webhook import QueuedRequestHandler, busy_reply
+
+
+def make_update(update_id: int) -> dict:
+    return {
+        "update_id": update_id,
+        "message": {
+            "message_id": 1,
+            "date": 0,
+            "chat": {"id": 42, "type": "private"},
+            "text": "https://youtu.be/dQw4w9WgXcQ",
+        },
+    }
+
+
+def make_request(update: dict) -> MagicMock:
+    request = MagicMock()
+    request.headers = {}
+    request.json = AsyncMock(return_value=update)
+    return request
+
+
+@pytest.fixture
+def handler():
+    bot = MagicMock()
+    bot.session.json_dumps = json.dumps
+    bot.session.json_loads = json.loads
+    return QueuedRequestHandler(dispatcher=MagicMock(), bot=bot, queue_size=1)
+
+
+@pytest.mark.asyncio
+async def test_duplicate_updates_are_not_queued(handler):
+    """Повторная доставка того же update_id не попадает в очередь."""
+    await handler.handle(make_request(make_update(1)))
+    await handler.handle(make_request(make_update(1)))
+
+    assert handler.queue.qsize() == 1
+
+
+@pytest.mark.asyncio
+async def test_full_queue_sheds_with_busy_reply(handler):
+    """При переполнении очереди апдейт отклоняется, а не ждёт."""
+    await handler.handle(make_request(make_update(1)))
+    response = await handler.handle(make_request(make_update(2)))
+
+    assert response.status == 200
+    assert handler.queue.qsize() == 1
+
+
+def test_busy_reply_targets_private_chat():
+    """Ответ «занято» уходит в личный чат, группы не спамим."""
+    reply = busy_reply(make_update(1))
+    assert isinstance(reply, SendMessage)
+    assert reply.chat_id == 42
+
+    group_update = make_update(2)
+    group_update["message"]["chat"]["type"] = "group"
+    assert busy_reply(group_update) is None
@@ -0,0 +1,49 @@
+import asyncio
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from downloaders.registry import get_downloader
+from downloaders.ydl_pool import YOUTUBE_CLIENT_OPTS, YDLPool
+from services.progress import ProgressStream
+
+
+def test_instances_are_reused_between_leases():
+    """Один и тот же YoutubeDL переиспользуется, а не создаётся заново."""
+    pool = YDLPool()
+
+    with pool.lease("instagram_media") as first:
+        pass
+    with pool.lease("instagram_media") as second:
+        pass
+
+    assert first is second
+
+
+@pytest.mark.asyncio
+async def test_lease_binds_progress_and_restores_params():
+    """Хук пула ведёт в прогресс текущей аренды, параметры аренды откатываются."""
+    pool = YDLPool()
+    progress = ProgressStream()
+
+    def run():
+        with pool.lease("youtube_video", progress, {"max_filesize": 1}) as ydl:
+            assert ydl.params["max_filesize"] == 1
+            for hook in ydl._progress_hooks:
+                hook({"status": "downloading", "tmpfilename": "/tmp/x.part"})
+        with pool.lease("youtube_video") as ydl:
+            return ydl.params["max_filesize"]
+
+    assert await asyncio.to_thread(run) == YOUTUBE_CLIENT_OPTS["max_filesize"]
+    assert progress.part_path == "/tmp/x.part"
+
+
+def test_all_platform_downloaders_registered():
+    """Каждая платформа с загрузчиком есть в реестре."""
+    for platform in ("tiktok", "youtube", "instagram", "twitter"):
+        assert get_downloader(platform) is not None
+    assert get_downloader("unknown") is None
+
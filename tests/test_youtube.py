@@ -0,0 +1,100 @@
+import os
+import sys
+from contextlib import contextmanager
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from downloaders import youtube
+
+RAW_INFO = {
+    "id": "abc",
+    "title": "Song",
+    "duration": 200,
+    "formats": [
+        {"format_id": "v", "url": "https://x/v.mp4", "acodec": "none"},
+        {"format_id": "a", "url": "https://x/a.m4a", "vcodec": "none"},
+    ],
+}
+
+
+@pytest.mark.asyncio
+async def test_music_downloaded_by_audio_lease_on_unprocessed_info(
+    monkeypatch, tmp_path
+):
+    """Музыку качает аудио-профиль по необработанной info, видео-аренда уже отпущена."""
+    audio_file = tmp_path / "youtube_audio_abc.m4a"
+    audio_file.write_bytes(b"a" * 10)
+    held = []
+    processed = []
+
+    class FakeYDL:
+        def __init__(self, profile):
+            self.profile = profile
+
+        def extract_info(self, url, download, process=True):
+            assert not download and not process
+            return dict(RAW_INFO)
+
+        def process_ie_result(self, info, download):
+            processed.append((self.profile, list(held), "requested_formats" in info))
+            return {**info, "format_id": "a", "ext": "m4a"}
+
+        def prepare_filename(self, info):
+            return str(audio_file)
+
+    @contextmanager
+    def lease(profile, progress=None, params=None):
+        held.append(profile)
+        try:
+            yield FakeYDL(profile)
+        finally:
+            held.remove(profile)
+
+    monkeypatch.setattr(youtube, "_get_po_token", lambda client: "")
+    monkeypatch.setattr(youtube, "classify_music", lambda info: True)
+    monkeypatch.setattr(youtube.ydl_pool, "lease", lease)
+
+    result = await youtube.download_youtube_video("https://youtu.be/abc")
+
+    assert result["success"]
+    assert result["content_type"] == "audio"
+    assert result["file_path"] == str(audio_file)
+    assert processed == [("youtube_audio", ["youtube_audio"], False)]
+
+
+@pytest.mark.asyncio
+async def test_job_size_limit_passed_to_lease(monkeypatch, tmp_path):
+    """Лимит размера задачи попадает в параметры аренды, а не в общие опции."""
+    from services.progress import ProgressStream
+
+    video_file = tmp_path / "youtube_abc.mp4"
+    video_file.write_bytes(b"v" * 10)
+    leased_params = []
+
+    class FakeYDL:
+        def extract_info(self, url, download, process=True):
+            return dict(RAW_INFO)
+
+        def process_ie_result(self, info, download):
+            return {**info, "format_id": "v", "ext": "mp4"}
+
+        def prepare_filename(self, info):
+            return str(video_file)
+
+    @contextmanager
+    def lease(profile, progress=None, params=None):
+        leased_params.append(params)
+        yield FakeYDL()
+
+    monkeypatch.setattr(youtube, "_get_po_token", lambda client: "")
+    monkeypatch.setattr(youtube, "classify_music", lambda info: False)
+    monkeypatch.setattr(youtube.ydl_pool, "lease", lease)
+    progress = ProgressStream()
+    progress.max_filesize = 123
+
+    result = await youtube.download_youtube_video("https://youtu.be/abc", progress)
+
+    assert result["success"]
+    assert leased_params == [{"max_filesize": 123}]
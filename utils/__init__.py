@@ -1,5 +1,6 @@
 """Utilities package."""
 
 from .po_token_cache import POTokenCache
+from .shared_state import SharedState, shared_state
 
-__all__ = ["POTokenCache"]
+__all__ = ["POTokenCache", "SharedState", "shared_state"]
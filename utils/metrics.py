@@ -0,0 +1,102 @@
+"""Prometheus metrics shared across the bot."""
+
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    Counter,
+    Gauge,
+    Histogram,
+    generate_latest,
+)
+
+DB_POOL_CHECKOUT_SECONDS = Histogram(
+    "db_pool_checkout_seconds",
+    "Time spent waiting for a database connection from the pool",
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30),
+)
+
+
+WEBHOOK_QUEUE_DEPTH = Gauge(
+    "webhook_queue_depth",
+    "Updates waiting in the webhook queue",
+)
+WEBHOOK_SHED_UPDATES = Counter(
+    "webhook_shed_updates_total",
+    "Updates rejected with a busy reply because the queue was full",
+)
+WEBHOOK_DUPLICATE_UPDATES = Counter(
+    "webhook_duplicate_updates_total",
+    "Redelivered updates dropped by update_id",
+)
+
+
+OUTBOUND_QUEUE_DEPTH = Gauge(
+    "outbound_queue_depth",
+    "Bot API calls waiting for a rate limit token",
+)
+OUTBOUND_RETRY_AFTER = Counter(
+    "outbound_retry_after_total",
+    "429 flood control responses handled by the send scheduler",
+)
+
+
+JOBS_RUNNING = Gauge("jobs_running", "Download jobs holding a worker slot")
+JOBS_QUEUED = Gauge("jobs_queued", "Download jobs waiting for a worker slot")
+JOBS_CANCELLED = Counter("jobs_cancelled_total", "Download jobs cancelled by users")
+
+
+SESSION_THROTTLED = Counter(
+    "extractor_session_throttled_total",
+    "Extractor sessions put on cooldown after throttling",
+    ["platform"],
+)
+SESSION_LEASE_SECONDS = Histogram(
+    "extractor_session_lease_wait_seconds",
+    "Time spent waiting for a free extractor session",
+    ["platform"],
+)
+
+
+POSTPROCESS_RUNNING = Gauge("postprocess_running", "ffmpeg/ffprobe processes running")
+POSTPROCESS_SECONDS = Histogram(
+    "postprocess_seconds",
+    "Run time of ffmpeg/ffprobe processes",
+    ["operation"],
+    buckets=(0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300),
+)
+
+
+CONTENT_INDEX_LOOKUPS = Counter(
+    "content_index_lookups_total",
+    "Downloaded files looked up in the content fingerprint index",
+    ["content_type"],
+)
+CONTENT_INDEX_HITS = Counter(
+    "content_index_hits_total",
+    "Downloaded files identical to one already sent, delivered by file_id",
+    ["content_type"],
+)
+CONTENT_INDEX_SAVED_BYTES = Counter(
+    "content_index_saved_bytes_total",
+    "Upload bytes saved by sending duplicate files by file_id",
+    ["content_type"],
+)
+DOWNLOAD_CONNECTIONS = Gauge(
+    "download_connections",
+    "yt-dlp connections granted per CDN",
+    ["host"],
+)
+DOWNLOAD_THROUGHPUT = Gauge(
+    "download_throughput_bytes",
+    "Smoothed per-connection download speed per CDN, bytes per second",
+    ["host"],
+)
+SENT_BY_URL = Counter(
+    "sent_by_url_total",
+    "Files passed to Telegram by URL (sent, or rejected and uploaded instead)",
+    ["content_type", "outcome"],
+)
+
+
+def render_metrics() -> tuple[bytes, str]:
+    """Return metrics payload and its content type for an HTTP endpoint."""
+    return generate_latest(), CONTENT_TYPE_LATEST
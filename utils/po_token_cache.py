@@ -1,6 +1,7 @@
 """PO Token cache manager for YouTube downloads."""
 
 import json
+import time
 from datetime import datetime, timedelta
 from pathlib import Path
 from typing import Optional
@@ -11,16 +12,56 @@ from loguru import logger
 class POTokenCache:
     """Управление кэшем PO Token с автоматическим обновлением."""
 
-    def __init__(self, cache_file: str = "po_token_cache.json"):
+    REDIS_KEY = "tiktube:po_token:{client}"
+    # Сколько секунд после ошибки Redis работаем только с файловым кэшем
+    REDIS_RETRY_INTERVAL = 30.0
+
+    def __init__(
+        self, cache_file: str = "po_token_cache.json", redis_url: Optional[str] = None
+    ):
         """
         Инициализация кэша токенов.
 
         Args:
             cache_file: Путь к файлу кэша
+            redis_url: Redis для общего кэша между воркерами (опционально)
         """
         self.cache_file = Path(cache_file)
         self.cache_file.parent.mkdir(parents=True, exist_ok=True)
         self._cache = self._load_cache()
+        self._redis = self._connect_redis(redis_url) if redis_url else None
+        self._redis_retry_at = 0.0
+
+    def _connect_redis(self, redis_url: str):
+        """Создать Redis клиент (соединение устанавливается лениво)."""
+        try:
+            import redis
+
+            # Зависший Redis не должен держать загрузку
+            return redis.Redis.from_url(
+                redis_url,
+                decode_responses=True,
+                socket_connect_timeout=0.5,
+                socket_timeout=0.5,
+            )
+        except Exception as e:
+            logger.warning(f"PO Token cache: Redis disabled: {e}")
+            return None
+
+    def _redis_call(self, method: str, *args, **kwargs):
+        """Вызов Redis; после ошибки на время переключаемся на файловый кэш."""
+        if self._redis is None or time.monotonic() < self._redis_retry_at:
+            return None
+        try:
+            return getattr(self._redis, method)(*args, **kwargs)
+        except Exception as e:
+            logger.warning(
+                f"PO Token cache: Redis unavailable, using file cache for "
+                f"{self.REDIS_RETRY_INTERVAL:.0f}s: {e}"
+            )
+            # Клиент переподключится сам при следующем вызове
+            self._redis_retry_at = time.monotonic() + self.REDIS_RETRY_INTERVAL
+            return None
 
     def _load_cache(self) -> dict:
         """Загрузить кэш из файла."""
@@ -55,6 +96,11 @@ class POTokenCache:
         Returns:
             PO Token или None если истёк/отсутствует
         """
+        # Общий кэш воркеров имеет приоритет
+        shared = self._redis_call("get", self.REDIS_KEY.format(client=client))
+        if shared:
+            self._cache[client] = json.loads(shared)
+
         if client not in self._cache:
             logger.debug(f"No cached PO Token for {client}")
             return None
@@ -90,6 +136,12 @@ class POTokenCache:
             "expires_at": expires_at.isoformat(),
         }
 
+        self._redis_call(
+            "set",
+            self.REDIS_KEY.format(client=client),
+            json.dumps(self._cache[client]),
+            ex=ttl_days * 86400,
+        )
         self._save_cache()
         logger.info(
             f"PO Token for {client} cached until {expires_at.strftime('%Y-%m-%d %H:%M')}"
@@ -97,6 +149,7 @@ class POTokenCache:
 
     def clear_token(self, client: str):
         """Удалить токен из кэша."""
+        self._redis_call("delete", self.REDIS_KEY.format(client=client))
         if client in self._cache:
             del self._cache[client]
             self._save_cache()
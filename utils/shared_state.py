@@ -0,0 +1,123 @@
+"""Cross-process shared state backed by Redis."""
+
+import time
+from collections import OrderedDict
+
+from loguru import logger
+
+from config import settings
+
+
+class SharedState:
+    """
+    Small key/value facade for state shared between worker processes.
+
+    Used for update deduplication and caches. Redis is used when reachable;
+    otherwise the state falls back to process-local memory, which is only
+    correct with a single worker. The local fallback keeps at most
+    ``max_memory_keys`` entries, evicting the least recently used ones.
+    """
+
+    def __init__(
+        self, url: str, namespace: str = "tiktube", max_memory_keys: int = 10_000
+    ):
+        """
+        Args:
+            url: Redis URL
+            namespace: Key prefix
+            max_memory_keys: Entry limit of the process-local fallback
+        """
+        self.url = url
+        self.namespace = namespace
+        self.max_memory_keys = max_memory_keys
+        self._redis = None
+        self._memory: OrderedDict[str, tuple[str, float | None]] = OrderedDict()
+
+    @property
+    def is_shared(self) -> bool:
+        """True when state is really shared through Redis."""
+        return self._redis is not None
+
+    @property
+    def redis(self):
+        """Underlying Redis client (None in local mode)."""
+        return self._redis
+
+    async def connect(self) -> bool:
+        """Connect to Redis, falling back to local memory on failure."""
+        if self._redis is not None:
+            return True
+
+        try:
+            import redis.asyncio as aioredis
+
+            client = aioredis.from_url(self.url, decode_responses=True)
+            await client.ping()
+            self._redis = client
+            logger.info("Shared state connected to Redis")
+            return True
+        except Exception as e:
+            logger.warning(f"Redis unavailable, shared state is process-local: {e}")
+            return False
+
+    async def close(self) -> None:
+        """Close Redis connection."""
+        if self._redis is not None:
+            await self._redis.aclose()
+            self._redis = None
+
+    def key(self, key: str) -> str:
+        """Namespaced key."""
+        return f"{self.namespace}:{key}"
+
+    async def get(self, key: str) -> str | None:
+        """Get value or None if missing/expired."""
+        if self._redis is not None:
+            return await self._redis.get(self.key(key))
+
+        item = self._memory.get(key)
+        if item is None:
+            return None
+        value, expires_at = item
+        if expires_at is not None and expires_at <= time.monotonic():
+            del self._memory[key]
+            return None
+        self._memory.move_to_end(key)
+        return value
+
+    async def set(self, key: str, value: str, ttl: float | None = None) -> None:
+        """Set value with optional TTL in seconds."""
+        if self._redis is not None:
+            await self._redis.set(
+                self.key(key), value, px=int(ttl * 1000) if ttl else None
+            )
+            return
+
+        expires_at = time.monotonic() + ttl if ttl else None
+        self._memory[key] = (value, expires_at)
+        self._memory.move_to_end(key)
+        # Без Redis память процесса ограничена: вытесняем давно не читанные
+        while len(self._memory) > self.max_memory_keys:
+            self._memory.popitem(last=False)
+
+    async def claim(self, key: str, ttl: float) -> bool:
+        """Atomically set key if absent. Returns True if this caller won."""
+        if self._redis is not None:
+            return bool(
+                await self._redis.set(self.key(key), "1", nx=True, px=int(ttl * 1000))
+            )
+
+        if await self.get(key) is not None:
+            return False
+        await self.set(key, "1", ttl)
+        return True
+
+    async def delete(self, key: str) -> None:
+        """Delete key."""
+        if self._redis is not None:
+            await self._redis.delete(self.key(key))
+        else:
+            self._memory.pop(key, None)
+
+
+shared_state = SharedState(settings.redis_url)